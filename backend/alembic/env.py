@@ -13,6 +13,9 @@ from app.models.asset import Asset
 from app.models.transaction import Transaction
 from app.models.analysis import AIAnalysis
 from app.models.market_data import MarketData
+from app.models.position import Position
+from app.models.worker_lease import WorkerLease
+from app.models.daily_close import DailyClose
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,56 @@
+"""position snapshot table
+
+Revision ID: 0001_position_snapshot
+Revises:
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_position_snapshot"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("asset_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("buy_quantity", sa.Float(), nullable=False),
+        sa.Column("buy_cost", sa.Float(), nullable=False),
+        sa.Column("average_price", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["asset_id"], ["asset.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "asset_id", name="uq_position_user_asset"),
+    )
+    op.create_index(op.f("ix_position_id"), "position", ["id"], unique=False)
+
+    # Backfill from the existing transactions (same aggregate as PortfolioService.rebuild_positions)
+    op.execute(
+        """
+        INSERT INTO position (user_id, asset_id, quantity, buy_quantity, buy_cost, average_price, updated_at)
+        SELECT user_id, asset_id,
+               SUM(CASE WHEN type = 'BUY' THEN quantity WHEN type = 'SELL' THEN -quantity ELSE 0 END),
+               SUM(CASE WHEN type = 'BUY' THEN quantity ELSE 0 END),
+               SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE 0 END),
+               CASE WHEN SUM(CASE WHEN type = 'BUY' THEN quantity ELSE 0 END) > 0
+                    THEN SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE 0 END)
+                         / SUM(CASE WHEN type = 'BUY' THEN quantity ELSE 0 END)
+                    ELSE 0 END,
+               CURRENT_TIMESTAMP
+        FROM "transaction"
+        GROUP BY user_id, asset_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_position_id"), table_name="position")
+    op.drop_table("position")
@@ -0,0 +1,33 @@
+"""composite indexes for the transaction history, non-null transaction date
+
+Revision ID: 0002_transaction_history_indexes
+Revises: 0001_position_snapshot
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_transaction_history_indexes"
+down_revision = "0001_position_snapshot"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The keyset cursor is (date, id): a NULL date can neither be ordered nor encoded.
+    # Rows written without one get the migration time (the column default of new rows).
+    op.execute('UPDATE "transaction" SET date = CURRENT_TIMESTAMP WHERE date IS NULL')
+    with op.batch_alter_table("transaction") as batch_op:
+        batch_op.alter_column("date", existing_type=sa.DateTime(), nullable=False)
+
+    # Keyset pagination orders by (date, id) inside a user, optionally inside one asset
+    op.create_index("ix_transaction_user_date", "transaction", ["user_id", "date", "id"], unique=False)
+    op.create_index("ix_transaction_user_asset_date", "transaction", ["user_id", "asset_id", "date", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transaction_user_asset_date", table_name="transaction")
+    op.drop_index("ix_transaction_user_date", table_name="transaction")
+    with op.batch_alter_table("transaction") as batch_op:
+        batch_op.alter_column("date", existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,22 @@
+"""refresh lease on the market data cache
+
+Revision ID: 0003_market_data_refresh_lease
+Revises: 0002_transaction_history_indexes
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_market_data_refresh_lease"
+down_revision = "0002_transaction_history_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("marketdata", sa.Column("refresh_until", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("marketdata", "refresh_until")
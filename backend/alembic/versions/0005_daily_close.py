@@ -0,0 +1,29 @@
+"""daily close cache
+
+Revision ID: 0005_daily_close
+Revises: 0004_worker_lease
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_daily_close"
+down_revision = "0004_worker_lease"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dailyclose",
+        sa.Column("ticker", sa.String(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("ticker", "date"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("dailyclose")
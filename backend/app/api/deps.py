@@ -1,13 +1,15 @@
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
 from app.models.user import User
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -21,9 +23,12 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> User:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_token_subject(token: str = Depends(reusable_oauth2)) -> str:
+    """Email (JWT subject) of the caller, without touching the DB."""
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -43,7 +48,23 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    return email
+
+def get_current_user(
+    db: Session = Depends(get_db), email: str = Depends(get_token_subject)
+) -> User:
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> User:
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), email: str = Depends(get_token_subject)
+) -> User:
+    return await get_user_by_email_async(db, email)
@@ -1,6 +1,8 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.config import settings
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.analysis import AIAnalysis
@@ -8,6 +10,8 @@ from app.services.market_data_service import MarketDataService
 from app.services.ai_service import AIAnalystService
 from app.services.email_service import EmailService
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/generate")
@@ -33,19 +37,33 @@ def generate_portfolio_analysis(
         elif t.type == "SELL":
             portfolio_map[ticker]["qty"] -= t.quantity
             
+    held = {ticker: data for ticker, data in portfolio_map.items() if data["qty"] > 0}
+    # One bulk lookup (cached, refreshed from the provider only when stale) for every held ticker
+    prices = MarketDataService.get_prices(db, held)
+    if held and not prices:
+        # First fetch of these tickers still running (or failing): don't analyze a zero-valued portfolio
+        raise HTTPException(
+            status_code=503,
+            detail="Prices are not available yet, try again shortly.",
+            headers={"Retry-After": str(int(settings.MARKET_DATA_REFRESH_LEASE_SECONDS))},
+        )
+    unpriced = [ticker for ticker in held if ticker not in prices]
+    if unpriced:
+        logger.warning(f"No price for {', '.join(unpriced)}: left out of the analysis.")
+
     portfolio_data = []
-    for ticker, data in portfolio_map.items():
-        if data["qty"] > 0:
-            current_price = MarketDataService.get_price(ticker)
-            value = data["qty"] * current_price
-            portfolio_data.append({
-                "ticker": ticker,
-                "category": data["category"],
-                "value": value,
-                # Allocation is calculated in AI service or here.
-                # AI service calculates it based on total, so we can just pass value.
-            })
-            
+    for ticker, data in held.items():
+        if ticker not in prices:
+            continue
+        value = data["qty"] * prices[ticker]
+        portfolio_data.append({
+            "ticker": ticker,
+            "category": data["category"],
+            "value": value,
+            # Allocation is calculated in AI service or here.
+            # AI service calculates it based on total, so we can just pass value.
+        })
+        
     if not portfolio_data:
          # Depending on logic, empty portfolio might still want analysis? 
          # But AI service prompt assumes assets.
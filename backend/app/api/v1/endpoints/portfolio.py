@@ -1,6 +1,10 @@
 
-from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException
+import io
+from datetime import date, datetime
+from typing import List, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query, Header, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.models.user import User
@@ -11,8 +15,16 @@ from app.schemas.portfolio import (
     AssetResponse,
     TransactionCreate,
     TransactionResponse,
+    TransactionImportSummary,
+    TransactionPage,
+    PortfolioValueSeries,
     PortfolioPosition,
 )
+from app.services.portfolio_cache import portfolio_cache
+from app.services.portfolio_service import PortfolioService
+from app.services.transaction_import_service import TransactionImportService
+from app.services.transaction_service import TransactionService
+from app.services.valuation_service import ValuationService
 
 router = APIRouter()
 
@@ -54,15 +66,98 @@ def create_transaction(
         quantity=transaction_in.quantity,
         price=transaction_in.price
     )
+    if transaction_in.date is not None:
+        transaction.date = transaction_in.date
     db.add(transaction)
+    db.flush()
+    # Keep the positions snapshot in the same DB transaction as the insert
+    PortfolioService.apply_transaction(db, transaction)
     db.commit()
+    portfolio_cache.invalidate(current_user.email)
     db.refresh(transaction)
     return transaction
 
+@router.get("/transactions", response_model=TransactionPage)
+async def list_transactions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    asset_id: Optional[int] = None,
+    type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user_async)
+):
+    """Transaction history, newest first. Pass next_cursor back as `cursor` for the next page."""
+    try:
+        items, next_cursor = await TransactionService.list_transactions_async(
+            db, current_user.id, limit=limit, cursor=cursor,
+            asset_id=asset_id, type=type, start=start, end=end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.post("/transactions/import", response_model=TransactionImportSummary)
+def import_transactions(
+    file: UploadFile = File(...),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Bulk import from a CSV (ticker,type,quantity,price[,date,category,name]) or a B3
+    statement exported as CSV. The upload is read as a stream, in chunks.
+    """
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        summary = TransactionImportService.import_csv(db, current_user.id, stream)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid file: {e}")
+    finally:
+        stream.detach()
+    portfolio_cache.invalidate(current_user.email)
+    return summary
+
 @router.get("/portfolio", response_model=List[PortfolioPosition])
-def read_portfolio(
+async def read_portfolio(
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(deps.get_async_db),
+    email: str = Depends(deps.get_token_subject)
+):
+    """
+    Current positions, served from the per-user cache when possible, with an ETag:
+    a matching If-None-Match gets a 304 (without any DB query on a cache hit).
+    """
+    cached = portfolio_cache.get(email)
+    if cached is None:
+        generation = portfolio_cache.generation(email)
+        current_user = await deps.get_user_by_email_async(db, email)
+        positions = [
+            position.model_dump()
+            for position in await PortfolioService.get_positions_async(current_user.id, db)
+        ]
+        etag = portfolio_cache.set(email, positions, generation)
+    else:
+        etag, positions = cached
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(positions, headers=headers)
+
+@router.get("/history", response_model=PortfolioValueSeries)
+def read_portfolio_history(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    points: Optional[int] = Query(None, ge=3, le=10000),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    from app.services.portfolio_service import PortfolioService
-    return PortfolioService.calculate_portfolio(current_user.id, db)
+    """
+    Daily portfolio value from `start` (default: first transaction) to `end` (default: today),
+    downsampled (LTTB) to about `points` points when given.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    series = ValuationService.get_chart_series(db, current_user.id, start=start, end=end, points=points)
+    return {"dates": [day.date() for day in series.index], "values": series.round(2).tolist()}
@@ -33,6 +33,37 @@ class Settings(BaseSettings):
 
     BACKEND_CORS_ORIGINS: Union[List[str], str] = []
 
+    # Pool de conexões (engine síncrono e assíncrono); DB_POOL_WARM conexões abertas no startup
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_WARM: int = 5
+
+    # Dados de mercado: "static" (preço fixo) ou "replay" (fixtures gravadas pelo job diário)
+    MARKET_DATA_PROVIDER: str = "static"
+    MARKET_DATA_FIXTURES_DIR: str = "../data/fixtures"
+    REPLAY_LATENCY_MS: float = 0.0
+    # Cache de preços (tabela marketdata): idade máxima, lease de refresh entre workers e espera
+    # por um refresh em andamento no mesmo processo (outro worker nunca é esperado)
+    MARKET_DATA_MAX_AGE_SECONDS: int = 900
+    MARKET_DATA_REFRESH_LEASE_SECONDS: float = 30.0
+    MARKET_DATA_REFRESH_WAIT_SECONDS: float = 5.0
+    # Refresher em background dos preços dos ativos em carteira (um líder por deploy via lease);
+    # sem valor, liga só com um provedor real (o "static" gravaria preços fictícios em marketdata)
+    PRICE_REFRESHER_ENABLED: Optional[bool] = None
+    PRICE_REFRESHER_LEASE_SECONDS: float = 60.0
+    PRICE_REFRESH_OPEN_INTERVAL_SECONDS: float = 300.0
+    PRICE_REFRESH_CLOSED_INTERVAL_SECONDS: float = 3600.0
+    PRICE_REFRESH_BATCH_SIZE: int = 200
+    # Cache das posições por usuário (GET /portfolio/portfolio, com ETag); Redis opcional (pacote redis) compartilha entre workers
+    PORTFOLIO_CACHE_USERS: int = 1024
+    PORTFOLIO_CACHE_TTL_SECONDS: float = 300.0
+    PORTFOLIO_CACHE_REDIS_URL: Optional[str] = None
+    # Série histórica de valor da carteira: usuários mantidos no cache em memória
+    VALUATION_CACHE_USERS: int = 256
+
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> List[str]:
         if isinstance(v, str) and not v.startswith("["):
@@ -1,11 +1,80 @@
 
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
 
+def pool_options(url: str) -> dict:
+    """Pool settings from Settings (SQLite uses SQLAlchemy's own single-file pools)."""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend in ("postgresql", "postgres"):
+        query = dict(parsed.query)
+        if "sslmode" in query:
+            # asyncpg takes ssl=, not libpq's sslmode=
+            query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+def dialect_insert(db):
+    """insert() of the session's database, with its ON CONFLICT clauses (PostgreSQL or SQLite)."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"No upsert support for the {name} dialect")
+
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    **pool_options(settings.DATABASE_URL)
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async path for the hot read endpoints (no threadpool slot held while waiting on the DB)
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **pool_options(settings.DATABASE_URL)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def warm_pools(connections: int = None) -> None:
+    """Opens `connections` (default settings.DB_POOL_WARM) connections of each pool at startup."""
+    connections = settings.DB_POOL_WARM if connections is None else connections
+    if connections <= 0:
+        return
+
+    # Check out `connections` at once (so the pool really opens that many), then return them
+    async_conns = [await async_engine.connect() for _ in range(connections)]
+    for conn in async_conns:
+        await conn.execute(text("SELECT 1"))
+    for conn in async_conns:
+        await conn.close()
+
+    def warm_sync():
+        conns = [engine.connect() for _ in range(connections)]
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+            conn.close()
+
+    await asyncio.to_thread(warm_sync)
@@ -1,10 +1,14 @@
 import logging
 import os
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.api import deps
 from app.api.v1.api import api_router
+from app.db.session import SessionLocal, warm_pools
+from app.services.price_refresher import PriceRefresher, refresher_enabled, render_metrics
 
 # Configure logging
 logging.basicConfig(
@@ -40,6 +44,27 @@ if settings.BACKEND_CORS_ORIGINS:
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+price_refresher = PriceRefresher(SessionLocal)
+
+@app.on_event("startup")
+async def warm_db_pools():
+    await warm_pools()
+    logger.info(f"DB pools warmed ({settings.DB_POOL_WARM} connections each).")
+
+@app.on_event("startup")
+def start_price_refresher():
+    # Every process runs one; the DB lease lets only one of them refresh
+    if refresher_enabled():
+        price_refresher.start()
+
+@app.on_event("shutdown")
+def stop_price_refresher():
+    price_refresher.stop()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(db=Depends(deps.get_db)):
+    return render_metrics(db)
+
 @app.get("/")
 def root():
     return {"message": "100HYPE API is running 🚀"}
\ No newline at end of file
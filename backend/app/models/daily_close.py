@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Float, Date
+from app.db.base import Base
+
+class DailyClose(Base):
+    """Cached daily closing price of a ticker (filled from the price provider on demand)."""
+    ticker = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    close = Column(Float, nullable=False)
+    # Name of the provider the close came from; a different provider overwrites it
+    source = Column(String, nullable=False)
@@ -7,3 +7,5 @@ class MarketData(Base):
     ticker = Column(String, primary_key=True, index=True)
     price = Column(Float, nullable=False)
     last_updated = Column(DateTime, default=datetime.utcnow)
+    # Lease of the worker currently refreshing this ticker (NULL when nobody is)
+    refresh_until = Column(DateTime, nullable=True)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+class Position(Base):
+    """
+    Snapshot of a user's holding of one asset, kept in sync with the transaction log
+    (updated in the same DB transaction as each insert; rebuilt by rebuild_positions.py).
+    """
+    __table_args__ = (UniqueConstraint("user_id", "asset_id", name="uq_position_user_asset"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)  # indexed by uq_position_user_asset
+    asset_id = Column(Integer, ForeignKey("asset.id"), nullable=False)
+    quantity = Column(Float, nullable=False, default=0.0)       # BUYs - SELLs
+    buy_quantity = Column(Float, nullable=False, default=0.0)   # total bought
+    buy_cost = Column(Float, nullable=False, default=0.0)       # total cost of the BUYs
+    average_price = Column(Float, nullable=False, default=0.0)  # buy_cost / buy_quantity
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    asset = relationship("Asset")
@@ -1,17 +1,23 @@
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 class Transaction(Base):
+    # Keyset pagination of a user's history (newest first), optionally by asset
+    __table_args__ = (
+        Index("ix_transaction_user_date", "user_id", "date", "id"),
+        Index("ix_transaction_user_asset_date", "user_id", "asset_id", "date", "id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     asset_id = Column(Integer, ForeignKey("asset.id"), nullable=False)
     type = Column(String, nullable=False)  # BUY / SELL
     quantity = Column(Float, nullable=False)
     price = Column(Float, nullable=False)
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="transactions")
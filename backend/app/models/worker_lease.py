@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from app.db.base import Base
+
+class WorkerLease(Base):
+    """
+    Named lease held by one process of the deployment at a time (e.g. the price
+    refresher). The owner renews expires_at while alive; anyone may take it over
+    once it has expired.
+    """
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
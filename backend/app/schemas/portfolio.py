@@ -1,6 +1,6 @@
 
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 
 # --- Assets ---
@@ -26,7 +26,7 @@ class TransactionBase(BaseModel):
     price: float
 
 class TransactionCreate(TransactionBase):
-    pass
+    date: Optional[datetime] = None  # back-dated entry (default: now)
 
 class TransactionResponse(TransactionBase):
     id: int
@@ -36,8 +36,23 @@ class TransactionResponse(TransactionBase):
     class Config:
         from_attributes = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+class TransactionImportSummary(BaseModel):
+    created: int
+    skipped: int
+    assets_created: int
+    errors: List[str] = []
+
 # --- Portfolio Summary ---
 class PortfolioPosition(BaseModel):
     ticker: str
     total_quantity: float
     average_price: float
+
+class PortfolioValueSeries(BaseModel):
+    # Columnar (one list per field) to keep long series compact
+    dates: List[date]
+    values: List[float]
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+import time
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class PriceProvider:
+    """Source of last prices used by MarketDataService."""
+    name = "base"
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        """Returns {ticker: last price} for the tickers the provider knows."""
+        raise NotImplementedError
+
+    def get_history(self, tickers: List[str], start: date, end: date) -> Dict[str, Dict[date, float]]:
+        """Returns {ticker: {day: close}} of the trading days in [start, end] for the tickers the provider knows."""
+        raise NotImplementedError
+
+class StaticPriceProvider(PriceProvider):
+    """Placeholder provider: every ticker costs the same fixed price."""
+    name = "static"
+
+    def __init__(self, price: float = 100.0):
+        self.price = price
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        return {ticker: self.price for ticker in tickers}
+
+    def get_history(self, tickers: List[str], start: date, end: date) -> Dict[str, Dict[date, float]]:
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        weekdays = [day for day in days if day.weekday() < 5]
+        return {ticker: {day: self.price for day in weekdays} for ticker in tickers}
+
+class ReplayPriceProvider(PriceProvider):
+    """
+    Serves prices recorded by the daily job's RecordingProvider (src/market_data_provider.py),
+    with an optional artificial latency per call, so the API can be benchmarked offline.
+    Reads <fixtures_dir>/last_price/<ticker>.json and falls back to the last close in
+    <fixtures_dir>/history/<ticker>.json.
+    """
+    name = "replay"
+
+    def __init__(self, fixtures_dir: str, latency_ms: float = 0.0):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+
+    def _read(self, kind: str, ticker: str) -> Optional[dict]:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+        path = os.path.join(self.fixtures_dir, kind, f"{safe}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _price(self, ticker: str) -> Optional[float]:
+        payload = self._read("last_price", ticker)
+        if payload is not None:
+            return float(payload["price"])
+        payload = self._read("history", ticker)
+        if payload is not None:
+            data = payload["data"]
+            if data["data"]:
+                close_idx = data["columns"].index("Close")
+                return float(data["data"][-1][close_idx])
+        return None
+
+    def get_history(self, tickers: List[str], start: date, end: date) -> Dict[str, Dict[date, float]]:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        history = {}
+        for ticker in tickers:
+            payload = self._read("history", ticker)
+            if payload is None:
+                logger.warning(f"No recorded history for {ticker} in {self.fixtures_dir}")
+                continue
+            data = payload["data"]
+            close_idx = data["columns"].index("Close")
+            closes = {}
+            for index, row in zip(data["index"], data["data"]):
+                day = date.fromisoformat(str(index)[:10])
+                if start <= day <= end and row[close_idx] is not None:
+                    closes[day] = float(row[close_idx])
+            history[ticker] = closes
+        return history
+
+    def get_prices(self, tickers: List[str]) -> Dict[str, float]:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        prices = {}
+        for ticker in tickers:
+            price = self._price(ticker)
+            if price is None:
+                logger.warning(f"No recorded price for {ticker} in {self.fixtures_dir}")
+                continue
+            prices[ticker] = price
+        return prices
+
+_provider: Optional[PriceProvider] = None
+
+def get_price_provider() -> PriceProvider:
+    """Returns the process-wide provider selected by settings.MARKET_DATA_PROVIDER."""
+    global _provider
+    if _provider is None:
+        mode = settings.MARKET_DATA_PROVIDER.lower()
+        if mode == "replay":
+            _provider = ReplayPriceProvider(settings.MARKET_DATA_FIXTURES_DIR, settings.REPLAY_LATENCY_MS)
+        else:
+            if mode != "static":
+                logger.warning(f"Unknown MARKET_DATA_PROVIDER '{mode}', using static prices.")
+            _provider = StaticPriceProvider()
+    return _provider
@@ -1,6 +1,162 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import insert, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.market_data import MarketData
+from app.services.market_data_provider import PriceProvider, get_price_provider
+
+logger = logging.getLogger(__name__)
+
+# Refreshes running in this process, one future per ticker: concurrent requests
+# for the same stale ticker wait on it instead of calling the provider again.
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
 
 class MarketDataService:
+    """
+    Last prices served from the marketdata table, refreshed from the provider
+    (settings.MARKET_DATA_PROVIDER) when older than settings.MARKET_DATA_MAX_AGE_SECONDS.
+
+    Refreshes are single-flight: inside a process through a future per ticker, and
+    across workers through a lease on the ticker's row (refresh_until), claimed with a
+    conditional UPDATE. A worker that loses the claim does not wait: it serves the
+    cached (stale) price, or leaves the ticker out when it has never been fetched.
+    The first fetch of a ticker claims it with a placeholder row (last_updated NULL)
+    that is never read as a price; if its claimer dies, the lease expires and the
+    next request claims it again. Refreshing commits the session it is given.
+    """
+
+    @staticmethod
+    def _cached(db: Session, tickers: Iterable[str]) -> Dict[str, tuple]:
+        rows = db.query(MarketData.ticker, MarketData.price, MarketData.last_updated).filter(
+            MarketData.ticker.in_(list(tickers))
+        )
+        # Rows without last_updated are lease placeholders of a first fetch, not prices
+        return {ticker: (price, last_updated) for ticker, price, last_updated in rows if last_updated is not None}
+
+    @staticmethod
+    def _claim(db: Session, tickers: List[str], cutoff: datetime) -> List[str]:
+        """Takes the refresh lease of the stale tickers no other worker is refreshing. Returns the claimed ones."""
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=settings.MARKET_DATA_REFRESH_LEASE_SECONDS)
+        existing = {ticker for (ticker,) in db.query(MarketData.ticker).filter(MarketData.ticker.in_(tickers))}
+        claimed = []
+        for ticker in tickers:
+            if ticker not in existing:
+                continue
+            result = db.execute(
+                update(MarketData)
+                .where(
+                    MarketData.ticker == ticker,
+                    or_(MarketData.refresh_until.is_(None), MarketData.refresh_until < now),
+                    or_(MarketData.last_updated.is_(None), MarketData.last_updated < cutoff),
+                )
+                .values(refresh_until=lease)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                claimed.append(ticker)
+        db.commit()
+
+        missing = [ticker for ticker in tickers if ticker not in existing]
+        if missing:
+            try:
+                # Core insert: the ORM one would replace last_updated=None with its default
+                db.execute(insert(MarketData.__table__), [
+                    {"ticker": ticker, "price": 0.0, "last_updated": None, "refresh_until": lease} for ticker in missing
+                ])
+                db.commit()
+                claimed.extend(missing)
+            except IntegrityError:
+                # Another worker inserted them first: it owns their first fetch
+                db.rollback()
+        return claimed
+
+    @staticmethod
+    def _refresh(db: Session, tickers: List[str], cached: Dict[str, tuple], cutoff: datetime,
+                 provider: PriceProvider) -> Dict[str, float]:
+        """
+        Refreshes the stale tickers whose lease this process wins. The others are being
+        refreshed by another worker and keep their cached price. Returns the best known prices.
+        """
+        prices = {ticker: cached[ticker][0] for ticker in tickers if ticker in cached}
+        claimed = MarketDataService._claim(db, tickers, cutoff)
+
+        if claimed:
+            fetched = {}
+            try:
+                fetched = provider.get_prices(claimed)
+            except Exception as e:
+                logger.error(f"Price refresh failed for {len(claimed)} tickers: {e}")
+            now = datetime.utcnow()
+            rows = [
+                {"ticker": ticker, "price": fetched[ticker], "last_updated": now, "refresh_until": None}
+                if ticker in fetched else {"ticker": ticker, "refresh_until": None}
+                for ticker in claimed
+            ]
+            db.execute(update(MarketData), rows)
+            db.commit()
+            prices.update(fetched)
+        return prices
+
+    @staticmethod
+    def get_prices(db: Session, tickers: Iterable[str], provider: Optional[PriceProvider] = None) -> Dict[str, float]:
+        """
+        Returns {ticker: last price}, refreshing stale tickers in one provider call.
+        Tickers without any known price (provider failure, or a first fetch running
+        in another worker) are left out.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        provider = provider or get_price_provider()
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.MARKET_DATA_MAX_AGE_SECONDS)
+        cached = MarketDataService._cached(db, tickers)
+        prices = {ticker: price for ticker, (price, last_updated) in cached.items() if last_updated >= cutoff}
+        stale = [ticker for ticker in tickers if ticker not in prices]
+        if not stale:
+            return prices
+
+        owned, joined = [], {}
+        with _inflight_lock:
+            for ticker in stale:
+                if ticker in _inflight:
+                    joined[ticker] = _inflight[ticker]
+                else:
+                    _inflight[ticker] = Future()
+                    owned.append(ticker)
+
+        if owned:
+            try:
+                refreshed = MarketDataService._refresh(db, owned, cached, cutoff, provider)
+            except Exception as e:
+                db.rollback()
+                refreshed = {ticker: cached[ticker][0] for ticker in owned if ticker in cached}
+                logger.error(f"Price refresh failed: {e}")
+            finally:
+                with _inflight_lock:
+                    futures = [_inflight.pop(ticker) for ticker in owned]
+            for ticker, future in zip(owned, futures):
+                future.set_result(refreshed.get(ticker))
+            prices.update({ticker: price for ticker, price in refreshed.items() if price is not None})
+
+        for ticker, future in joined.items():
+            try:
+                price = future.result(timeout=settings.MARKET_DATA_REFRESH_WAIT_SECONDS)
+            except FutureTimeout:
+                price = None
+            if price is None and ticker in cached:
+                price = cached[ticker][0]
+            if price is not None:
+                prices[ticker] = price
+
+        return {ticker: prices[ticker] for ticker in tickers if ticker in prices}
+
     @staticmethod
-    def get_price(ticker: str) -> float:
-        # Placeholder for fetching price from Yahoo Finance/Brapi
-        return 100.0
+    def get_price(db: Session, ticker: str) -> Optional[float]:
+        return MarketDataService.get_prices(db, [ticker]).get(ticker)
@@ -0,0 +1,168 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """In-process LRU with a TTL. Each worker process has its own."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Bumped on every invalidation; kept (not evicted with the entries) so it never goes back
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self, key: str) -> int:
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def bump(self, key: str) -> None:
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class RedisBackend:
+    """Shared by every worker (needs the optional `redis` package); eviction is Redis' maxmemory policy."""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "portfolio:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        self.client.set(self.prefix + key, value, ex=max(int(self.ttl_seconds), 1))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def generation(self, key: str) -> int:
+        return int(self.client.get(self.prefix + "generation:" + key) or 0)
+
+    def bump(self, key: str) -> None:
+        # Outlives the entries it guards (an entry lives at most ttl_seconds)
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.prefix + "generation:" + key)
+        pipeline.expire(self.prefix + "generation:" + key, max(int(self.ttl_seconds) * 2, 1))
+        pipeline.execute()
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+class PortfolioCache:
+    """
+    Computed positions of each user (keyed by the token subject, so a hit needs no DB
+    query at all), stored with the ETag of their JSON payload. Writes that change
+    positions invalidate the user's entry; the TTL bounds staleness for writes made
+    elsewhere (other workers with the memory backend, rebuild_positions.py).
+
+    Each invalidation also bumps the user's generation. A miss reads the generation
+    before reading the positions and stores them with it: if an invalidation happened
+    in between, the snapshot is not stored, and an entry stored with an older
+    generation is never served.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def etag(payload: List[Dict]) -> str:
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+    def generation(self, key: str) -> Optional[int]:
+        """Current generation of the user's entry (None if the cache is unavailable)."""
+        try:
+            return self.backend.generation(key)
+        except Exception as e:
+            logger.warning(f"Portfolio cache unavailable: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Dict]]]:
+        """(etag, positions payload) of the user, or None on a miss."""
+        try:
+            value = self.backend.get(key)
+            if value is None:
+                return None
+            generation = self.backend.generation(key)
+        except Exception as e:
+            logger.warning(f"Portfolio cache unavailable: {e}")
+            return None
+        entry = json.loads(value)
+        if entry.get("generation") != generation:
+            return None
+        return entry["etag"], entry["positions"]
+
+    def set(self, key: str, positions: List[Dict], generation: Optional[int]) -> str:
+        """
+        Stores the user's positions payload, read at `generation`, and returns its ETag.
+        Nothing is stored if the entry was invalidated since then.
+        """
+        etag = self.etag(positions)
+        if generation is None:
+            return etag
+        try:
+            if self.backend.generation(key) == generation:
+                self.backend.set(key, json.dumps({"etag": etag, "positions": positions, "generation": generation}))
+        except Exception as e:
+            logger.warning(f"Portfolio cache unavailable: {e}")
+        return etag
+
+    def invalidate(self, key: str) -> None:
+        try:
+            self.backend.bump(key)
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Portfolio cache unavailable: {e}")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+def _build_cache() -> PortfolioCache:
+    if settings.PORTFOLIO_CACHE_REDIS_URL:
+        try:
+            return PortfolioCache(RedisBackend(settings.PORTFOLIO_CACHE_REDIS_URL, settings.PORTFOLIO_CACHE_TTL_SECONDS))
+        except ImportError:
+            logger.warning("PORTFOLIO_CACHE_REDIS_URL is set but the redis package is not installed: using the in-process cache.")
+    return PortfolioCache(MemoryBackend(settings.PORTFOLIO_CACHE_USERS, settings.PORTFOLIO_CACHE_TTL_SECONDS))
+
+portfolio_cache = _build_cache()
@@ -1,53 +1,182 @@
-from typing import List, Dict, Optional
+import logging
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.db.session import dialect_insert
+from app.models.asset import Asset
+from app.models.position import Position
 from app.models.transaction import Transaction
-from app.models.user import User
 from app.schemas.portfolio import PortfolioPosition
 
+logger = logging.getLogger(__name__)
+
 class PortfolioService:
+    @staticmethod
+    def _aggregate_columns():
+        """Net quantity, bought quantity and bought cost of a group of transactions."""
+        is_buy = Transaction.type == "BUY"
+        net_quantity = func.sum(
+            case(
+                (is_buy, Transaction.quantity),
+                (Transaction.type == "SELL", -Transaction.quantity),
+                else_=0.0,
+            )
+        )
+        bought_quantity = func.sum(case((is_buy, Transaction.quantity), else_=0.0))
+        bought_cost = func.sum(case((is_buy, Transaction.quantity * Transaction.price), else_=0.0))
+        return net_quantity, bought_quantity, bought_cost
+
     @staticmethod
     def calculate_portfolio(user_id: int, db: Session) -> List[PortfolioPosition]:
         """
         Calculates the current portfolio position for a given user.
-        Groups transactions by ticker, sums quantities, and calculates average price.
-        """
-        transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
-        
-        portfolio: Dict[str, Dict] = {}
-
-        for t in transactions:
-            ticker = t.asset.ticker
-            if ticker not in portfolio:
-                portfolio[ticker] = {"qty": 0.0, "total_cost": 0.0}
-            
-            if t.type == "BUY":
-                portfolio[ticker]["qty"] += t.quantity
-                # For simplified avg price, we track total cost of BUYs
-                portfolio[ticker]["total_cost"] += (t.quantity * t.price)
-            elif t.type == "SELL":
-                portfolio[ticker]["qty"] -= t.quantity
-                # We don't reduce total_cost here for the "Avg Buy Price" calculation 
-                # as requested significantly often in simple portfolio managers.
-                # However, to be more accurate for "Position Cost", we should reduce it.
-                # But sticking to the logic extracted from the endpoint:
-                # "Get purely BUYs to calculate true average BUY price"
-                pass
-
-        results = []
-        for ticker, data in portfolio.items():
-            # Recalculate Avg Price based on ALL Buys (Weighted Average Price)
-            # This follows the logic previously in the endpoint.
-            buys = [t for t in transactions if t.asset.ticker == ticker and t.type == "BUY"]
-            total_bought = sum(t.quantity for t in buys)
-            total_cost = sum(t.quantity * t.price for t in buys)
-            
-            avg_price = (total_cost / total_bought) if total_bought > 0 else 0.0
-            
-            if data["qty"] > 0: # Only show assets with positive balance
-                results.append(PortfolioPosition(
-                    ticker=ticker,
-                    total_quantity=data["qty"],
-                    average_price=avg_price
-                ))
-                
-        return results
+        The grouping is done by the database: one row per asset with the net quantity
+        (BUYs - SELLs) and the quantity and cost of the BUYs, so the response time does
+        not depend on how many transactions the user has loaded in Python.
+        The average price is the weighted average of ALL buys (sells don't change it).
+        """
+        net_quantity, bought_quantity, bought_cost = PortfolioService._aggregate_columns()
+
+        rows = (
+            db.query(Asset.ticker, net_quantity, bought_quantity, bought_cost)
+            .join(Transaction, Transaction.asset_id == Asset.id)
+            .filter(Transaction.user_id == user_id)
+            .group_by(Asset.id, Asset.ticker)
+            .having(net_quantity > 0)  # Only show assets with positive balance
+            .order_by(func.min(Transaction.id))
+            .all()
+        )
+
+        return [
+            PortfolioPosition(
+                ticker=ticker,
+                total_quantity=quantity,
+                average_price=(cost / bought) if bought > 0 else 0.0
+            )
+            for ticker, quantity, bought, cost in rows
+        ]
+
+    @staticmethod
+    def get_positions(user_id: int, db: Session) -> List[PortfolioPosition]:
+        """
+        Current positions read from the Position snapshot (one indexed lookup by user),
+        same result as calculate_portfolio without touching the transactions.
+        """
+        rows = db.execute(PortfolioService._positions_statement(user_id)).all()
+        return PortfolioService._to_positions(rows)
+
+    @staticmethod
+    async def get_positions_async(user_id: int, db: AsyncSession) -> List[PortfolioPosition]:
+        """get_positions on an AsyncSession."""
+        rows = (await db.execute(PortfolioService._positions_statement(user_id))).all()
+        return PortfolioService._to_positions(rows)
+
+    @staticmethod
+    def _positions_statement(user_id: int):
+        return (
+            select(Asset.ticker, Position.quantity, Position.average_price)
+            .join(Position, Position.asset_id == Asset.id)
+            .where(Position.user_id == user_id, Position.quantity > 0)
+            .order_by(Position.id)
+        )
+
+    @staticmethod
+    def _to_positions(rows) -> List[PortfolioPosition]:
+        return [
+            PortfolioPosition(ticker=ticker, total_quantity=quantity, average_price=average_price)
+            for ticker, quantity, average_price in rows
+        ]
+
+    @staticmethod
+    def apply_deltas(db: Session, user_id: int, deltas: Dict[int, Tuple[float, float, float]]) -> None:
+        """
+        Adds changes {asset_id: (net quantity, bought quantity, bought cost)} to the user's
+        Position rows with one upsert (INSERT ... ON CONFLICT (user_id, asset_id) DO UPDATE),
+        so the increments are atomic and two concurrent first buys of an asset cannot both
+        insert it. Does not commit: the caller commits it together with the transaction
+        inserts, so both always match.
+        """
+        if not deltas:
+            return
+        table = Position.__table__
+        now = datetime.utcnow()
+        statement = dialect_insert(db)(table).values([
+            {
+                "user_id": user_id, "asset_id": asset_id, "quantity": quantity, "buy_quantity": buy_quantity,
+                "buy_cost": buy_cost, "average_price": buy_cost / buy_quantity if buy_quantity > 0 else 0.0,
+                "updated_at": now,
+            }
+            # Sorted, so concurrent upserts lock the rows in the same order
+            for asset_id, (quantity, buy_quantity, buy_cost) in sorted(deltas.items())
+        ])
+        new = statement.excluded
+        buy_quantity = table.c.buy_quantity + new.buy_quantity
+        buy_cost = table.c.buy_cost + new.buy_cost
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.asset_id],
+            set_={
+                "quantity": table.c.quantity + new.quantity,
+                "buy_quantity": buy_quantity,
+                "buy_cost": buy_cost,
+                "average_price": case((buy_quantity > 0, buy_cost / buy_quantity), else_=0.0),
+                "updated_at": new.updated_at,
+            },
+        ))
+
+    @staticmethod
+    def apply_transaction(db: Session, transaction: Transaction) -> None:
+        """Applies a new transaction to its Position row (no commit, see apply_deltas)."""
+        if transaction.type == "BUY":
+            delta = (transaction.quantity, transaction.quantity, transaction.quantity * transaction.price)
+        elif transaction.type == "SELL":
+            delta = (-transaction.quantity, 0.0, 0.0)
+        else:
+            delta = (0.0, 0.0, 0.0)
+        PortfolioService.apply_deltas(db, transaction.user_id, {transaction.asset_id: delta})
+
+    @staticmethod
+    def rebuild_positions(db: Session, user_id: Optional[int] = None, tolerance: float = 1e-6) -> Dict[str, int]:
+        """
+        Reconciles the Position snapshot against the transaction log (all users or one):
+        recomputes every (user, asset) with the SQL aggregate, fixes the rows that drifted,
+        creates the missing ones and deletes rows without transactions. Commits at the end.
+        """
+        net_quantity, bought_quantity, bought_cost = PortfolioService._aggregate_columns()
+        query = db.query(Transaction.user_id, Transaction.asset_id, net_quantity, bought_quantity, bought_cost)
+        positions = db.query(Position)
+        if user_id is not None:
+            query = query.filter(Transaction.user_id == user_id)
+            positions = positions.filter(Position.user_id == user_id)
+
+        expected = {
+            (uid, asset_id): (quantity, bought, cost)
+            for uid, asset_id, quantity, bought, cost in query.group_by(Transaction.user_id, Transaction.asset_id)
+        }
+        stats = {"checked": 0, "fixed": 0, "created": 0, "deleted": 0}
+
+        for position in positions.all():
+            key = (position.user_id, position.asset_id)
+            if key not in expected:
+                db.delete(position)
+                stats["deleted"] += 1
+                continue
+            quantity, bought, cost = expected.pop(key)
+            stats["checked"] += 1
+            if (abs(position.quantity - quantity) > tolerance or abs(position.buy_quantity - bought) > tolerance
+                    or abs(position.buy_cost - cost) > tolerance):
+                logger.warning(f"Position {key} drifted from the transaction log, fixing it.")
+                position.quantity, position.buy_quantity, position.buy_cost = quantity, bought, cost
+                position.average_price = cost / bought if bought > 0 else 0.0
+                stats["fixed"] += 1
+
+        for (uid, asset_id), (quantity, bought, cost) in expected.items():
+            db.add(Position(
+                user_id=uid, asset_id=asset_id, quantity=quantity, buy_quantity=bought,
+                buy_cost=cost, average_price=cost / bought if bought > 0 else 0.0
+            ))
+            stats["created"] += 1
+
+        db.commit()
+        return stats
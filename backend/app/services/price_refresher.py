@@ -0,0 +1,254 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta, time as dtime
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy import insert, update, or_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import dialect_insert
+from app.models.asset import Asset
+from app.models.market_data import MarketData
+from app.models.position import Position
+from app.models.worker_lease import WorkerLease
+from app.services.market_data_provider import PriceProvider, get_price_provider
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "price_refresher"
+# Regular sessions of the exchanges we hold assets from (local time, Mon-Fri)
+MARKET_SESSIONS = [
+    (ZoneInfo("America/Sao_Paulo"), dtime(10, 0), dtime(18, 0)),   # B3
+    (ZoneInfo("America/New_York"), dtime(9, 30), dtime(16, 0)),    # NYSE / Nasdaq
+]
+
+# Last values reported by the refresher of this process (exposed by GET /metrics). The run
+# counters, duration and last success only move in the process holding the lease, so only the
+# leader's (price_refresher_leader 1) are meaningful; the lag is re-read from the DB on every
+# scrape, so every process reports the deployment-wide value.
+metrics: Dict[str, float] = {
+    "price_refresh_runs_total": 0,
+    "price_refresh_failures_total": 0,
+    "price_refresh_duration_seconds": 0.0,
+    "price_refresh_tickers": 0,
+    "price_refresh_lag_seconds": 0.0,
+    "price_refresh_last_success_timestamp": 0.0,
+    "price_refresher_leader": 0,
+}
+
+def market_open(now: Optional[datetime] = None) -> bool:
+    """True while any of MARKET_SESSIONS is trading (`now` is an aware datetime, default: current time)."""
+    now = now or datetime.now(ZoneInfo("UTC"))
+    for tz, open_at, close_at in MARKET_SESSIONS:
+        local = now.astimezone(tz)
+        if local.weekday() < 5 and open_at <= local.time() < close_at:
+            return True
+    return False
+
+def refresh_interval(now: Optional[datetime] = None) -> float:
+    """Seconds between refreshes: short while a market is open, long otherwise."""
+    if market_open(now):
+        return settings.PRICE_REFRESH_OPEN_INTERVAL_SECONDS
+    return settings.PRICE_REFRESH_CLOSED_INTERVAL_SECONDS
+
+def refresher_enabled() -> bool:
+    """settings.PRICE_REFRESHER_ENABLED, or when unset whether a real (non-placeholder) provider is configured."""
+    if settings.PRICE_REFRESHER_ENABLED is not None:
+        return settings.PRICE_REFRESHER_ENABLED
+    return get_price_provider().name != "static"
+
+def render_metrics(db: Optional[Session] = None) -> str:
+    """Metrics in the Prometheus text exposition format (the lag read from `db` when given)."""
+    if db is not None:
+        lag = PriceRefresher.lag_seconds(db, PriceRefresher.held_tickers(db))
+        metrics["price_refresh_lag_seconds"] = lag if lag != float("inf") else -1.0
+    lines = []
+    for name, value in metrics.items():
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+class PriceRefresher:
+    """
+    Keeps the marketdata table warm for every ticker any user holds, so requests hit
+    fresh cached prices instead of the provider. Runs in a daemon thread of each API
+    process (or standalone via price_refresher.py); a lease row in workerlease makes
+    sure only one process of the deployment refreshes at a time. A refresh is due when
+    the oldest held price is older than refresh_interval() (market-hours aware), so a
+    new leader picks up where the previous one stopped.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], provider: Optional[PriceProvider] = None,
+                 owner: Optional[str] = None):
+        self.session_factory = session_factory
+        self.provider = provider
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def held_tickers(db: Session) -> List[str]:
+        """Distinct tickers with an open position of any user."""
+        rows = (
+            db.query(Asset.ticker)
+            .join(Position, Position.asset_id == Asset.id)
+            .filter(Position.quantity > 0)
+            .distinct()
+            .order_by(Asset.ticker)
+        )
+        return [ticker for (ticker,) in rows]
+
+    def acquire_lease(self, db: Session) -> bool:
+        """Takes or renews the refresher lease. Returns whether this process holds it."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=settings.PRICE_REFRESHER_LEASE_SECONDS)
+        result = db.execute(
+            update(WorkerLease)
+            .where(WorkerLease.name == LEASE_NAME, or_(WorkerLease.owner == self.owner, WorkerLease.expires_at < now))
+            .values(owner=self.owner, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            db.commit()
+            return True
+        if db.query(WorkerLease.name).filter(WorkerLease.name == LEASE_NAME).first() is not None:
+            db.rollback()
+            return False
+        try:
+            db.execute(insert(WorkerLease), [{"name": LEASE_NAME, "owner": self.owner, "expires_at": expires_at}])
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+
+    def release_lease(self, db: Session) -> None:
+        db.query(WorkerLease).filter(WorkerLease.name == LEASE_NAME, WorkerLease.owner == self.owner).delete(
+            synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def lag_seconds(db: Session, tickers: List[str], now: Optional[datetime] = None) -> float:
+        """Age of the oldest cached price among `tickers` (infinite if one has never been fetched)."""
+        if not tickers:
+            return 0.0
+        now = now or datetime.utcnow()
+        count, oldest = db.query(func.count(MarketData.ticker), func.min(MarketData.last_updated)).filter(
+            MarketData.ticker.in_(tickers), MarketData.last_updated.isnot(None)
+        ).one()
+        if count < len(tickers) or oldest is None:
+            return float("inf")
+        return (now - oldest).total_seconds()
+
+    def refresh(self, db: Session, tickers: List[str]) -> int:
+        """
+        Fetches `tickers` in batches and upserts their prices, renewing the lease before
+        every batch after the first; stops early if the lease was lost to another process.
+        Returns how many were updated.
+        """
+        provider = self.provider or get_price_provider()
+        updated = 0
+        batch_size = settings.PRICE_REFRESH_BATCH_SIZE
+        for start in range(0, len(tickers), batch_size):
+            if start and not self.acquire_lease(db):
+                metrics["price_refresher_leader"] = 0
+                logger.warning(f"Price refresher lease lost after {start}/{len(tickers)} tickers, stopping.")
+                break
+            batch = tickers[start:start + batch_size]
+            prices = provider.get_prices(batch)
+            if not prices:
+                continue
+            now = datetime.utcnow()
+            statement = dialect_insert(db)(MarketData.__table__).values([
+                {"ticker": ticker, "price": price, "last_updated": now, "refresh_until": None}
+                # Sorted, so concurrent upserts lock the rows in the same order
+                for ticker, price in sorted(prices.items())
+            ])
+            # A request may have inserted a first-fetch placeholder meanwhile: overwrite it
+            new = statement.excluded
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[MarketData.ticker],
+                set_={"price": new.price, "last_updated": new.last_updated, "refresh_until": None},
+            ))
+            db.commit()
+            updated += len(prices)
+            missing = len(batch) - len(prices)
+            if missing:
+                logger.warning(f"Provider returned no price for {missing} of {len(batch)} tickers.")
+        return updated
+
+    def run_once(self, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        One scheduler tick: renews the lease and refreshes when due. Returns the number
+        of refreshed tickers, or None when this process is not the leader or nothing was due.
+        """
+        db = self.session_factory()
+        try:
+            leader = self.acquire_lease(db)
+            metrics["price_refresher_leader"] = int(leader)
+            if not leader:
+                return None
+
+            tickers = self.held_tickers(db)
+            lag = self.lag_seconds(db, tickers)
+            metrics["price_refresh_lag_seconds"] = lag if lag != float("inf") else -1.0
+            if not tickers or lag < refresh_interval(now):
+                return None
+
+            started = time.monotonic()
+            metrics["price_refresh_runs_total"] += 1
+            try:
+                updated = self.refresh(db, tickers)
+            except Exception:
+                metrics["price_refresh_failures_total"] += 1
+                db.rollback()
+                raise
+            duration = time.monotonic() - started
+            lag = self.lag_seconds(db, tickers)
+            metrics.update({
+                "price_refresh_duration_seconds": round(duration, 3),
+                "price_refresh_tickers": updated,
+                "price_refresh_lag_seconds": lag if lag != float("inf") else -1.0,
+                "price_refresh_last_success_timestamp": time.time(),
+            })
+            logger.info(f"Refreshed {updated}/{len(tickers)} held tickers in {duration:.2f}s.")
+            return updated
+        finally:
+            db.close()
+
+    def _loop(self) -> None:
+        # Ticks often enough to renew the lease well before it expires
+        tick = max(settings.PRICE_REFRESHER_LEASE_SECONDS / 3, 1.0)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Price refresh failed: {e}")
+            self._stop.wait(tick)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="price-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"Price refresher started ({self.owner}).")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        db = self.session_factory()
+        try:
+            self.release_lease(db)
+        finally:
+            db.close()
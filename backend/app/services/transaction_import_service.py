@@ -0,0 +1,227 @@
+import csv
+import re
+import logging
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, TextIO
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.db.session import dialect_insert
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.services.portfolio_service import PortfolioService
+
+logger = logging.getLogger(__name__)
+
+# Accepted header names (normalized: lowercase, no accents) for each field.
+# Covers our own CSV layout and the B3 "Negociação" statement export.
+COLUMN_ALIASES = {
+    "ticker": ["ticker", "ativo", "codigo de negociacao", "codigo", "produto"],
+    "type": ["type", "tipo", "tipo de movimentacao", "compra/venda", "c/v"],
+    "quantity": ["quantity", "quantidade", "qtd"],
+    "price": ["price", "preco", "preco unitario"],
+    "date": ["date", "data", "data do negocio", "data da operacao"],
+    "category": ["category", "categoria"],
+    "name": ["name", "nome"],
+}
+# Headers only found in the B3 export, whose numbers always use the comma as decimal separator
+B3_COLUMNS = {"codigo de negociacao", "tipo de movimentacao", "data do negocio"}
+TYPE_ALIASES = {"BUY": "BUY", "COMPRA": "BUY", "C": "BUY", "SELL": "SELL", "VENDA": "SELL", "V": "SELL"}
+FRACTIONAL_TICKER = re.compile(r"^[A-Z]{4}\d{1,2}F$")
+NUMBER = re.compile(r"^-?\d+([.,]\d+)*$")
+MAX_REPORTED_ERRORS = 50
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(text.strip().lower().split())
+
+def _parse_number(value: str, decimal: Optional[str] = None) -> float:
+    """
+    Accepts 1234.56, 1,234.56, 1.234,56 and R$ 1.234,56: unless the file's `decimal`
+    separator is known, the last of '.'/',' is the decimal separator and the other one
+    groups thousands (a repeated separator only groups thousands: 1.234.567). A single
+    separator followed by exactly three digits (1.234, 1,234) could be either, so it is
+    rejected when the separator had to be guessed.
+    """
+    text = (value or "").replace("R$", "").replace(" ", "").strip()
+    if not NUMBER.match(text):
+        raise ValueError(f"invalid number '{value}'")
+    separators = [char for char in text if char in ".,"]
+    if not separators:
+        return float(text)
+
+    guessed = decimal is None
+    decimal = decimal or separators[-1]
+    thousands = "," if decimal == "." else "."
+    if decimal in text:
+        integer, _, fraction = text.rpartition(decimal)
+        if decimal in integer:
+            integer, fraction, thousands = text, "", decimal
+    else:
+        integer, fraction = text, ""
+    digits = integer.lstrip("-")
+    groups = digits.split(thousands)
+    if len(groups) > 1 and (len(groups[0]) > 3 or any(len(group) != 3 for group in groups[1:])):
+        raise ValueError(f"invalid number '{value}'")
+    if guessed and len(separators) == 1 and len(fraction) == 3 and digits != "0" and len(digits) <= 3:
+        raise ValueError(f"ambiguous number '{value}': write 1.234,00 / 1,234.00 or 1234")
+    return float(integer.replace(thousands, "") + ("." + fraction if fraction else ""))
+
+def _parse_date(value: str) -> Optional[datetime]:
+    value = (value or "").strip()
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date '{value}'")
+
+class TransactionImportService:
+    """
+    Bulk import of transactions from a CSV/broker statement, streamed in chunks:
+    each chunk resolves (or creates) its assets with one query and inserts its
+    transactions with one batched execute; the per-asset totals are applied to the
+    positions snapshot once at the end. Everything runs in a single DB transaction,
+    committed at the end; invalid rows are skipped and reported.
+    """
+
+    @staticmethod
+    def _columns(header: Iterable[str]) -> Dict[str, str]:
+        normalized = {_normalize(column): column for column in header}
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in normalized:
+                    columns[field] = normalized[alias]
+                    break
+        missing = [field for field in ("ticker", "type", "quantity", "price") if field not in columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        return columns
+
+    @staticmethod
+    def _decimal_separator(header: Iterable[str]) -> Optional[str]:
+        """',' for the B3 statement layout, None (guessed per value) for any other file."""
+        return "," if B3_COLUMNS & {_normalize(column) for column in header} else None
+
+    @staticmethod
+    def _parse_row(row: Dict[str, str], columns: Dict[str, str], decimal: Optional[str] = None) -> Dict:
+        ticker = (row.get(columns["ticker"]) or "").strip().upper()
+        if not ticker:
+            raise ValueError("empty ticker")
+        if FRACTIONAL_TICKER.match(ticker):
+            ticker = ticker[:-1]  # B3 fractional market code (PETR4F) -> PETR4
+        tx_type = TYPE_ALIASES.get((row.get(columns["type"]) or "").strip().upper())
+        if tx_type is None:
+            raise ValueError(f"unknown type '{row.get(columns['type'])}'")
+        quantity = _parse_number(row.get(columns["quantity"]), decimal)
+        price = _parse_number(row.get(columns["price"]), decimal)
+        if quantity <= 0 or price < 0:
+            raise ValueError("quantity must be positive and price non-negative")
+        parsed = {"ticker": ticker, "type": tx_type, "quantity": quantity, "price": price}
+        if "date" in columns:
+            parsed["date"] = _parse_date(row.get(columns["date"]))
+        category = row.get(columns["category"]) if "category" in columns else None
+        name = row.get(columns["name"]) if "name" in columns else None
+        parsed["category"] = (category or "").strip().upper() or None
+        parsed["name"] = (name or "").strip() or None
+        return parsed
+
+    @staticmethod
+    def _resolve_assets(db: Session, rows: List[Dict], asset_ids: Dict[str, int]) -> int:
+        """
+        Fills asset_ids for the tickers of the chunk, creating the missing assets. Returns
+        how many were created (ON CONFLICT DO NOTHING: an asset created meanwhile by a
+        concurrent import is reused, not counted).
+        """
+        pending = {row["ticker"]: row for row in rows if row["ticker"] not in asset_ids}
+        if not pending:
+            return 0
+        for asset_id, ticker in db.query(Asset.id, Asset.ticker).filter(Asset.ticker.in_(list(pending))):
+            asset_ids[ticker] = asset_id
+        missing = [ticker for ticker in pending if ticker not in asset_ids]
+        if not missing:
+            return 0
+        result = db.execute(
+            dialect_insert(db)(Asset.__table__).values([
+                {"ticker": ticker, "category": pending[ticker]["category"], "name": pending[ticker]["name"]}
+                for ticker in sorted(missing)
+            ]).on_conflict_do_nothing(index_elements=[Asset.ticker])
+        )
+        for asset_id, ticker in db.query(Asset.id, Asset.ticker).filter(Asset.ticker.in_(missing)):
+            asset_ids[ticker] = asset_id
+        return result.rowcount
+
+    @staticmethod
+    def import_csv(db: Session, user_id: int, stream: TextIO, chunk_size: int = 1000, delimiter: Optional[str] = None) -> Dict:
+        """
+        Imports the transactions of a CSV text stream for a user. The delimiter is
+        sniffed from the header (',' or ';') when not given. Returns
+        {"created", "skipped", "assets_created", "errors"}.
+        """
+        header_line = stream.readline()
+        if not header_line.strip():
+            raise ValueError("Empty file")
+        delimiter = delimiter or (";" if header_line.count(";") > header_line.count(",") else ",")
+        header = next(csv.reader([header_line], delimiter=delimiter))
+        columns = TransactionImportService._columns(header)
+        decimal = TransactionImportService._decimal_separator(header)
+        reader = csv.DictReader(stream, fieldnames=header, delimiter=delimiter)
+
+        summary = {"created": 0, "skipped": 0, "assets_created": 0, "errors": []}
+        asset_ids: Dict[str, int] = {}
+        deltas = defaultdict(lambda: [0.0, 0.0, 0.0])
+        line = 1
+        try:
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+                rows = []
+                for raw in chunk:
+                    line += 1
+                    try:
+                        rows.append(TransactionImportService._parse_row(raw, columns, decimal))
+                    except (ValueError, TypeError) as e:
+                        summary["skipped"] += 1
+                        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                            summary["errors"].append(f"line {line}: {e}")
+                if not rows:
+                    continue
+
+                summary["assets_created"] += TransactionImportService._resolve_assets(db, rows, asset_ids)
+                now = datetime.utcnow()
+                db.execute(insert(Transaction), [
+                    {
+                        "user_id": user_id, "asset_id": asset_ids[row["ticker"]], "type": row["type"],
+                        "quantity": row["quantity"], "price": row["price"], "date": row.get("date") or now,
+                    }
+                    for row in rows
+                ])
+
+                for row in rows:
+                    delta = deltas[asset_ids[row["ticker"]]]
+                    if row["type"] == "BUY":
+                        delta[0] += row["quantity"]
+                        delta[1] += row["quantity"]
+                        delta[2] += row["quantity"] * row["price"]
+                    else:
+                        delta[0] -= row["quantity"]
+                summary["created"] += len(rows)
+
+            # One positions update for the whole file, in the same DB transaction
+            PortfolioService.apply_deltas(db, user_id, {asset_id: tuple(delta) for asset_id, delta in deltas.items()})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        logger.info(
+            f"Imported {summary['created']} transactions for user {user_id} "
+            f"({summary['skipped']} skipped, {summary['assets_created']} new assets)."
+        )
+        return summary
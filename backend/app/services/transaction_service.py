@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction
+
+class TransactionService:
+    @staticmethod
+    def encode_cursor(transaction: Transaction) -> str:
+        raw = f"{transaction.date.isoformat()}|{transaction.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            date_str, id_str = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(date_str), int(id_str)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    def _page_statement(
+        user_id: int,
+        limit: int,
+        cursor: Optional[str],
+        asset_id: Optional[int],
+        type: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ):
+        statement = select(Transaction).where(Transaction.user_id == user_id)
+        if asset_id is not None:
+            statement = statement.where(Transaction.asset_id == asset_id)
+        if type:
+            statement = statement.where(Transaction.type == type.upper())
+        if start is not None:
+            statement = statement.where(Transaction.date >= start)
+        if end is not None:
+            statement = statement.where(Transaction.date < end)
+        if cursor:
+            last_date, last_id = TransactionService.decode_cursor(cursor)
+            statement = statement.where(or_(
+                Transaction.date < last_date,
+                and_(Transaction.date == last_date, Transaction.id < last_id),
+            ))
+        return statement.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1)
+
+    @staticmethod
+    def _page(rows: List[Transaction], limit: int) -> Tuple[List[Transaction], Optional[str]]:
+        next_cursor = TransactionService.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    @staticmethod
+    def list_transactions(
+        db: Session,
+        user_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        asset_id: Optional[int] = None,
+        type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        """
+        One page of the user's transactions, newest first, with keyset pagination:
+        the cursor is the (date, id) of the last row of the previous page, so every
+        page is an index range scan on (user_id[, asset_id], date, id) and costs the
+        same no matter how deep the user scrolls. Returns (rows, next_cursor).
+        """
+        statement = TransactionService._page_statement(user_id, limit, cursor, asset_id, type, start, end)
+        return TransactionService._page(db.execute(statement).scalars().all(), limit)
+
+    @staticmethod
+    async def list_transactions_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        asset_id: Optional[int] = None,
+        type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        """list_transactions on an AsyncSession."""
+        statement = TransactionService._page_statement(user_id, limit, cursor, asset_id, type, start, end)
+        return TransactionService._page((await db.execute(statement)).scalars().all(), limit)
@@ -0,0 +1,327 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, case, func, select, type_coerce
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import dialect_insert
+from app.models.asset import Asset
+from app.models.daily_close import DailyClose
+from app.models.transaction import Transaction
+from app.services.downsampling import lttb_indices
+from app.services.market_data_provider import PriceProvider, get_price_provider
+
+logger = logging.getLogger(__name__)
+
+# Days near today whose closes may still arrive late: never cached
+SETTLE_DAYS = 5
+# Closes looked up before the range start, so the first days can be forward-filled
+LOOKBACK_DAYS = 10
+
+class ValuationService:
+    """
+    Daily value of a user's portfolio over a date range, rebuilt from the transaction log.
+
+    Holdings are a (days x assets) matrix: the signed quantities are scattered on their
+    day (everything before the range lands on its first day) and cumulated along the
+    days; the value is the row sum of holdings x daily closes (forward-filled over
+    weekends and holidays). Closes come from the dailyclose table, filled from the
+    provider the first time a range is needed.
+
+    Settled days are cached per user (LRU of settings.VALUATION_CACHE_USERS users) together
+    with the last transaction id seen: a request that finds newer transactions drops the
+    cached days from the earliest of their dates on, so a back-dated insert only
+    recomputes the series from that date, in any worker.
+    """
+
+    _cache: "OrderedDict[int, Dict]" = OrderedDict()
+    _lock = threading.Lock()
+    # Ranges already requested from the provider per ticker, so tickers without older
+    # history (recent listings) are not fetched again on every request: (first, last,
+    # monotonic time of the fetch, which bounds how long unsettled closes are trusted)
+    _fetched: Dict[str, Tuple[date, date, float]] = {}
+    # Settled closes per ticker: (first day, last day loaded, Series of closes)
+    _close_cache: Dict[str, Tuple[date, date, pd.Series]] = {}
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._lock:
+            cls._cache.clear()
+            cls._fetched.clear()
+            cls._close_cache.clear()
+
+    @classmethod
+    def _ensure_closes(cls, db: Session, tickers: List[str], start: date, end: date, provider: PriceProvider) -> None:
+        """
+        Fetches from the provider and stores the closes of [start, end] missing from
+        dailyclose. Closes of the last SETTLE_DAYS days may still change (stored while
+        trading, late corrections): while the range reaches them they are fetched again,
+        at most every settings.MARKET_DATA_MAX_AGE_SECONDS, and overwrite the stored rows.
+        Rows are tagged with the provider's name and only rows of the current provider
+        count as stored, so closes of another provider (e.g. the static placeholder) are
+        fetched again and overwritten. Settled closes of the same provider are left as
+        they are, so concurrent requests filling the same days never collide.
+        """
+        settled = datetime.utcnow().date() - timedelta(days=SETTLE_DAYS)
+        now = time.monotonic()
+        with cls._lock:
+            known = {ticker: cls._fetched.get(ticker) for ticker in tickers}
+        unchecked = [
+            ticker for ticker in tickers
+            if known[ticker] is None or known[ticker][0] > start or known[ticker][1] < end
+            or (end > settled and now - known[ticker][2] > settings.MARKET_DATA_MAX_AGE_SECONDS)
+        ]
+        if not unchecked:
+            return
+        coverage = {
+            ticker: (first, last)
+            for ticker, first, last in db.query(DailyClose.ticker, func.min(DailyClose.date), func.max(DailyClose.date))
+            .filter(DailyClose.ticker.in_(unchecked), DailyClose.source == provider.name)
+            .group_by(DailyClose.ticker)
+        }
+        requests: Dict[Tuple[date, date], List[str]] = {}
+        covered_from: Dict[str, date] = {}
+        for ticker in unchecked:
+            first, last = coverage.get(ticker, (None, None))
+            if first is None or first > start:
+                fetch_range = (start, end)
+                covered_from[ticker] = start
+            elif last < end or end > settled:
+                # The days after the last stored one, and the unsettled ones stored before
+                fetch_range = (min(last, settled) + timedelta(days=1), end)
+                covered_from[ticker] = first
+            else:
+                with cls._lock:
+                    cls._fetched[ticker] = (first, end, now)
+                continue
+            requests.setdefault(fetch_range, []).append(ticker)
+
+        insert_close = dialect_insert(db)
+        table = DailyClose.__table__
+        for (fetch_start, fetch_end), batch in requests.items():
+            try:
+                history = provider.get_history(batch, fetch_start, fetch_end)
+            except Exception as e:
+                logger.error(f"Failed to fetch history of {len(batch)} tickers: {e}")
+                continue
+            rows = [
+                {"ticker": ticker, "date": day, "close": close, "source": provider.name}
+                for ticker, closes in history.items()
+                for day, close in closes.items()
+            ]
+            settled_rows = [row for row in rows if row["date"] <= settled]
+            fresh_rows = [row for row in rows if row["date"] > settled]
+            key = [table.c.ticker, table.c.date]
+            if settled_rows:
+                statement = insert_close(table)
+                new = statement.excluded
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=key, set_={"close": new.close, "source": new.source},
+                    where=table.c.source != new.source,
+                ), settled_rows)
+            if fresh_rows:
+                statement = insert_close(table)
+                new = statement.excluded
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=key, set_={"close": new.close, "source": new.source}
+                ), fresh_rows)
+            if rows:
+                db.commit()
+            with cls._lock:
+                for ticker in batch:
+                    previous = cls._fetched.get(ticker)
+                    first = min(covered_from[ticker], previous[0]) if previous else covered_from[ticker]
+                    last = max(fetch_end, previous[1]) if previous else fetch_end
+                    cls._fetched[ticker] = (first, last, now)
+
+    @staticmethod
+    def _query_closes(db: Session, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """Closes stored in dailyclose, as a (days x tickers) frame."""
+        # Bulk of the rows: Core execution, driver-native dates (ISO strings on SQLite,
+        # parsed by pandas in one vectorized pass) and a columnar frame
+        rows = db.connection().execute(
+            select(DailyClose.ticker, type_coerce(DailyClose.date, String), DailyClose.close).where(
+                DailyClose.ticker.in_(tickers), DailyClose.date.between(start, end)
+            )
+        ).all()
+        close_tickers, close_days, close_values = zip(*rows) if rows else ((), (), ())
+        frame = pd.DataFrame({
+            "ticker": close_tickers,
+            "date": pd.to_datetime(list(close_days)),
+            "close": np.asarray(close_values, dtype=float),
+        })
+        return frame.pivot(index="date", columns="ticker", values="close")
+
+    @classmethod
+    def _closes(cls, db: Session, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """
+        Closes of [start, end] as a (days x tickers) frame. Settled closes are kept in
+        memory per ticker (shared by all users), so only tickers never loaded over that
+        range, and the last unsettled days, are read from dailyclose.
+        """
+        settled = datetime.utcnow().date() - timedelta(days=SETTLE_DAYS)
+        with cls._lock:
+            known = {ticker: cls._close_cache.get(ticker) for ticker in tickers}
+        cold = [
+            ticker for ticker in tickers
+            if known[ticker] is None or known[ticker][0] > start or known[ticker][1] < min(end, settled)
+        ]
+        cold_set = set(cold)
+        warm = [ticker for ticker in tickers if ticker not in cold_set]
+
+        frame = pd.DataFrame()
+        if cold:
+            frame = cls._query_closes(db, cold, start, end)
+            loaded = frame[frame.index <= pd.Timestamp(settled)]
+            loaded_end = min(end, settled)
+            with cls._lock:
+                for ticker in cold:
+                    previous = known[ticker]
+                    column = loaded[ticker].dropna() if ticker in loaded else pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+                    if previous is not None and previous[0] <= loaded_end and previous[1] >= start:
+                        # Overlapping ranges: keep the union
+                        column = pd.concat([previous[2], column])
+                        column = column[~column.index.duplicated(keep="last")].sort_index()
+                        cls._close_cache[ticker] = (min(start, previous[0]), max(loaded_end, previous[1]), column)
+                    else:
+                        cls._close_cache[ticker] = (start, loaded_end, column)
+        if warm:
+            # Cached days end at `settled`, the unsettled tail comes after: plain concatenations
+            cached = pd.concat({ticker: known[ticker][2].loc[pd.Timestamp(start):pd.Timestamp(end)] for ticker in warm}, axis=1)
+            if end > settled:
+                cached = pd.concat([cached, cls._query_closes(db, warm, settled + timedelta(days=1), end)])
+            frame = cached if frame.empty else pd.concat([frame, cached], axis=1)
+        return frame
+
+    @classmethod
+    def _compute(cls, db: Session, user_id: int, start: date, end: date, provider: PriceProvider) -> pd.Series:
+        """Value of every calendar day in [start, end] (DatetimeIndex)."""
+        days = pd.date_range(start, end, freq="D")
+        signed_quantity = case(
+            (Transaction.type == "BUY", Transaction.quantity),
+            (Transaction.type == "SELL", -Transaction.quantity),
+            else_=0.0,
+        )
+        rows = db.execute(
+            select(Asset.ticker, Transaction.date, signed_quantity)
+            .join(Asset, Asset.id == Transaction.asset_id)
+            .where(Transaction.user_id == user_id, Transaction.date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        ).all()
+        if not rows:
+            return pd.Series(0.0, index=days)
+
+        tickers = sorted({ticker for ticker, _, _ in rows})
+        column = {ticker: i for i, ticker in enumerate(tickers)}
+        origin = np.datetime64(start, "D")
+        day_idx = np.array([np.datetime64(when, "D") for _, when, _ in rows]) - origin
+        day_idx = np.clip(day_idx.astype(np.int64), 0, None)  # before the range: opening holdings
+        asset_idx = np.fromiter((column[ticker] for ticker, _, _ in rows), dtype=np.int64, count=len(rows))
+        quantity = np.fromiter((q or 0.0 for _, _, q in rows), dtype=float, count=len(rows))
+
+        holdings = np.zeros((len(days), len(tickers)))
+        np.add.at(holdings, (day_idx, asset_idx), quantity)
+        holdings = np.cumsum(holdings, axis=0)
+
+        lookback = start - timedelta(days=LOOKBACK_DAYS)
+        cls._ensure_closes(db, tickers, lookback, end, provider)
+        prices = cls._closes(db, tickers, lookback, end).reindex(
+            index=pd.date_range(lookback, end, freq="D"), columns=tickers
+        ).ffill().loc[days]
+        # Held before the first known close: value at the first close rather than zero
+        prices = prices.bfill().fillna(0.0)
+
+        return pd.Series((holdings * prices.to_numpy()).sum(axis=1), index=days)
+
+    @classmethod
+    def get_series(cls, db: Session, user_id: int, start: Optional[date] = None, end: Optional[date] = None,
+                   provider: Optional[PriceProvider] = None) -> pd.Series:
+        """
+        Daily portfolio value between start (default: first transaction) and end
+        (default: today), indexed by day.
+        """
+        provider = provider or get_price_provider()
+        today = datetime.utcnow().date()
+        end = end or today
+        if start is None:
+            first = db.query(func.min(Transaction.date)).filter(Transaction.user_id == user_id).scalar()
+            start = first.date() if first else end
+        if start > end:
+            return pd.Series(dtype=float)
+
+        with cls._lock:
+            entry = cls._cache.get(user_id)
+            if entry is not None:
+                cls._cache.move_to_end(user_id)
+        if entry is None:
+            last_id = db.query(func.max(Transaction.id)).filter(Transaction.user_id == user_id).scalar() or 0
+            entry = {"series": pd.Series(dtype=float), "last_tx_id": last_id, "downsampled": {}}
+        else:
+            changed_from, last_id = db.query(func.min(Transaction.date), func.max(Transaction.id)).filter(
+                Transaction.user_id == user_id, Transaction.id > entry["last_tx_id"]
+            ).one()
+            if last_id is not None:
+                cutoff = pd.Timestamp(changed_from.date())
+                entry = {"series": entry["series"][entry["series"].index < cutoff], "last_tx_id": last_id, "downsampled": {}}
+
+        cached = entry["series"]
+        settled = min(end, today - timedelta(days=SETTLE_DAYS))
+        start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+        if not cached.empty and cached.index[0] <= start_ts and cached.index[-1] >= pd.Timestamp(settled):
+            # Only the unsettled tail (or what the cache doesn't reach) is computed
+            tail_start = max(start, (cached.index[-1] + pd.Timedelta(days=1)).date())
+            series = cached[(cached.index >= start_ts) & (cached.index <= end_ts)]
+            if tail_start <= end:
+                series = pd.concat([series, cls._compute(db, user_id, tail_start, end, provider)])
+        else:
+            series = cls._compute(db, user_id, start, end, provider)
+
+        to_cache = series[series.index <= pd.Timestamp(settled)]
+        if not to_cache.empty:
+            if not cached.empty and cached.index[0] <= to_cache.index[-1] + pd.Timedelta(days=1) \
+                    and cached.index[-1] >= to_cache.index[0] - pd.Timedelta(days=1):
+                # Contiguous or overlapping with the cached days: extend the cached range
+                to_cache = pd.concat([cached, to_cache])
+                to_cache = to_cache[~to_cache.index.duplicated(keep="last")].sort_index()
+            # Downsampled ranges stay valid: cached days only change through the truncation above
+            entry = {"series": to_cache, "last_tx_id": entry["last_tx_id"], "downsampled": entry["downsampled"]}
+        with cls._lock:
+            cls._cache[user_id] = entry
+            cls._cache.move_to_end(user_id)
+            while len(cls._cache) > settings.VALUATION_CACHE_USERS:
+                cls._cache.popitem(last=False)
+        return series
+
+    @classmethod
+    def get_chart_series(cls, db: Session, user_id: int, start: Optional[date] = None, end: Optional[date] = None,
+                         points: Optional[int] = None, provider: Optional[PriceProvider] = None) -> pd.Series:
+        """
+        get_series downsampled to about `points` points with LTTB. The settled days are
+        downsampled once per (range, resolution) and cached with the user's series; the
+        few unsettled days at the end are appended as they are.
+        """
+        series = cls.get_series(db, user_id, start=start, end=end, provider=provider)
+        if not points or len(series) <= points:
+            return series
+
+        settled = pd.Timestamp(datetime.utcnow().date() - timedelta(days=SETTLE_DAYS))
+        head = series[series.index <= settled]
+        tail = series[series.index > settled]
+        threshold = points - len(tail)
+        if head.empty or threshold < 3:
+            return series
+        key = (head.index[0], head.index[-1], threshold)
+        with cls._lock:
+            entry = cls._cache.get(user_id)
+            kept = entry["downsampled"].get(key) if entry is not None else None
+        if kept is None:
+            x = head.index.to_numpy(dtype="datetime64[D]").astype(np.int64)
+            kept = head.iloc[lttb_indices(x, head.to_numpy(), threshold)]
+            if entry is not None:
+                with cls._lock:
+                    entry["downsampled"][key] = kept
+        return pd.concat([kept, tail])
@@ -8,6 +8,9 @@ from app.models.user import User
 from app.models.asset import Asset
 from app.models.transaction import Transaction
 from app.models.market_data import MarketData
+from app.models.position import Position
+from app.models.worker_lease import WorkerLease
+from app.models.daily_close import DailyClose
 
 def init():
     try:
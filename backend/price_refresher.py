@@ -0,0 +1,33 @@
+
+# price_refresher.py
+import sys
+import time
+import logging
+from app.db.session import SessionLocal
+# Import all models to ensure they are registered with Base.metadata
+from app.models.user import User
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.analysis import AIAnalysis
+from app.models.position import Position
+from app.services.price_refresher import PriceRefresher
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+def main(once=False):
+    """Runs the price refresher next to the API (set PRICE_REFRESHER_ENABLED=false there)."""
+    refresher = PriceRefresher(SessionLocal)
+    if once:
+        updated = refresher.run_once()
+        print(f"Refreshed {updated or 0} tickers.")
+        return 0
+    refresher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        refresher.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(once="--once" in sys.argv))
@@ -0,0 +1,33 @@
+
+# rebuild_positions.py
+import sys
+from app.db.session import SessionLocal
+# Import all models to ensure they are registered with Base.metadata
+from app.models.user import User
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.analysis import AIAnalysis
+from app.models.position import Position
+from app.services.portfolio_service import PortfolioService
+
+def rebuild(user_id=None):
+    db = SessionLocal()
+    try:
+        target = f"user {user_id}" if user_id is not None else "all users"
+        print(f"Reconciling positions of {target} against the transaction log...")
+        stats = PortfolioService.rebuild_positions(db, user_id=user_id)
+        print(
+            f"Done: {stats['checked']} checked, {stats['fixed']} fixed, "
+            f"{stats['created']} created, {stats['deleted']} deleted."
+        )
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding positions: {e}")
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    exit_code = rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    sys.exit(exit_code)
@@ -0,0 +1,33 @@
+import os
+
+# app.core.config requires these; tests run against an in-memory SQLite database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("BACKEND_URL", "http://localhost:8000")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.base import Base
+# Import all models to ensure they are registered with Base.metadata
+from app.models.user import User
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.analysis import AIAnalysis
+from app.models.market_data import MarketData
+from app.models.position import Position
+from app.models.worker_lease import WorkerLease
+from app.models.daily_close import DailyClose
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,51 @@
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.db.session import async_database_url
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.portfolio_service import PortfolioService
+from app.services.transaction_service import TransactionService
+
+def test_async_database_url_picks_the_async_driver():
+    assert async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_database_url("postgresql://u:p@db:5432/hype?sslmode=require") \
+        == "postgresql+asyncpg://u:p@db:5432/hype?ssl=require"
+    assert async_database_url("postgresql+psycopg2://u:p@db/hype").startswith("postgresql+asyncpg://u:p@db/hype")
+
+def test_async_reads_match_the_sync_ones(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="investor@example.com")
+    aapl = Asset(ticker="AAPL")
+    db.add_all([user, aapl])
+    db.commit()
+    for quantity in (10, 5):
+        transaction = Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=quantity, price=100.0)
+        db.add(transaction)
+        db.flush()
+        PortfolioService.apply_transaction(db, transaction)
+    db.commit()
+
+    async def read():
+        async_engine = create_async_engine(async_database_url(url))
+        try:
+            async with async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)() as session:
+                positions = await PortfolioService.get_positions_async(user.id, session)
+                page, cursor = await TransactionService.list_transactions_async(session, user.id, limit=1)
+                return positions, page, cursor
+        finally:
+            await async_engine.dispose()
+
+    positions, page, cursor = asyncio.run(read())
+
+    assert positions == PortfolioService.get_positions(user.id, db)
+    assert [t.id for t in page] == [t.id for t in TransactionService.list_transactions(db, user.id, limit=1)[0]]
+    assert cursor is not None
+    db.close()
+    engine.dispose()
@@ -0,0 +1,17 @@
+import numpy as np
+from app.services.downsampling import lttb_indices
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000.0)
+    y = np.sin(x / 50.0)
+    y[437] = 5.0  # isolated spike
+
+    kept = lttb_indices(x, y, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert 437 in kept
+
+def test_lttb_returns_everything_below_threshold():
+    assert lttb_indices(np.arange(5.0), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,22 @@
+import json
+from app.services.market_data_provider import StaticPriceProvider, ReplayPriceProvider
+
+def _write(root, kind, ticker, payload):
+    folder = root / kind
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / f"{ticker}.json").write_text(json.dumps(payload))
+
+def test_static_provider_returns_fixed_price():
+    prices = StaticPriceProvider().get_prices(["PETR4.SA", "AAPL"])
+    assert prices == {"PETR4.SA": 100.0, "AAPL": 100.0}
+
+def test_replay_provider_reads_recorded_fixtures(tmp_path):
+    _write(tmp_path, "last_price", "PETR4.SA", {"ticker": "PETR4.SA", "price": 37.5})
+    # BRL=X is stored with a filesystem-safe name and only has history
+    _write(tmp_path, "history", "BRL_X", {"ticker": "BRL=X", "data": {
+        "columns": ["Close"], "index": ["2026-10-15", "2026-10-16"], "data": [[5.40], [5.45]]
+    }})
+
+    prices = ReplayPriceProvider(str(tmp_path)).get_prices(["PETR4.SA", "BRL=X", "MISSING"])
+
+    assert prices == {"PETR4.SA": 37.5, "BRL=X": 5.45}
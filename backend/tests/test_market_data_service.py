@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.models.market_data import MarketData
+from app.services.market_data_provider import PriceProvider
+from app.services.market_data_service import MarketDataService
+
+class CountingProvider(PriceProvider):
+    def __init__(self, price=42.0, latency=0.0):
+        self.price = price
+        self.latency = latency
+        self.calls = []
+
+    def get_prices(self, tickers):
+        self.calls.append(list(tickers))
+        time.sleep(self.latency)
+        return {ticker: self.price for ticker in tickers}
+
+def test_get_prices_serves_fresh_rows_and_refreshes_stale_ones_in_one_call(db):
+    now = datetime.utcnow()
+    db.add_all([
+        MarketData(ticker="FRESH", price=10.0, last_updated=now),
+        MarketData(ticker="STALE", price=20.0, last_updated=now - timedelta(days=1)),
+    ])
+    db.commit()
+    provider = CountingProvider()
+
+    prices = MarketDataService.get_prices(db, ["FRESH", "STALE", "NEW"], provider=provider)
+
+    assert prices == {"FRESH": 10.0, "STALE": 42.0, "NEW": 42.0}
+    assert len(provider.calls) == 1 and sorted(provider.calls[0]) == ["NEW", "STALE"]
+    rows = {row.ticker: row for row in db.query(MarketData)}
+    assert rows["NEW"].price == 42.0 and rows["NEW"].refresh_until is None
+    # Now cached: no further provider calls
+    assert MarketDataService.get_prices(db, ["STALE", "NEW"], provider=provider) == {"STALE": 42.0, "NEW": 42.0}
+    assert len(provider.calls) == 1
+
+def test_get_prices_serves_the_cached_price_while_another_worker_refreshes(db):
+    now = datetime.utcnow()
+    db.add(MarketData(ticker="PETR4.SA", price=30.0, last_updated=now - timedelta(days=1),
+                      refresh_until=now + timedelta(minutes=1)))
+    db.commit()
+    provider = CountingProvider()
+
+    # Another worker is refreshing it: serve the cached price instead of a second call
+    assert MarketDataService.get_prices(db, ["PETR4.SA"], provider=provider) == {"PETR4.SA": 30.0}
+    assert provider.calls == []
+
+def test_first_fetch_placeholder_is_never_served_and_is_reclaimed(db):
+    now = datetime.utcnow()
+    # Placeholder of a first fetch running in another worker (leased) and of a dead one (expired)
+    db.execute(MarketData.__table__.insert(), [
+        {"ticker": "BUSY", "price": 0.0, "last_updated": None, "refresh_until": now + timedelta(minutes=1)},
+        {"ticker": "DEAD", "price": 0.0, "last_updated": None, "refresh_until": now - timedelta(minutes=1)},
+    ])
+    db.commit()
+    provider = CountingProvider()
+
+    prices = MarketDataService.get_prices(db, ["BUSY", "DEAD"], provider=provider)
+
+    assert prices == {"DEAD": 42.0}
+    assert provider.calls == [["DEAD"]]
+
+def test_concurrent_requests_share_one_refresh(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'prices.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    provider = CountingProvider(latency=0.2)
+    results = []
+
+    def request():
+        session = Session()
+        try:
+            results.append(MarketDataService.get_prices(session, ["VALE3.SA"], provider=provider))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    assert results == [{"VALE3.SA": 42.0}] * 8
+    assert provider.calls == [["VALE3.SA"]]
@@ -0,0 +1,103 @@
+import pytest
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.api import deps
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.db.session import async_database_url
+from app.main import app
+from app.models.asset import Asset
+from app.models.user import User
+from app.services.portfolio_cache import MemoryBackend, PortfolioCache, portfolio_cache
+from app.services.portfolio_service import PortfolioService
+
+def test_memory_backend_evicts_least_recently_used_and_expires():
+    cache = PortfolioCache(MemoryBackend(max_entries=2, ttl_seconds=60))
+    cache.set("a", [{"ticker": "AAPL"}], 0)
+    cache.set("b", [], 0)
+    cache.get("a")
+    cache.set("c", [], 0)
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    expiring = PortfolioCache(MemoryBackend(max_entries=2, ttl_seconds=-1))
+    expiring.set("a", [], 0)
+    assert expiring.get("a") is None
+
+def test_snapshot_read_before_an_invalidation_is_not_stored():
+    cache = PortfolioCache(MemoryBackend(max_entries=2, ttl_seconds=60))
+    generation = cache.generation("a")
+    stale = [{"ticker": "AAPL", "total_quantity": 1.0}]
+    cache.invalidate("a")  # a write commits while the miss is reading the positions
+
+    cache.set("a", stale, generation)
+
+    assert cache.get("a") is None
+    cache.set("a", [], cache.generation("a"))
+    assert cache.get("a") is not None
+
+@pytest.fixture
+def client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    db = Session()
+    db.add_all([User(email="investor@example.com"), Asset(ticker="AAPL")])
+    db.commit()
+    db.close()
+
+    app.dependency_overrides[deps.get_db] = get_db
+    app.dependency_overrides[deps.get_async_db] = get_async_db
+    portfolio_cache.clear()
+    token = create_access_token({"sub": "investor@example.com"}, timedelta(minutes=5))
+    yield TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    app.dependency_overrides.clear()
+    portfolio_cache.clear()
+    engine.dispose()
+
+def test_portfolio_etag_revalidation_and_invalidation_on_write(client):
+    first = client.get("/api/v1/portfolio/portfolio")
+    assert first.status_code == 200 and first.json() == []
+    etag = first.headers["etag"]
+
+    assert client.get("/api/v1/portfolio/portfolio", headers={"If-None-Match": etag}).status_code == 304
+
+    created = client.post("/api/v1/portfolio/transactions", json={"asset_id": 1, "type": "BUY", "quantity": 2, "price": 10.0})
+    assert created.status_code == 200
+
+    after = client.get("/api/v1/portfolio/portfolio", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.json() == [{"ticker": "AAPL", "total_quantity": 2.0, "average_price": 10.0}]
+    assert after.headers["etag"] != etag
+
+def test_write_during_a_miss_does_not_cache_the_old_positions(client, monkeypatch):
+    read_positions = PortfolioService.get_positions_async
+
+    async def racing_read(user_id, db):
+        positions = await read_positions(user_id, db)
+        # A transaction is created (and the entry invalidated) after this read
+        portfolio_cache.invalidate("investor@example.com")
+        return positions
+
+    monkeypatch.setattr(PortfolioService, "get_positions_async", staticmethod(racing_read))
+    assert client.get("/api/v1/portfolio/portfolio").json() == []
+    monkeypatch.undo()
+
+    assert portfolio_cache.get("investor@example.com") is None
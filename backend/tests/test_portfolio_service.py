@@ -1,51 +1,127 @@
-from unittest.mock import MagicMock
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.models.position import Position
 from app.services.portfolio_service import PortfolioService
 from app.models.transaction import Transaction
 from app.models.asset import Asset
-# --- FIX: Importar AIAnalysis para registrar a tabela no SQLAlchemy ---
-from app.models.analysis import AIAnalysis 
-
-def test_calculate_portfolio_simple_buy():
-    # Setup Mock DB Session
-    mock_db = MagicMock()
-    
-    # Mock Transactions
+from app.models.user import User
+
+def _setup(db, *tickers):
+    user = User(email="investor@example.com", full_name="Investor")
+    assets = [Asset(ticker=ticker, category="US_STOCKS", name=ticker) for ticker in tickers]
+    db.add_all([user, *assets])
+    db.commit()
+    return user, assets
+
+def test_calculate_portfolio_simple_buy(db):
     # Scenario: User bought 10 AAPL at $150
-    mock_asset = Asset(ticker="AAPL", category="US_STOCKS", name="Apple Inc.")
-    tx1 = Transaction(user_id=1, asset=mock_asset, type="BUY", quantity=10, price=150.0)
-    
-    mock_db.query.return_value.filter.return_value.all.return_value = [tx1]
-    
+    user, (aapl,) = _setup(db, "AAPL")
+    db.add(Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=150.0))
+    db.commit()
+
     # Act
-    results = PortfolioService.calculate_portfolio(user_id=1, db=mock_db)
-    
+    results = PortfolioService.calculate_portfolio(user_id=user.id, db=db)
+
     # Assert
     assert len(results) == 1
     assert results[0].ticker == "AAPL"
     assert results[0].total_quantity == 10.0
     assert results[0].average_price == 150.0
 
-def test_calculate_portfolio_buy_and_sell():
-    # Setup Mock DB Session
-    mock_db = MagicMock()
-    
-    # Mock Transactions
-    # Scenario: 
+def test_calculate_portfolio_buy_and_sell(db):
+    # Scenario:
     # 1. Bought 10 AAPL at $100
     # 2. Bought 10 AAPL at $200 (Avg Price should be $150)
     # 3. Sold 5 AAPL (Avg Price should remain $150, but Qty becomes 15)
-    mock_asset = Asset(ticker="AAPL", category="US_STOCKS", name="Apple Inc.")
-    tx1 = Transaction(user_id=1, asset=mock_asset, type="BUY", quantity=10, price=100.0)
-    tx2 = Transaction(user_id=1, asset=mock_asset, type="BUY", quantity=10, price=200.0)
-    tx3 = Transaction(user_id=1, asset=mock_asset, type="SELL", quantity=5, price=250.0) # Price doesn't matter for Avg Buy Price
-    
-    mock_db.query.return_value.filter.return_value.all.return_value = [tx1, tx2, tx3]
-    
+    user, (aapl,) = _setup(db, "AAPL")
+    db.add_all([
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=100.0),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=200.0),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="SELL", quantity=5, price=250.0), # Price doesn't matter for Avg Buy Price
+    ])
+    db.commit()
+
     # Act
-    results = PortfolioService.calculate_portfolio(user_id=1, db=mock_db)
-    
+    results = PortfolioService.calculate_portfolio(user_id=user.id, db=db)
+
     # Assert
     assert len(results) == 1
     assert results[0].ticker == "AAPL"
     assert results[0].total_quantity == 15.0 # 10 + 10 - 5
-    assert results[0].average_price == 150.0 # (1000 + 2000) / 20 = 150
\ No newline at end of file
+    assert results[0].average_price == 150.0 # (1000 + 2000) / 20 = 150
+
+def test_calculate_portfolio_skips_closed_positions_and_other_users(db):
+    user, (aapl, msft) = _setup(db, "AAPL", "MSFT")
+    other = User(email="other@example.com")
+    db.add(other)
+    db.commit()
+    db.add_all([
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=100.0),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="SELL", quantity=10, price=120.0),
+        Transaction(user_id=user.id, asset_id=msft.id, type="BUY", quantity=3, price=300.0),
+        Transaction(user_id=other.id, asset_id=aapl.id, type="BUY", quantity=50, price=90.0),
+    ])
+    db.commit()
+
+    results = PortfolioService.calculate_portfolio(user_id=user.id, db=db)
+
+    assert [(p.ticker, p.total_quantity, p.average_price) for p in results] == [("MSFT", 3.0, 300.0)]
+
+def test_positions_snapshot_follows_transactions_and_rebuild(db):
+    user, (aapl, msft) = _setup(db, "AAPL", "MSFT")
+    for tx in [
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=100.0),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=200.0),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="SELL", quantity=5, price=250.0),
+        Transaction(user_id=user.id, asset_id=msft.id, type="BUY", quantity=2, price=300.0),
+    ]:
+        db.add(tx)
+        db.flush()
+        PortfolioService.apply_transaction(db, tx)
+        db.commit()
+
+    snapshot = PortfolioService.get_positions(user.id, db)
+    assert snapshot == PortfolioService.calculate_portfolio(user.id, db)
+    assert [(p.ticker, p.total_quantity, p.average_price) for p in snapshot] == [("AAPL", 15.0, 150.0), ("MSFT", 2.0, 300.0)]
+
+    # A transaction written without updating the snapshot is picked up by the rebuild
+    db.add(Transaction(user_id=user.id, asset_id=msft.id, type="SELL", quantity=2, price=310.0))
+    db.commit()
+    stats = PortfolioService.rebuild_positions(db, user_id=user.id)
+
+    assert stats == {"checked": 2, "fixed": 1, "created": 0, "deleted": 0}
+    assert PortfolioService.get_positions(user.id, db) == PortfolioService.calculate_portfolio(user.id, db)
+
+def test_concurrent_first_buys_of_an_asset_add_up(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'positions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user, (aapl,) = _setup(db, "AAPL")
+        user_id, asset_id = user.id, aapl.id
+
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def buy(quantity, price):
+        with Session() as db:
+            barrier.wait()
+            try:
+                PortfolioService.apply_deltas(db, user_id, {asset_id: (quantity, quantity, quantity * price)})
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=buy, args=args) for args in [(10, 100.0), (10, 200.0)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with Session() as db:
+        position = db.query(Position).one()
+        assert errors == []
+        assert (position.quantity, position.average_price) == (20.0, 150.0)
+    engine.dispose()
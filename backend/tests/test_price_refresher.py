@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from app.models.asset import Asset
+from app.models.market_data import MarketData
+from app.models.position import Position
+from app.models.user import User
+from app.models.worker_lease import WorkerLease
+from app.services import price_refresher
+from app.services.market_data_provider import ReplayPriceProvider, StaticPriceProvider
+from app.services.price_refresher import PriceRefresher, market_open, refresher_enabled, render_metrics
+
+def _holdings(db):
+    user = User(email="investor@example.com")
+    petr, vale, sold = Asset(ticker="PETR4.SA"), Asset(ticker="VALE3.SA"), Asset(ticker="ITUB4.SA")
+    db.add_all([user, petr, vale, sold])
+    db.commit()
+    db.add_all([
+        Position(user_id=user.id, asset_id=petr.id, quantity=10),
+        Position(user_id=user.id, asset_id=vale.id, quantity=5),
+        Position(user_id=user.id, asset_id=sold.id, quantity=0),
+    ])
+    db.add(MarketData(ticker="VALE3.SA", price=60.0, last_updated=datetime.utcnow() - timedelta(days=2)))
+    db.commit()
+
+def test_market_open_follows_b3_and_nyse_sessions():
+    utc = ZoneInfo("UTC")
+    assert market_open(datetime(2026, 10, 14, 14, 0, tzinfo=utc))        # Wednesday, both open
+    assert market_open(datetime(2026, 10, 14, 20, 30, tzinfo=utc))       # NYSE open until 16:00 ET
+    assert not market_open(datetime(2026, 10, 14, 22, 0, tzinfo=utc))
+    assert not market_open(datetime(2026, 10, 17, 15, 0, tzinfo=utc))    # Saturday
+
+def test_refresher_is_off_by_default_with_the_static_provider(monkeypatch):
+    monkeypatch.setattr("app.services.price_refresher.settings.PRICE_REFRESHER_ENABLED", None)
+    monkeypatch.setattr("app.services.price_refresher.get_price_provider", lambda: StaticPriceProvider())
+    assert not refresher_enabled()
+
+    monkeypatch.setattr("app.services.price_refresher.get_price_provider", lambda: ReplayPriceProvider("fixtures"))
+    assert refresher_enabled()
+    monkeypatch.setattr("app.services.price_refresher.settings.PRICE_REFRESHER_ENABLED", False)
+    assert not refresher_enabled()
+
+def test_leader_refreshes_held_tickers_and_reports_metrics(db):
+    _holdings(db)
+    leader = PriceRefresher(lambda: db, provider=StaticPriceProvider(50.0), owner="a")
+    follower = PriceRefresher(lambda: db, provider=StaticPriceProvider(99.0), owner="b")
+
+    assert PriceRefresher.held_tickers(db) == ["PETR4.SA", "VALE3.SA"]
+    assert leader.run_once() == 2
+    assert follower.run_once() is None  # lease held by "a"
+    assert {row.ticker: row.price for row in db.query(MarketData)} == {"PETR4.SA": 50.0, "VALE3.SA": 50.0}
+    assert price_refresher.metrics["price_refresh_tickers"] == 2
+    assert 0 <= price_refresher.metrics["price_refresh_lag_seconds"] < 60
+
+    # Prices are fresh: nothing due on the next tick
+    assert leader.run_once() is None
+
+def test_refresh_stops_when_the_lease_is_lost_between_batches(db, monkeypatch):
+    monkeypatch.setattr("app.services.price_refresher.settings.PRICE_REFRESH_BATCH_SIZE", 1)
+    _holdings(db)
+    leader = PriceRefresher(lambda: db, owner="a")
+    assert leader.acquire_lease(db)
+
+    class StealingProvider(StaticPriceProvider):
+        def get_prices(self, tickers):
+            # The lease expires during the first batch and another process takes it
+            db.query(WorkerLease).update({"owner": "b", "expires_at": datetime.utcnow() + timedelta(minutes=1)})
+            db.commit()
+            return super().get_prices(tickers)
+
+    leader.provider = StealingProvider(50.0)
+
+    assert leader.refresh(db, ["PETR4.SA", "VALE3.SA"]) == 1
+    assert db.query(MarketData).filter(MarketData.ticker == "VALE3.SA").one().price == 60.0
+
+def test_every_process_reports_the_lag_from_the_db(db):
+    _holdings(db)
+    price_refresher.metrics["price_refresh_lag_seconds"] = 0.0
+
+    text = render_metrics(db)
+
+    assert "price_refresh_lag_seconds -1.0" in text  # PETR4.SA was never fetched
+
+def test_refresh_overwrites_a_placeholder_inserted_before_its_write(db, monkeypatch):
+    _holdings(db)
+    execute = db.execute
+    raced = []
+
+    def racing_execute(statement, *args, **kwargs):
+        # A request claims the first fetch of PETR4.SA right before the refresher writes it
+        if statement.is_dml and not raced:
+            raced.append(True)
+            execute(MarketData.__table__.insert(), [
+                {"ticker": "PETR4.SA", "price": 0.0, "last_updated": None,
+                 "refresh_until": datetime.utcnow() + timedelta(minutes=1)},
+            ])
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", racing_execute)
+    refresher = PriceRefresher(lambda: db, provider=StaticPriceProvider(50.0), owner="a")
+
+    assert refresher.refresh(db, ["PETR4.SA", "VALE3.SA"]) == 2
+    row = db.query(MarketData).filter(MarketData.ticker == "PETR4.SA").one()
+    db.refresh(row)
+    assert (row.price, row.refresh_until) == (50.0, None) and row.last_updated is not None
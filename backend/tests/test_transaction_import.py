@@ -0,0 +1,91 @@
+import io
+import pytest
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.portfolio_service import PortfolioService
+from app.services.transaction_import_service import TransactionImportService, _parse_number
+
+def _user(db):
+    user = User(email="investor@example.com")
+    db.add(user)
+    db.commit()
+    return user
+
+def test_import_csv_creates_assets_transactions_and_positions(db):
+    user = _user(db)
+    db.add(Asset(ticker="AAPL", category="US_STOCKS", name="Apple Inc."))
+    db.commit()
+    csv_text = (
+        "ticker,type,quantity,price,date,category\n"
+        "AAPL,BUY,10,100.0,2024-01-02,US_STOCKS\n"
+        "AAPL,BUY,10,200.0,2024-02-01,US_STOCKS\n"
+        "PETR4,BUY,100,30.5,2024-02-01,BR_STOCKS\n"
+        "AAPL,SELL,5,250.0,2024-03-01,US_STOCKS\n"
+        "MSFT,HOLD,1,10,2024-03-01,US_STOCKS\n"
+        "MSFT,BUY,-1,10,2024-03-01,US_STOCKS\n"
+    )
+
+    # Small chunks so the assets are resolved across several batches
+    summary = TransactionImportService.import_csv(db, user.id, io.StringIO(csv_text), chunk_size=2)
+
+    assert summary["created"] == 4
+    assert summary["skipped"] == 2
+    assert summary["assets_created"] == 1
+    assert len(summary["errors"]) == 2 and summary["errors"][0].startswith("line 6")
+    assert db.query(Transaction).count() == 4
+    assert db.query(Asset).filter(Asset.ticker == "PETR4").one().category == "BR_STOCKS"
+    positions = PortfolioService.get_positions(user.id, db)
+    assert positions == PortfolioService.calculate_portfolio(user.id, db)
+    assert {(p.ticker, p.total_quantity, p.average_price) for p in positions} == {("AAPL", 15.0, 150.0), ("PETR4", 100.0, 30.5)}
+
+def test_import_b3_statement_layout(db):
+    user = _user(db)
+    csv_text = (
+        "Data do Negócio;Tipo de Movimentação;Mercado;Código de Negociação;Quantidade;Preço;Valor\n"
+        "02/01/2024;Compra;Mercado Fracionário;PETR4F;7;R$ 1.030,50;R$ 7.213,50\n"
+        "03/01/2024;Venda;Mercado Fracionário;PETR4F;2;R$ 35,00;R$ 70,00\n"
+        "04/01/2024;Compra;Mercado à Vista;VALE3;1.000;R$ 68,00;R$ 68.000,00\n"
+    )
+
+    summary = TransactionImportService.import_csv(db, user.id, io.StringIO(csv_text))
+
+    # B3 numbers always use the decimal comma: 1.000 is a thousand shares, not ambiguous
+    assert summary == {"created": 3, "skipped": 0, "assets_created": 2, "errors": []}
+    positions = PortfolioService.get_positions(user.id, db)
+    assert {(p.ticker, p.total_quantity, p.average_price) for p in positions} == {("PETR4", 5.0, 1030.5), ("VALE3", 1000.0, 68.0)}
+
+def test_asset_created_by_a_concurrent_import_is_reused(db, monkeypatch):
+    user = _user(db)
+    execute = db.execute
+    raced = []
+
+    def racing_execute(statement, *args, **kwargs):
+        # Another import commits PETR4 after this one found it missing
+        if statement.is_dml and not raced:
+            raced.append(True)
+            execute(Asset.__table__.insert(), [{"ticker": "PETR4", "category": "BR_STOCKS"}])
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", racing_execute)
+    csv_text = "ticker,type,quantity,price\nPETR4,BUY,10,30.5\nVALE3,BUY,5,68\n"
+
+    summary = TransactionImportService.import_csv(db, user.id, io.StringIO(csv_text))
+
+    assert (summary["created"], summary["assets_created"]) == (2, 1)
+    assert db.query(Asset).count() == 2
+
+def test_parse_number_detects_the_decimal_separator():
+    assert _parse_number("1,234.56") == 1234.56
+    assert _parse_number("R$ 1.234,56") == 1234.56
+    assert _parse_number("1.234.567") == 1234567.0
+    assert _parse_number("1234.567") == 1234.567
+    assert _parse_number("0,125") == 0.125
+    assert _parse_number("30.5") == 30.5
+    for invalid in ["1.234", "1,234", "1.2.3", "12,34.5", "abc"]:
+        with pytest.raises(ValueError):
+            _parse_number(invalid)
+    assert _parse_number("1.234", decimal=",") == 1234.0
+    assert _parse_number("1.234,5", decimal=",") == 1234.5
+    with pytest.raises(ValueError):
+        _parse_number("12.5", decimal=",")
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from app.models.asset import Asset
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.transaction_service import TransactionService
+
+def test_list_transactions_pages_with_cursor_and_filters(db):
+    user = User(email="investor@example.com")
+    aapl, msft = Asset(ticker="AAPL"), Asset(ticker="MSFT")
+    db.add_all([user, aapl, msft])
+    db.commit()
+    base = datetime(2024, 1, 1)
+    # Two transactions per day, so pages also have to break ties on id
+    for day in range(5):
+        for asset in (aapl, msft):
+            db.add(Transaction(user_id=user.id, asset_id=asset.id, type="BUY", quantity=1, price=10.0,
+                               date=base + timedelta(days=day)))
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = TransactionService.list_transactions(db, user.id, limit=3, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 10 and len({t.id for t in seen}) == 10
+    assert [(t.date, t.id) for t in seen] == sorted(((t.date, t.id) for t in seen), reverse=True)
+
+    page, cursor = TransactionService.list_transactions(
+        db, user.id, asset_id=msft.id, start=base + timedelta(days=1), end=base + timedelta(days=4)
+    )
+    assert cursor is None
+    assert [t.date.day for t in page] == [4, 3, 2] and all(t.asset_id == msft.id for t in page)
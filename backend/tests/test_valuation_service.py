@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+import pytest
+from app.models.asset import Asset
+from app.models.daily_close import DailyClose
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.market_data_provider import PriceProvider, StaticPriceProvider
+from app.services.valuation_service import ValuationService
+
+class HistoryProvider(PriceProvider):
+    """Closes of 10.0 + day of the month, every weekday."""
+    name = "history"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_history(self, tickers, start, end):
+        self.calls += 1
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        return {ticker: {day: 10.0 + day.day for day in days if day.weekday() < 5} for ticker in tickers}
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    ValuationService.clear_cache()
+    yield
+    ValuationService.clear_cache()
+
+def _setup(db):
+    user = User(email="investor@example.com")
+    aapl = Asset(ticker="AAPL")
+    db.add_all([user, aapl])
+    db.commit()
+    db.add_all([
+        Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=10, price=1.0, date=datetime(2024, 1, 2, 15)),
+        Transaction(user_id=user.id, asset_id=aapl.id, type="SELL", quantity=4, price=1.0, date=datetime(2024, 1, 4, 15)),
+    ])
+    db.commit()
+    return user, aapl
+
+def test_series_multiplies_cumulative_holdings_by_forward_filled_closes(db):
+    user, _ = _setup(db)
+    provider = HistoryProvider()
+
+    series = ValuationService.get_series(db, user.id, date(2024, 1, 1), date(2024, 1, 7), provider=provider)
+
+    # Jan 6-7 is a weekend: Friday's close (15.0) carries over
+    assert series.round(2).tolist() == [0.0, 120.0, 130.0, 84.0, 90.0, 90.0, 90.0]
+    assert db.query(DailyClose).count() > 0
+
+    # Served from the cache and the stored closes: no new provider call
+    assert ValuationService.get_series(db, user.id, date(2024, 1, 3), date(2024, 1, 5), provider=provider).tolist() \
+        == [130.0, 84.0, 90.0]
+    assert provider.calls == 1
+
+def test_back_dated_transaction_invalidates_from_its_date(db):
+    user, aapl = _setup(db)
+    provider = HistoryProvider()
+    ValuationService.get_series(db, user.id, date(2024, 1, 1), date(2024, 1, 7), provider=provider)
+
+    db.add(Transaction(user_id=user.id, asset_id=aapl.id, type="BUY", quantity=1, price=1.0, date=datetime(2024, 1, 5)))
+    db.commit()
+    series = ValuationService.get_series(db, user.id, date(2024, 1, 1), date(2024, 1, 7), provider=provider)
+
+    assert series.round(2).tolist() == [0.0, 120.0, 130.0, 84.0, 105.0, 105.0, 105.0]
+
+def test_chart_series_is_downsampled_and_cached_per_resolution(db):
+    user, _ = _setup(db)
+    provider = HistoryProvider()
+
+    chart = ValuationService.get_chart_series(db, user.id, date(2024, 1, 1), date(2024, 3, 31), points=20, provider=provider)
+    full = ValuationService.get_series(db, user.id, date(2024, 1, 1), date(2024, 3, 31), provider=provider)
+
+    assert len(chart) == 20 and len(full) == 91
+    assert chart.index[0] == full.index[0] and chart.index[-1] == full.index[-1]
+    assert (chart == full.loc[chart.index]).all()
+    assert len(ValuationService._cache[user.id]["downsampled"]) == 1
+    again = ValuationService.get_chart_series(db, user.id, date(2024, 1, 1), date(2024, 3, 31), points=20, provider=provider)
+    assert again.equals(chart)
+
+def test_unsettled_closes_are_fetched_again_and_overwritten(db, monkeypatch):
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+    # A close stored while still trading, and a settled one further back
+    db.add_all([
+        DailyClose(ticker="AAPL", date=today - timedelta(days=30), close=1.0, source="history"),
+        DailyClose(ticker="AAPL", date=yesterday, close=1.0, source="history"),
+    ])
+    db.commit()
+    provider = HistoryProvider()
+
+    ValuationService._ensure_closes(db, ["AAPL"], today - timedelta(days=30), today, provider)
+
+    closes = {row.date: row.close for row in db.query(DailyClose)}
+    assert closes[today - timedelta(days=30)] == 1.0  # settled: kept
+    if yesterday.weekday() < 5:
+        assert closes[yesterday] == 10.0 + yesterday.day
+    assert provider.calls == 1
+
+    # Trusted for MARKET_DATA_MAX_AGE_SECONDS, then fetched again
+    ValuationService._ensure_closes(db, ["AAPL"], today - timedelta(days=30), today, provider)
+    assert provider.calls == 1
+    monkeypatch.setattr("app.services.valuation_service.settings.MARKET_DATA_MAX_AGE_SECONDS", -1)
+    ValuationService._ensure_closes(db, ["AAPL"], today - timedelta(days=30), today, provider)
+    assert provider.calls == 2
+
+def test_placeholder_closes_are_replaced_by_a_real_provider(db):
+    start, end = date(2024, 1, 1), date(2024, 1, 7)
+    ValuationService._ensure_closes(db, ["AAPL"], start, end, StaticPriceProvider())
+    assert {row.close for row in db.query(DailyClose)} == {100.0}
+
+    # Restarted with a real provider configured
+    ValuationService.clear_cache()
+    provider = HistoryProvider()
+    ValuationService._ensure_closes(db, ["AAPL"], start, end, provider)
+
+    db.expire_all()
+    assert {(row.date, row.close, row.source) for row in db.query(DailyClose)} == {
+        (day, 10.0 + day.day, "history") for day in (date(2024, 1, d) for d in range(1, 6))
+    }
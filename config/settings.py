@@ -40,4 +40,96 @@ class Settings:
         "REITs": 0.07,       # 7%
         "Ações EUA": 0.07,   # 7%
         "Cripto": 0.06       # 6%
-    }
\ No newline at end of file
+    }
+
+    # Câmbio: "market" usa a cotação do Yahoo (BRL=X) e cai para a PTAX; "ptax" o contrário.
+    # Taxas acima de FX_MAX_AGE_DAYS dias são sinalizadas; o fallback fixo só entra sem nenhuma fonte.
+    FX_RATE_POLICY = os.getenv("FX_RATE_POLICY", "market")
+    FX_MAX_AGE_DAYS = int(os.getenv("FX_MAX_AGE_DAYS", 4))
+    FX_FALLBACK_RATES = {"USD": float(os.getenv("FX_FALLBACK_USD", 6.00))}
+
+    # Aporte mensal (R$) usado nas sugestões, ordens e projeção
+    MONTHLY_CONTRIBUTION = float(os.getenv("MONTHLY_CONTRIBUTION", 250.00))
+
+    # Projeção Monte Carlo do patrimônio (bootstrap do histórico de 1 ano de cada ativo)
+    SIMULATION_ENABLED = os.getenv("SIMULATION_ENABLED", "true").lower() == "true"
+    SIMULATION_YEARS = int(os.getenv("SIMULATION_YEARS", 10))
+    SIMULATION_PATHS = int(os.getenv("SIMULATION_PATHS", 20000))
+    SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", 0))  # 0 = um processo por núcleo
+    SIMULATION_SEED = int(os.getenv("SIMULATION_SEED")) if os.getenv("SIMULATION_SEED") else None
+
+    # Ordens de rebalanceamento por ativo: lote mínimo por categoria (mercado fracionário na B3),
+    # custo por ordem (fixo em R$ + % do valor), banda para vender e valor mínimo de ordem (R$)
+    REBALANCE_LOT_SIZES = {
+        "BR_STOCKS": 1, "FIIS": 1, "ETFS": 1, "US_STOCKS": 1, "US_REITS": 1,
+        "CRYPTO": 0.00001, "RENDA_FIXA": 0.01,
+    }
+    REBALANCE_TRADE_COST = float(os.getenv("REBALANCE_TRADE_COST", 0))
+    REBALANCE_TRADE_COST_PCT = float(os.getenv("REBALANCE_TRADE_COST_PCT", 0.0003))  # emolumentos B3
+    REBALANCE_SELL_BAND = float(os.getenv("REBALANCE_SELL_BAND", 0.05))
+    REBALANCE_MIN_ORDER = float(os.getenv("REBALANCE_MIN_ORDER", 10))
+    REBALANCE_ALLOW_SELL = os.getenv("REBALANCE_ALLOW_SELL", "true").lower() == "true"
+
+    # Coleta de Dados de Mercado
+    # Baixa o histórico de vários tickers numa única requisição (yf.download) em vez de um por vez
+    MARKET_DATA_BATCH_DOWNLOAD = os.getenv("MARKET_DATA_BATCH_DOWNLOAD", "true").lower() == "true"
+    MARKET_DATA_BATCH_SIZE = int(os.getenv("MARKET_DATA_BATCH_SIZE", 50))
+
+    # Busca concorrente de fundamentos (stock.info): limite de requisições simultâneas e timeout por ticker (s)
+    FUNDAMENTALS_MAX_WORKERS = int(os.getenv("FUNDAMENTALS_MAX_WORKERS", 8))
+    FUNDAMENTALS_TIMEOUT = float(os.getenv("FUNDAMENTALS_TIMEOUT", 15))
+
+    # Histórico de preços local (SQLite): baixa só os pregões novos a cada execução
+    PRICE_STORE_ENABLED = os.getenv("PRICE_STORE_ENABLED", "true").lower() == "true"
+    PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", "data/price_history.db")
+    PRICE_STORE_MAX_GAP_DAYS = int(os.getenv("PRICE_STORE_MAX_GAP_DAYS", 7))  # acima disso, re-sincroniza 1 ano
+    PRICE_STORE_ADJ_TOLERANCE = float(os.getenv("PRICE_STORE_ADJ_TOLERANCE", 0.005))  # diferença no fechamento (desdobramentos/ajustes)
+
+    # Histórico diário do valor da carteira (SQLite; importa o data/history.json antigo na primeira execução)
+    HISTORY_STORE_PATH = os.getenv("HISTORY_STORE_PATH", "data/portfolio_history.db")
+    PERFORMANCE_VOL_WINDOW = int(os.getenv("PERFORMANCE_VOL_WINDOW", 21))  # pregões da volatilidade móvel
+
+    # Cache de fundamentos com validade (segundos) por grupo de campos; preços nunca são cacheados.
+    # Um grupo vencido rebusca o stock.info inteiro (uma chamada por ticker), então a menor validade
+    # define a frequência de busca: mantenha todas acima do intervalo do job diário (24h), senão
+    # toda execução rebusca tudo. Com 36h, recomendação e indicadores são renovados em dias alternados.
+    FUNDAMENTALS_CACHE_ENABLED = os.getenv("FUNDAMENTALS_CACHE_ENABLED", "true").lower() == "true"
+    FUNDAMENTALS_CACHE_PATH = os.getenv("FUNDAMENTALS_CACHE_PATH", "data/fundamentals_cache.json")
+    FUNDAMENTALS_CACHE_TTL = {
+        "static": float(os.getenv("FUNDAMENTALS_TTL_STATIC_HOURS", 24 * 7)) * 3600,   # nome, setor
+        "analyst": float(os.getenv("FUNDAMENTALS_TTL_ANALYST_HOURS", 36)) * 3600,     # recomendação
+        "valuation": float(os.getenv("FUNDAMENTALS_TTL_VALUATION_HOURS", 36)) * 3600, # P/L, P/VP, DY, ROE
+    }
+
+    # Cache dos indicadores do BCB (Selic/PTAX), ciente do calendário de dias úteis
+    INDICATOR_CACHE_ENABLED = os.getenv("INDICATOR_CACHE_ENABLED", "true").lower() == "true"
+    INDICATOR_CACHE_PATH = os.getenv("INDICATOR_CACHE_PATH", "data/indicators_cache.json")
+    PTAX_PUBLICATION_HOUR = int(os.getenv("PTAX_PUBLICATION_HOUR", 13))  # PTAX de fechamento sai ~13h (Brasília)
+
+    # Fonte de dados de mercado: "yahoo" (ao vivo), "record" (ao vivo + grava fixtures) ou "replay" (offline)
+    MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yahoo")
+    MARKET_DATA_FIXTURES_DIR = os.getenv("MARKET_DATA_FIXTURES_DIR", "data/fixtures")
+    REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", 0))  # latência artificial por chamada no replay
+    REPLAY_JITTER_MS = float(os.getenv("REPLAY_JITTER_MS", 0))
+
+    # Chamadas externas (Yahoo/BCB): rate limit por host, retry com backoff, circuit breaker e orçamento total (s)
+    OUTBOUND_GUARD_ENABLED = os.getenv("OUTBOUND_GUARD_ENABLED", "true").lower() == "true"
+    OUTBOUND_BUDGET_SECONDS = float(os.getenv("OUTBOUND_BUDGET_SECONDS", 180))
+    OUTBOUND_RATE_LIMITS = {  # host: (requisições por segundo, rajada)
+        "yahoo": (float(os.getenv("YAHOO_RATE_PER_SEC", 5)), int(os.getenv("YAHOO_RATE_BURST", 10))),
+        "bcb": (float(os.getenv("BCB_RATE_PER_SEC", 2)), int(os.getenv("BCB_RATE_BURST", 4))),
+    }
+    OUTBOUND_CALL_TIMEOUT = float(os.getenv("OUTBOUND_CALL_TIMEOUT", 30))  # por tentativa (s)
+    OUTBOUND_MAX_IN_FLIGHT = int(os.getenv("OUTBOUND_MAX_IN_FLIGHT", 8))  # chamadas simultâneas por host, incluindo as abandonadas por timeout
+    OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", 3))
+    OUTBOUND_BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", 0.5))
+    OUTBOUND_BACKOFF_CAP = float(os.getenv("OUTBOUND_BACKOFF_CAP", 8))
+    OUTBOUND_BREAKER_THRESHOLD = int(os.getenv("OUTBOUND_BREAKER_THRESHOLD", 5))  # falhas seguidas para abrir
+    OUTBOUND_BREAKER_RESET = float(os.getenv("OUTBOUND_BREAKER_RESET", 60))
+
+    # Modo multi-carteira (python main.py --batch carteiras.json): históricos por carteira e processos paralelos
+    BATCH_DATA_DIR = os.getenv("BATCH_DATA_DIR", "data/portfolios")
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 0))  # 0 = um processo por núcleo
+
+    # Modo intraday (python main.py --poll): intervalo entre atualizações de preço (s)
+    INTRADAY_POLL_SECONDS = int(os.getenv("INTRADAY_POLL_SECONDS", 60))
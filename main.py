@@ -1,3 +1,4 @@
+import argparse
 import logging
 import sys
 import os
@@ -10,9 +11,11 @@ from src.notifier import Notifier
 from src.ai_analyst import AIAnalyst
 from src.news_collector import NewsCollector
 from src.sheets_manager import SheetsManager
-from fastapi.middleware.proxy_headers import ProxyHeadersMiddleware
-
-import logging
+from src.intraday import IntradayPoller
+from src.market_data_provider import get_provider
+from src.batch import load_sources, load_portfolio, merge_portfolios, value_portfolio, value_portfolios
+from src.batch import history_path as batch_history_path
+from src.fx import FxSnapshot, currency_of
 
 # Configure Logging
 os.makedirs("logs", exist_ok=True)
@@ -26,15 +29,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-logger.info("🚀 Starting FastAPI application...")
-logger.info(f"CORS Origins: {settings.BACKEND_CORS_ORIGINS}")
-logger.info(f"OAuth Configured: {bool(settings.GOOGLE_CLIENT_ID)}")
-
-app = FastAPI()
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
-
 def job():
     logger.info("Starting daily financial report job...")
     try:
@@ -54,38 +48,13 @@ def job():
         news_summary = news_collector.get_top_news()
         
         # 3. Portfolio Logic
-        manager = PortfolioManager(portfolio_data, market_data, indicators)
-        portfolio_df, total_value, daily_variation_pct = manager.calculate_portfolio()
-        suggestions_df = manager.get_rebalancing_suggestions(portfolio_df, total_value)
-        contribution_df = manager.suggest_contribution(250.00, suggestions_df)
-        
-        # 3. AI Analysis
-        logger.info("Generating AI Analysis...")
-        analyst = AIAnalyst()
-        ai_analysis = analyst.generate_ai_analysis(portfolio_df, total_value, indicators, news_summary)
-        
-        # 4. Report Generation (Chart only)
-        generator = ReportGenerator()
-        chart_b64 = generator.generate_allocation_chart(portfolio_df)
-        
-        # 5. Notification
-        notifier = Notifier()
-        subject = f"Relatório Financeiro Diário - {datetime.now().strftime('%d/%m/%Y')}"
-        
-        # Prepare context for Email Template
-        email_context = {
-            'date': datetime.now().strftime('%d/%m/%Y'),
-            'total_value': total_value,
-            'daily_variation_pct': daily_variation_pct,
-            'indicators': indicators,
-            'ai_analysis': ai_analysis,
-            'suggestions': suggestions_df,
-            'contribution': contribution_df,
-            'allocation_chart': chart_b64
-        }
-        
-        # Send Email
-        notifier.send_email(subject, email_context)
+        result = value_portfolio(
+            portfolio_data, market_data, indicators, fx=None,
+            closes=collector.get_close_history(), monthly_contribution=Settings.MONTHLY_CONTRIBUTION
+        )
+
+        # 4. AI Analysis, chart and e-mail
+        send_report(result, indicators, news_summary)
         
         logger.info("Job completed successfully.")
         
@@ -93,5 +62,134 @@ def job():
         logger.error(f"Job failed: {e}", exc_info=True)
         sys.exit(1)
 
+def send_report(result, indicators, news_summary, name=None, recipients=None):
+    """AI analysis, allocation chart and e-mail of one valued portfolio (see src.batch.value_portfolio)."""
+    logger.info("Generating AI Analysis...")
+    analyst = AIAnalyst()
+    ai_analysis = analyst.generate_ai_analysis(
+        result['portfolio'], result['total_value'], indicators, news_summary, result['performance']
+    )
+
+    # Report Generation (Chart only)
+    generator = ReportGenerator()
+    chart_b64 = generator.generate_allocation_chart(result['portfolio'])
+
+    notifier = Notifier()
+    subject = f"Relatório Financeiro Diário - {datetime.now().strftime('%d/%m/%Y')}"
+    if name:
+        subject += f" - {name}"
+
+    # Prepare context for Email Template
+    email_context = {
+        'date': datetime.now().strftime('%d/%m/%Y'),
+        'total_value': result['total_value'],
+        'daily_variation_pct': result['daily_variation_pct'],
+        'performance': result['performance'],
+        'indicators': indicators,
+        'fx_rates': result['fx_rates'],
+        'ai_analysis': ai_analysis,
+        'suggestions': result['suggestions'],
+        'contribution': result['contribution'],
+        'orders': result['orders'],
+        'unallocated_cash': result.get('unallocated_cash', 0.0),
+        'monthly_contribution': result['monthly_contribution'],
+        'projection': result['projection'],
+        'allocation_chart': chart_b64
+    }
+
+    # Send Email
+    notifier.send_email(subject, email_context, recipients=recipients)
+
+def batch(sources_path):
+    """
+    Batch mode: values several portfolios (family/clients) from one shared market-data
+    fetch. The union of their tickers is collected once, the portfolios are valued in
+    parallel and each one gets its own history and report.
+    """
+    logger.info(f"Starting batch job for the portfolios in {sources_path}...")
+    try:
+        sources = load_sources(sources_path)
+        portfolios = [load_portfolio(source) for source in sources]
+        for source, portfolio_data in zip(sources, portfolios):
+            if not portfolio_data:
+                logger.error(f"Failed to load portfolio '{source['name']}', skipping it.")
+
+        merged = merge_portfolios(portfolios)
+        if not merged:
+            logger.error("No portfolio data loaded. Aborting.")
+            return
+
+        # Shared snapshot: one fetch for the union of tickers
+        collector = DataCollector(merged)
+        market_data = collector.get_market_data()
+        indicators = collector.get_economic_indicators()
+        closes = collector.get_close_history()
+        fx = FxSnapshot.from_market_data(
+            market_data, indicators, currencies={currency_of(item['ticker'], item.get('category')) for item in merged}
+        )
+        news_summary = NewsCollector().get_top_news()
+
+        valued = [(source, data) for source, data in zip(sources, portfolios) if data]
+        jobs = [
+            {
+                "portfolio_data": data, "market_data": market_data, "indicators": indicators, "fx": fx,
+                "closes": closes, "history_path": batch_history_path(source['name']),
+                "monthly_contribution": source.get('monthly_contribution', Settings.MONTHLY_CONTRIBUTION),
+            }
+            for source, data in valued
+        ]
+        results = value_portfolios(jobs, Settings.BATCH_WORKERS)
+
+        failed = 0
+        for (source, _), result in zip(valued, results):
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error(f"Portfolio '{source['name']}' failed: {result}")
+                continue
+            try:
+                send_report(result, indicators, news_summary, name=source['name'], recipients=source.get('email_receiver'))
+            except Exception as e:
+                failed += 1
+                logger.error(f"Report of portfolio '{source['name']}' failed: {e}")
+
+        logger.info(f"Batch completed: {len(valued) - failed}/{len(sources)} portfolios reported.")
+        if failed:
+            sys.exit(1)
+
+    except Exception as e:
+        logger.error(f"Batch job failed: {e}", exc_info=True)
+        sys.exit(1)
+
+def poll(interval):
+    """Intraday mode: keeps refreshing last prices and logs only what changed."""
+    logger.info(f"Starting intraday polling mode (every {interval}s)...")
+    portfolio_data = SheetsManager.get_portfolio_from_sheets()
+    if not portfolio_data:
+        logger.error("Failed to load portfolio data. Aborting.")
+        return
+
+    provider = get_provider()
+    # PTAX: fallback rate of the foreign positions when their FX quote is missing
+    indicators = DataCollector(portfolio_data, provider).get_economic_indicators()
+    manager = PortfolioManager(portfolio_data, {}, indicators)
+    poller = IntradayPoller(
+        portfolio_data, provider, reference_value=manager.get_previous_value(), indicators=indicators
+    )
+    try:
+        poller.run(interval)
+    except KeyboardInterrupt:
+        logger.info("Intraday polling stopped.")
+
 if __name__ == "__main__":
-    job()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="100HYPE - relatório financeiro diário")
+    parser.add_argument("--poll", action="store_true", help="modo intraday: atualiza só os preços em intervalo")
+    parser.add_argument("--batch", metavar="SOURCES_JSON", help="modo multi-carteira: lista JSON de carteiras")
+    parser.add_argument("--interval", type=int, default=Settings.INTRADAY_POLL_SECONDS, help="intervalo do modo --poll (s)")
+    args = parser.parse_args()
+
+    if args.poll:
+        poll(args.interval)
+    elif args.batch:
+        batch(args.batch)
+    else:
+        job()
@@ -26,13 +26,22 @@ class AIAnalyst:
         except Exception as e:
             logger.warning(f"Could not list models: {e}")
 
-    def generate_ai_analysis(self, portfolio_df, total_value, indicators, news_summary):
+    def generate_ai_analysis(self, portfolio_df, total_value, indicators, news_summary, performance=None):
         if not self.api_key:
             return "Análise de IA indisponível (Chave API não configurada)."
         portfolio_summary = portfolio_df.to_dict(orient='records')
 
         summary_text = f"Valor Total: R$ {total_value:,.2f}\n"
         summary_text += f"Indicadores: Selic {indicators.get('selic_meta')}% | CDI {indicators.get('cdi')}% | PTAX {indicators.get('ptax_venda')}\n"
+        if performance:
+            volatility = performance.get('volatility_pct')
+            sharpe = performance.get('sharpe')
+            summary_text += (
+                f"Desempenho (desde o início do histórico): Retorno {performance['twr_pct']:.2f}% | "
+                f"Volatilidade anual {f'{volatility:.1f}%' if volatility is not None else 'N/A'} | "
+                f"Drawdown máx. {performance['max_drawdown_pct']:.2f}% | "
+                f"Sharpe (CDI) {f'{sharpe:.2f}' if sharpe is not None else 'N/A'}\n"
+            )
         summary_text += "Ativos:\n"
         for item in portfolio_summary:
             pl_pct = item.get('profit_loss_pct', 0.0)
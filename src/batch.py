@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config.settings import Settings
+from src.portfolio import PortfolioManager
+from src.sheets_manager import SheetsManager
+
+logger = logging.getLogger(__name__)
+
+def load_sources(path):
+    """
+    Reads the list of portfolios of a batch run (JSON list). Each source has a "name" and
+    either a "sheet_csv_url" or a "file" (JSON list of {ticker, quantity, category}), plus
+    optional "email_receiver" and "monthly_contribution".
+    """
+    with open(path, 'r') as f:
+        sources = json.load(f)
+    names = [source['name'] for source in sources]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate portfolio names in {path}")
+    return sources
+
+def load_portfolio(source):
+    """Portfolio items ({ticker, quantity, category}) of one source."""
+    if source.get('file'):
+        with open(source['file'], 'r') as f:
+            items = json.load(f)
+        portfolio = []
+        for item in items:
+            qty = float(item.get('quantity', item.get('qty', 0)) or 0)
+            if qty > 0:
+                portfolio.append({
+                    "ticker": str(item['ticker']).strip().upper(),
+                    "quantity": qty,
+                    "category": str(item.get('category', 'OUTROS')).strip().upper(),
+                })
+        return portfolio
+    return SheetsManager.get_portfolio_from_sheets(source.get('sheet_csv_url'))
+
+def merge_portfolios(portfolios):
+    """
+    Union of the holdings of several portfolios (what DataCollector fetches), one item
+    per (ticker, category): a ticker filed under different categories keeps each of
+    them, so every currency it is valued in gets its FX quote. The conflict is logged.
+    """
+    merged = {}
+    categories = {}
+    for portfolio in portfolios:
+        for item in portfolio:
+            category = item.get('category', 'OUTROS')
+            merged.setdefault((item['ticker'], category), item)
+            categories.setdefault(item['ticker'], set()).add(category)
+    for ticker, names in categories.items():
+        if len(names) > 1:
+            logger.warning(f"{ticker} is filed under different categories across portfolios: {', '.join(sorted(names))}.")
+    return list(merged.values())
+
+def history_path(name):
+    """History store of a portfolio of the batch: <BATCH_DATA_DIR>/<name>/portfolio_history.db."""
+    safe = re.sub(r'[^A-Za-z0-9._-]', '_', name)
+    return os.path.join(Settings.BATCH_DATA_DIR, safe, "portfolio_history.db")
+
+def value_portfolio(portfolio_data, market_data, indicators, fx, closes, monthly_contribution,
+                    history_path=None, simulation_workers=None):
+    """
+    Everything the report needs for one portfolio, computed from an already fetched
+    market snapshot (no network calls). Module-level and returning plain data so it can
+    run in a worker process.
+    """
+    manager = PortfolioManager(portfolio_data, market_data, indicators, fx=fx, history_path=history_path)
+    portfolio_df, total_value, daily_variation_pct = manager.calculate_portfolio()
+    suggestions_df = manager.get_rebalancing_suggestions(portfolio_df, total_value)
+    contribution_df = manager.suggest_contribution(monthly_contribution, suggestions_df)
+    orders_df = manager.get_rebalancing_orders(portfolio_df, monthly_contribution)
+
+    projection_df = None
+    if Settings.SIMULATION_ENABLED:
+        try:
+            projection_df = manager.get_projection(portfolio_df, closes, monthly_contribution, workers=simulation_workers)
+        except Exception as e:
+            logger.error(f"Monte Carlo projection failed: {e}")
+
+    return {
+        "portfolio": portfolio_df,
+        "total_value": total_value,
+        "daily_variation_pct": daily_variation_pct,
+        "suggestions": suggestions_df,
+        "contribution": contribution_df,
+        "orders": orders_df,
+        "unallocated_cash": orders_df.attrs.get("unallocated_cash", 0.0),
+        "projection": projection_df,
+        "performance": manager.performance,
+        "fx_rates": manager.fx.rates,
+        "monthly_contribution": monthly_contribution,
+    }
+
+def value_portfolios(jobs, workers=None):
+    """
+    Values several portfolios (list of value_portfolio kwargs) in parallel across cores.
+    Each portfolio writes only its own history file, so the workers share nothing.
+    Returns the results in the same order; a failed portfolio yields its exception.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append(value_portfolio(**job))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        # Projections run in-process inside each worker (no nested pools)
+        futures = [pool.submit(value_portfolio, **dict(job, simulation_workers=1)) for job in jobs]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
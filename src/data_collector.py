@@ -1,29 +1,327 @@
-import yfinance as yf
 import pandas as pd
 import json
 import logging
 import requests
-from datetime import datetime
-from bcb import sgs, currency
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
 from config.settings import Settings
+from src.market_data_provider import get_provider
+from src.outbound import CircuitOpenError, BudgetExceededError
+from src.price_store import PriceHistoryStore
+from src.fundamentals_cache import FundamentalsCache
+from src.indicator_cache import IndicatorCache
+from src.fx import currency_of, quote_tickers
 
 logger = logging.getLogger(__name__)
 
 class DataCollector:
-    def __init__(self, portfolio_data):
+    def __init__(self, portfolio_data, provider=None):
         self.portfolio_data = portfolio_data
-        self.tickers = [item['ticker'] for item in self.portfolio_data]
+        # Quotes/history/fundamentals/indicators source (live Yahoo+BCB, record or replay)
+        self.provider = provider or get_provider()
+        self.tickers = list(dict.fromkeys(item['ticker'] for item in self.portfolio_data))
+        # Per-run statistics (e.g. wall-clock time of each fundamentals lookup)
+        self.run_stats = {}
+        # Local daily-close store so each run only downloads the new bars
+        self.price_store = PriceHistoryStore(Settings.PRICE_STORE_PATH) if Settings.PRICE_STORE_ENABLED else None
+        # Fundamentals (sector, name, ratios) change slowly: cached with a TTL per field group
+        self.fundamentals_cache = FundamentalsCache(Settings.FUNDAMENTALS_CACHE_PATH) if Settings.FUNDAMENTALS_CACHE_ENABLED else None
+        # BCB indicators: fetched once per run and only when a newer value can exist
+        self.indicator_cache = IndicatorCache(Settings.INDICATOR_CACHE_PATH) if Settings.INDICATOR_CACHE_ENABLED else None
+        self._indicators = None
+        # Daily closes of the last get_market_data run (input of the Monte Carlo projection)
+        self.histories = {}
         
-        # Check if we need USD conversion
-        has_international = any(
-            item.get('category') in ['US_STOCKS', 'US_REITS'] or 
-            (item.get('category') == 'CRYPTO' and not item['ticker'].endswith('-BRL'))
-            for item in self.portfolio_data
+        # Add the FX quotes (BRL=X, cross legs like EURUSD=X) needed by foreign positions
+        currencies = {currency_of(item['ticker'], item.get('category')) for item in self.portfolio_data}
+        for fx_ticker in quote_tickers(currencies):
+            if fx_ticker not in self.tickers:
+                self.tickers.append(fx_ticker)
+
+    @staticmethod
+    def _is_fixed_income(ticker):
+        return ticker == "RDB-NUBANK" or ticker.startswith("RDB")
+
+    def _download_histories(self, tickers, **range_kwargs):
+        """
+        Downloads daily history for the given tickers (range_kwargs: period= or start=).
+        Uses grouped batch downloads (chunks of MARKET_DATA_BATCH_SIZE); if a batch fails,
+        only the tickers of that batch fall back to individual requests.
+        """
+        histories = {}
+        if not tickers:
+            return histories
+
+        if not Settings.MARKET_DATA_BATCH_DOWNLOAD:
+            chunks = []
+            fallback = list(tickers)
+        else:
+            size = max(1, Settings.MARKET_DATA_BATCH_SIZE)
+            chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+            fallback = []
+
+        for chunk in chunks:
+            try:
+                logger.info(f"Batch download of history for {len(chunk)} tickers...")
+                histories.update(self.provider.download_histories(chunk, **range_kwargs))
+            except (CircuitOpenError, BudgetExceededError) as e:
+                # Host is down or the run is out of time: per-ticker requests would fail too
+                logger.warning(f"Skipping history download for {chunk}: {e}. Using stored bars.")
+            except Exception as e:
+                logger.warning(f"Batch download failed for {chunk}: {e}. Falling back to per-ticker fetch.")
+                fallback.extend(chunk)
+
+        for ticker in fallback:
+            try:
+                hist = self.provider.history(ticker, **range_kwargs)
+            except Exception as e:
+                logger.warning(f"Failed to fetch history for {ticker}: {e}")
+                continue
+            if not hist.empty:
+                histories[ticker] = hist
+
+        return histories
+
+    @staticmethod
+    def _close_on(hist, day):
+        """Returns the close of `day` ('YYYY-MM-DD') in a history frame, or None."""
+        index = pd.to_datetime(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        match = hist['Close'][index.strftime("%Y-%m-%d") == day]
+        return float(match.iloc[-1]) if not match.empty else None
+
+    def _fetch_histories(self, tickers):
+        """
+        Returns 1y of daily history for the given tickers.
+        With the local price store enabled, only the bars from the one before the last
+        stored bar are downloaded and merged in: the last bar may have been stored
+        mid-session, so it is overwritten rather than used as the overlap anchor.
+        A ticker is re-synced from scratch when it has no stored data, when the store
+        is too old (gap), or when the re-downloaded overlap bar no longer matches the
+        stored close (split/dividend re-adjustment).
+        """
+        if self.price_store is None:
+            return self._download_histories(tickers, period="1y")
+
+        store = self.price_store
+        today = datetime.now()
+        full_sync = []
+        incremental = {}  # last stored date -> tickers
+
+        for ticker in tickers:
+            last = store.last_bar(ticker)
+            if last is None:
+                full_sync.append(ticker)
+                continue
+            age = (today - datetime.strptime(last[0], "%Y-%m-%d")).days
+            if age > Settings.PRICE_STORE_MAX_GAP_DAYS:
+                logger.info(f"Stored history for {ticker} ends at {last[0]} ({age} days ago). Re-syncing.")
+                full_sync.append(ticker)
+            else:
+                incremental.setdefault(store.settled_bar(ticker)[0], []).append(ticker)
+
+        for start, group in incremental.items():
+            # Starts at the settled bar so the overlap can be checked
+            new_bars = self._download_histories(group, start=start)
+            for ticker in group:
+                hist = new_bars.get(ticker)
+                if hist is None or hist.empty:
+                    continue
+                last_date, last_close = store.settled_bar(ticker)
+                overlap_close = self._close_on(hist, last_date)
+                if overlap_close is None:
+                    logger.info(f"Gap in history for {ticker} after {last_date}. Re-syncing.")
+                    full_sync.append(ticker)
+                elif last_close and abs(overlap_close - last_close) / last_close > Settings.PRICE_STORE_ADJ_TOLERANCE:
+                    logger.info(
+                        f"Adjusted close mismatch for {ticker} on {last_date} "
+                        f"({last_close:.4f} -> {overlap_close:.4f}). Re-syncing."
+                    )
+                    full_sync.append(ticker)
+                else:
+                    store.upsert(ticker, hist, replace_from=last_date)
+
+        if full_sync:
+            new_bars = self._download_histories(full_sync, period="1y")
+            for ticker in full_sync:
+                if ticker in new_bars:
+                    store.replace(ticker, new_bars[ticker])
+
+        logger.info(
+            f"Price store: {len(tickers) - len(full_sync)} incremental, {len(full_sync)} full re-syncs."
         )
-        
-        # Add USD/BRL explicitly if needed and not in list
-        if has_international and "BRL=X" not in self.tickers:
-            self.tickers.append("BRL=X")
+
+        # If a download failed we still serve the last stored bars
+        start_1y = (today - timedelta(days=365)).strftime("%Y-%m-%d")
+        histories = {}
+        for ticker in tickers:
+            hist = store.load(ticker, start=start_1y)
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+    @staticmethod
+    def _default_fundamentals(ticker):
+        return {
+            "dy_12m": 0, "p_vp": 0, "pe": 0, "roe": 0,
+            "sector": "Unknown", "recommendation": "None", "name": ticker
+        }
+
+    @staticmethod
+    def _parse_fundamentals(info, ticker):
+        """Normalizes a stock.info dict into the fundamentals used by the report."""
+        # Dividend Yield
+        dy = info.get('dividendYield', 0)
+        if dy is None: dy = 0
+        dy = dy * 100 # Convert to percentage
+
+        # Price to Book
+        p_vp = info.get('priceToBook', 0)
+        if p_vp is None: p_vp = 0
+
+        # P/E Ratio
+        pe = info.get('trailingPE', 0)
+        if pe is None: pe = 0
+
+        # ROE
+        roe = info.get('returnOnEquity', 0)
+        if roe is None: roe = 0
+        roe = roe * 100
+
+        return {
+            "dy_12m": dy,
+            "p_vp": p_vp,
+            "pe": pe,
+            "roe": roe,
+            # Sector & Recommendation
+            "sector": info.get('sector', 'Unknown'),
+            "recommendation": info.get('recommendationKey', 'None'),
+            "name": info.get('shortName', ticker)
+        }
+
+    def _fetch_fundamentals(self, tickers):
+        """
+        Fetches stock.info for the given tickers concurrently.
+        At most FUNDAMENTALS_MAX_WORKERS lookups run at once and each one gets
+        FUNDAMENTALS_TIMEOUT seconds; a ticker that hangs is abandoned so it only
+        delays itself, but its thread keeps its slot until it actually returns, so
+        this stage never has more than FUNDAMENTALS_MAX_WORKERS lookups running.
+        Behind the outbound guard a lookup may itself abandon hung attempts; those
+        are bounded per host by OUTBOUND_MAX_IN_FLIGHT instead. If every slot stays
+        held by hung lookups for another FUNDAMENTALS_TIMEOUT, the tickers still
+        waiting are skipped. Returns {ticker: info} for the lookups that
+        succeeded and records per-ticker timings in run_stats.
+        """
+        results = {}
+        stats = self.run_stats.setdefault('fundamentals', {})
+        if not tickers:
+            return results
+
+        max_workers = max(1, Settings.FUNDAMENTALS_MAX_WORKERS)
+        timeout = Settings.FUNDAMENTALS_TIMEOUT
+        done = queue.Queue()
+        waiting = list(dict.fromkeys(tickers))
+        running = {}  # ticker -> start (monotonic)
+        abandoned = set()  # timed out, thread still alive (holds its slot)
+        stage_start = time.monotonic()
+
+        def worker(ticker, start):
+            try:
+                info = self.provider.info(ticker)
+                done.put((ticker, info, None, time.monotonic() - start))
+            except Exception as e:
+                done.put((ticker, None, e, time.monotonic() - start))
+
+        while waiting or running:
+            while waiting and len(running) + len(abandoned) < max_workers:
+                ticker = waiting.pop(0)
+                running[ticker] = time.monotonic()
+                threading.Thread(
+                    target=worker, args=(ticker, running[ticker]),
+                    name=f"fundamentals-{ticker}", daemon=True
+                ).start()
+
+            if running:
+                wait = max(0.0, min(running.values()) + timeout - time.monotonic())
+            else:
+                # Every slot is held by a hung lookup: wait for one of them to return
+                wait = timeout
+            try:
+                ticker, info, error, elapsed = done.get(timeout=wait)
+            except queue.Empty:
+                now = time.monotonic()
+                if not running:
+                    for ticker in waiting:
+                        stats[ticker] = {"status": "skipped", "seconds": 0.0}
+                    logger.warning(
+                        f"Skipping info for {len(waiting)} tickers: all {max_workers} workers are hung."
+                    )
+                    break
+                for ticker, start in list(running.items()):
+                    if now - start >= timeout:
+                        del running[ticker]
+                        abandoned.add(ticker)
+                        stats[ticker] = {"status": "timeout", "seconds": round(now - start, 3)}
+                        logger.warning(f"Timeout fetching info for {ticker} after {timeout}s")
+                continue
+
+            if ticker in abandoned:
+                # Late answer from a lookup that already timed out: its slot is free again
+                abandoned.discard(ticker)
+                continue
+            del running[ticker]
+
+            if error is not None:
+                stats[ticker] = {"status": "error", "seconds": round(elapsed, 3)}
+                logger.warning(f"Could not fetch info for {ticker}: {error}")
+            else:
+                stats[ticker] = {"status": "ok", "seconds": round(elapsed, 3)}
+                results[ticker] = info
+
+        wall = time.monotonic() - stage_start
+        self.run_stats['fundamentals_wall_seconds'] = round(wall, 3)
+        slowest = sorted(stats.items(), key=lambda kv: kv[1]['seconds'], reverse=True)[:5]
+        logger.info(
+            f"Fundamentals: {len(results)}/{len(set(tickers))} ok in {wall:.2f}s "
+            f"(workers={max_workers}). Slowest: "
+            + ", ".join(f"{t} {s['seconds']:.2f}s ({s['status']})" for t, s in slowest)
+        )
+        return results
+
+    def _get_fundamentals(self, tickers):
+        """
+        Serves stock.info fields from the TTL cache and fetches only the tickers
+        with an expired field group. If the provider fails for a ticker, its last
+        cached (stale) fields are served instead of 'Unknown' and zeros.
+        """
+        cache = self.fundamentals_cache
+        if cache is None:
+            return self._fetch_fundamentals(tickers)
+
+        to_fetch = [t for t in tickers if cache.stale_groups(t)]
+        fetched = self._fetch_fundamentals(to_fetch)
+        for ticker, info in fetched.items():
+            cache.update(ticker, info)
+        if fetched:
+            cache.save()
+
+        results = {}
+        for ticker in tickers:
+            info = cache.get(ticker)
+            if info is None:
+                continue
+            if ticker in to_fetch and ticker not in fetched:
+                logger.warning(f"Serving stale fundamentals for {ticker} (provider failed).")
+            results[ticker] = info
+
+        logger.info(
+            f"Fundamentals cache: {len(tickers) - len(to_fetch)} hits, "
+            f"{len(fetched)}/{len(to_fetch)} refreshed."
+        )
+        return results
 
     def get_market_data(self):
         """Fetches prices, variations, and fundamentals for all assets."""
@@ -32,10 +330,15 @@ class DataCollector:
 
         indicators = self.get_economic_indicators()
         cdi_diario = (indicators.get('cdi', 0.11) / 100) / 252
+
+        market_tickers = [t for t in self.tickers if not self._is_fixed_income(t)]
+        histories = self._fetch_histories(market_tickers)
+        self.histories = histories
+        fundamentals = self._get_fundamentals(market_tickers)
         
         for ticker in self.tickers:
             # Mock Logic for Renda Fixa
-            if ticker == "RDB-NUBANK" or ticker.startswith("RDB"):
+            if self._is_fixed_income(ticker):
                 results[ticker] = {
                     "price": 1.0, 
                     "change_1d": cdi_diario * 100, 
@@ -52,18 +355,13 @@ class DataCollector:
 
             try:
                 logger.info(f"Processing {ticker}...")
-                # Removed custom session to fix ValueError with yfinance
-                stock = yf.Ticker(ticker)
-                
-                # Get history for price and variation
-                try:
-                    hist = stock.history(period="1y")
-                except Exception as e:
-                    logger.warning(f"Failed to fetch history for {ticker}: {e}")
-                    hist = pd.DataFrame()
+
+                # History for price and variation (already downloaded in batch)
+                hist = histories.get(ticker, pd.DataFrame())
                 
                 if not hist.empty:
                     current_price = hist['Close'].iloc[-1]
+                    as_of = pd.Timestamp(hist.index[-1]).strftime('%Y-%m-%d')
                     
                     # 1D Variation
                     if len(hist) >= 2:
@@ -81,61 +379,27 @@ class DataCollector:
                 else:
                     # Fallback: Try fast_info if history fails
                     logger.info(f"History empty for {ticker}, trying fast_info...")
-                    current_price = stock.fast_info.get('last_price', 0.0)
+                    current_price = self.provider.last_price(ticker)
+                    as_of = datetime.now().strftime('%Y-%m-%d')
                     change_1d = 0.0
                     change_12m = 0.0
 
                 if ticker == "BRL=X":
                     logger.info(f"💵 Cotação Dólar (BRL=X): R$ {current_price:.4f}")
 
-                # Fundamentals
-                try:
-                    info = stock.info
-                    
-                    # Dividend Yield
-                    dy = info.get('dividendYield', 0)
-                    if dy is None: dy = 0
-                    dy = dy * 100 # Convert to percentage
-                    
-                    # Price to Book
-                    p_vp = info.get('priceToBook', 0)
-                    if p_vp is None: p_vp = 0
-                    
-                    # P/E Ratio
-                    pe = info.get('trailingPE', 0)
-                    if pe is None: pe = 0
-                    
-                    # ROE
-                    roe = info.get('returnOnEquity', 0)
-                    if roe is None: roe = 0
-                    roe = roe * 100
-                    
-                    # Sector & Recommendation
-                    sector = info.get('sector', 'Unknown')
-                    recommendation = info.get('recommendationKey', 'None')
-                    
-                    name = info.get('shortName', ticker)
-                except Exception as e:
-                    logger.warning(f"Could not fetch info for {ticker}: {e}")
-                    dy = 0
-                    p_vp = 0
-                    pe = 0
-                    roe = 0
-                    sector = "Unknown"
-                    recommendation = "None"
-                    name = ticker
+                # Fundamentals (fetched concurrently before the loop)
+                info = fundamentals.get(ticker)
+                if info is not None:
+                    fund = self._parse_fundamentals(info, ticker)
+                else:
+                    fund = self._default_fundamentals(ticker)
 
                 results[ticker] = {
                     "price": current_price,
                     "change_1d": change_1d,
                     "change_12m": change_12m,
-                    "dy_12m": dy,
-                    "p_vp": p_vp,
-                    "pe": pe,
-                    "roe": roe,
-                    "sector": sector,
-                    "recommendation": recommendation,
-                    "name": name
+                    "as_of": as_of,
+                    **fund
                 }
                 
             except Exception as e:
@@ -146,45 +410,84 @@ class DataCollector:
                     "sector": "Unknown", "recommendation": "None", "name": ticker
                 }
 
+        guard = getattr(self.provider, 'guard', None)
+        if guard is not None:
+            self.run_stats['outbound'] = guard.stats
+            logger.info(f"Outbound calls: {guard.stats}")
+
         return results
 
-    def get_economic_indicators(self):
-        """Fetches Selic, CDI, and PTAX using python-bcb."""
-        indicators = {}
-        
+    def _cached_indicator(self, name, fetch, now):
+        """
+        Returns (value, as_of) for an indicator, going to the BCB only when the
+        IndicatorCache says a newer value can exist. Falls back to the last known
+        value (or 0.0 when there is none) if the request fails.
+        """
+        cache = self.indicator_cache
+        if cache is not None and not cache.needs_refresh(name, now):
+            return cache.get(name)
         try:
-            # Selic Meta (432)
-            selic_series = sgs.get({'selic': 432}, last=1)
-            indicators['selic_meta'] = float(selic_series['selic'].iloc[-1])
+            value, as_of = fetch()
+            as_of = as_of.strftime('%Y-%m-%d')
+            if cache is not None:
+                cache.put(name, value, as_of, now)
+                cache.save()
+            return value, as_of
         except Exception as e:
-            logger.error(f"Error fetching Selic via BCB: {e}")
-            indicators['selic_meta'] = 0.0
+            logger.error(f"Error fetching {name} via BCB: {e}")
+            value, as_of = cache.get(name) if cache is not None else (None, None)
+            if value is None:
+                return 0.0, None
+            logger.warning(f"Using last known {name} ({value}, as of {as_of}).")
+            return value, as_of
 
-        try:
-            # CDI (12) - Taxa DI % a.a.
-            # Using Selic as proxy for CDI if we can't find the exact annualized CDI series easily, 
-            # but usually CDI follows Selic Over.
-            indicators['cdi'] = indicators['selic_meta'] - 0.10
-        except Exception:
-            indicators['cdi'] = 0.0
+    def _fetch_selic(self):
+        # Selic Meta (432)
+        return self.provider.selic()
 
-        try:
-            # PTAX (USD)
-            from datetime import timedelta # Certifique-se de importar timedelta no topo ou aqui
-            
-            today = datetime.now()
-            start_date = (today - timedelta(days=5)).strftime('%Y-%m-%d')
-            end_date = today.strftime('%Y-%m-%d')
-            
-            # Pega o intervalo dos últimos 5 dias para garantir que pegue o último dia útil
-            ptax = currency.get('USD', start=start_date, end=end_date)
-            
-            if not ptax.empty:
-                indicators['ptax_venda'] = ptax['USD'].iloc[-1]
-            else:
-                indicators['ptax_venda'] = 0.0
-        except Exception as e:
-            logger.error(f"Error fetching PTAX via BCB: {e}")
-            indicators['ptax_venda'] = 0.0
+    def _fetch_ptax(self):
+        # PTAX (USD)
+        today = datetime.now()
+        start_date = (today - timedelta(days=5)).strftime('%Y-%m-%d')
+        end_date = today.strftime('%Y-%m-%d')
+
+        # Pega o intervalo dos últimos 5 dias para garantir que pegue o último dia útil
+        return self.provider.ptax(start_date, end_date)
+
+    def get_close_history(self):
+        """Daily closes fetched by get_market_data, one column per ticker (naive dates)."""
+        closes = {}
+        for ticker, hist in self.histories.items():
+            index = pd.to_datetime(hist.index)
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            closes[ticker] = pd.Series(hist['Close'].to_numpy(), index=index.normalize())
+        return pd.DataFrame(closes)
+
+    def get_economic_indicators(self):
+        """
+        Fetches Selic, CDI, and PTAX using python-bcb.
+        Memoized per collector, so get_market_data and main.job share one fetch, and
+        persisted in IndicatorCache between runs. indicators['as_of'] holds the
+        reference date of each value.
+        """
+        if self._indicators is not None:
+            return self._indicators
+
+        now = datetime.now()
+        indicators = {}
+        as_of = {}
+
+        indicators['selic_meta'], as_of['selic_meta'] = self._cached_indicator('selic_meta', self._fetch_selic, now)
+
+        # CDI (12) - Taxa DI % a.a.
+        # Using Selic as proxy for CDI if we can't find the exact annualized CDI series easily,
+        # but usually CDI follows Selic Over.
+        indicators['cdi'] = indicators['selic_meta'] - 0.10
+        as_of['cdi'] = as_of['selic_meta']
+
+        indicators['ptax_venda'], as_of['ptax_venda'] = self._cached_indicator('ptax_venda', self._fetch_ptax, now)
 
+        indicators['as_of'] = as_of
+        self._indicators = indicators
         return indicators
@@ -0,0 +1,86 @@
+import os
+import json
+import logging
+from datetime import datetime
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# stock.info fields grouped by how often they change (TTL per group in Settings.FUNDAMENTALS_CACHE_TTL)
+FIELD_GROUPS = {
+    "static": ["shortName", "sector"],
+    "analyst": ["recommendationKey"],
+    "valuation": ["trailingPE", "priceToBook", "dividendYield", "returnOnEquity"],
+}
+
+class FundamentalsCache:
+    """
+    Persistent cache of stock.info fields with a different TTL per field group.
+    Prices are never cached here. Expired entries are kept so they can still be
+    served (stale) when the provider fails.
+
+    All groups come from the same stock.info call, so a ticker is fetched as soon as
+    any group expires and the fetch refreshes every group it returned. The shortest
+    TTL therefore sets how often a ticker is fetched; see Settings.FUNDAMENTALS_CACHE_TTL.
+    """
+
+    def __init__(self, path="data/fundamentals_cache.json", ttl=None):
+        self.path = path
+        self.ttl = ttl or Settings.FUNDAMENTALS_CACHE_TTL
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load fundamentals cache, starting empty: {e}")
+        return {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save fundamentals cache: {e}")
+
+    def _age(self, entry, now):
+        return (now - datetime.fromisoformat(entry['fetched_at'])).total_seconds()
+
+    def stale_groups(self, ticker, now=None):
+        """Returns the field groups of a ticker that are missing or past their TTL."""
+        now = now or datetime.now()
+        cached = self.entries.get(ticker, {})
+        return [
+            group for group in FIELD_GROUPS
+            if group not in cached or self._age(cached[group], now) > self.ttl.get(group, 0)
+        ]
+
+    def update(self, ticker, info, now=None):
+        """
+        Stores the grouped fields of a freshly fetched stock.info dict. A group the
+        answer has no field of (throttled/partial info) keeps its cached entry.
+        """
+        now = now or datetime.now()
+        cached = self.entries.setdefault(ticker, {})
+        for group, fields in FIELD_GROUPS.items():
+            values = {field: info[field] for field in fields if field in info}
+            if not values and group in cached:
+                continue
+            cached[group] = {"fetched_at": now.isoformat(), "fields": values}
+
+    def get(self, ticker):
+        """Returns the cached fields of a ticker (fresh or stale) as an info-like dict, or None."""
+        cached = self.entries.get(ticker)
+        if not cached:
+            return None
+        info = {}
+        for entry in cached.values():
+            info.update(entry['fields'])
+        return info
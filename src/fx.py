@@ -0,0 +1,127 @@
+import logging
+from datetime import datetime, date
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Market quote of each currency: (Yahoo ticker, currency the quote is expressed in).
+# Currencies not quoted in BRL are derived through the quote currency (e.g. EUR via USD).
+FX_QUOTES = {
+    "USD": ("BRL=X", "BRL"),
+    "EUR": ("EURUSD=X", "USD"),
+    "GBP": ("GBPUSD=X", "USD"),
+}
+# Currencies with a BCB PTAX value in the indicators
+PTAX_INDICATORS = {"USD": "ptax_venda"}
+
+def currency_of(ticker, category):
+    """Currency a position is quoted in."""
+    if category == "CRYPTO":
+        suffix = ticker.rsplit("-", 1)[-1] if "-" in ticker else "USD"
+        return suffix if suffix in FX_QUOTES or suffix == "BRL" else "USD"
+    if category in ["US_REITS", "US_STOCKS"]:
+        return "USD"
+    return "BRL"
+
+def quote_tickers(currencies):
+    """Yahoo tickers needed to value the given currencies in BRL (cross legs included)."""
+    tickers = []
+    pending = [c for c in currencies if c != "BRL"]
+    while pending:
+        currency = pending.pop()
+        if currency not in FX_QUOTES:
+            continue
+        ticker, quote_currency = FX_QUOTES[currency]
+        if ticker not in tickers:
+            tickers.append(ticker)
+        if quote_currency != "BRL":
+            pending.append(quote_currency)
+    return tickers
+
+class FxSnapshot:
+    """
+    Exchange rates (units of BRL per unit of currency) built once per run from the
+    market quotes and the BCB PTAX, following Settings.FX_RATE_POLICY:
+    "market" uses the live quote and falls back to PTAX, "ptax" the other way round.
+    Currencies without a BRL quote are derived as cross rates (EUR = EURUSD x USD).
+    Every rate keeps its source and as-of date, and is flagged stale when older than
+    Settings.FX_MAX_AGE_DAYS; Settings.FX_FALLBACK_RATES is only used as a last
+    resort, and always flagged.
+    """
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.rates.setdefault("BRL", {"rate": 1.0, "source": "base", "as_of": None, "stale": False})
+
+    @staticmethod
+    def _is_stale(as_of, today):
+        if as_of is None:
+            return True
+        return (today - date.fromisoformat(as_of)).days > Settings.FX_MAX_AGE_DAYS
+
+    @classmethod
+    def from_market_data(cls, market_data, indicators, currencies=("USD",), policy=None, now=None):
+        """Builds the rates of `currencies` (and the legs of their cross rates)."""
+        policy = (policy or Settings.FX_RATE_POLICY).lower()
+        today = (now or datetime.now()).date()
+        indicator_dates = indicators.get('as_of', {}) or {}
+        rates = {}
+
+        def market(currency):
+            ticker, quote_currency = FX_QUOTES[currency]
+            quote = market_data.get(ticker, {})
+            price = quote.get('price') or 0.0
+            if price <= 0:
+                return None
+            base = resolve(quote_currency)
+            if base is None:
+                return None
+            as_of = min(filter(None, [quote.get('as_of'), base['as_of']]), default=None)
+            source = "market" if quote_currency == "BRL" else f"cross {ticker} x {quote_currency}"
+            return {"rate": price * base['rate'], "source": source, "as_of": as_of, "stale": base['stale']}
+
+        def ptax(currency):
+            key = PTAX_INDICATORS.get(currency)
+            value = indicators.get(key) if key else None
+            if not value or value <= 0:
+                return None
+            return {"rate": value, "source": "ptax", "as_of": indicator_dates.get(key)}
+
+        def resolve(currency):
+            if currency in rates:
+                return rates[currency]
+            if currency == "BRL":
+                return {"rate": 1.0, "source": "base", "as_of": None, "stale": False}
+            sources = [ptax, market] if policy == "ptax" else [market, ptax]
+            entry = None
+            for source in sources:
+                entry = source(currency)
+                if entry is not None:
+                    break
+            if entry is None:
+                fallback = Settings.FX_FALLBACK_RATES.get(currency)
+                if fallback is None:
+                    logger.error(f"No exchange rate available for {currency}.")
+                    return None
+                logger.warning(f"Usando taxa fallback ({fallback:.2f}) para {currency}/BRL: sem cotação nem PTAX.")
+                entry = {"rate": fallback, "source": "fallback", "as_of": None}
+            entry["stale"] = entry.get("stale", False) or cls._is_stale(entry["as_of"], today)
+            if entry["stale"] and entry["source"] != "fallback":
+                logger.warning(f"{currency}/BRL rate is stale ({entry['source']}, as of {entry['as_of']}).")
+            rates[currency] = entry
+            return entry
+
+        for currency in currencies:
+            if currency in FX_QUOTES:
+                resolve(currency)
+            elif currency != "BRL":
+                logger.error(f"No exchange rate source configured for {currency}.")
+        return cls({currency: entry for currency, entry in rates.items() if entry is not None})
+
+    def rate(self, currency):
+        """BRL per unit of `currency` (0.0 if unknown, so the position shows up as zero)."""
+        entry = self.rates.get(currency)
+        return entry["rate"] if entry else 0.0
+
+    def get(self, currency):
+        return self.rates.get(currency)
@@ -0,0 +1,86 @@
+import os
+import json
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PortfolioHistoryStore:
+    """
+    Daily total value of the portfolio (SQLite under data/, one row per date).
+    The date is the primary key, so today's upsert and the lookup of the last day
+    before a date are index seeks, and every write is an atomic SQLite transaction
+    (a crash mid-write never truncates the history like a JSON rewrite can).
+    The legacy data/history.json is imported once, on the first open.
+    """
+
+    def __init__(self, path="data/portfolio_history.db", legacy_json="data/history.json"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history (
+                    date TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_json:
+            self._import_json(legacy_json)
+
+    def _import_json(self, legacy_json):
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return
+        rows = []
+        try:
+            if os.path.exists(legacy_json):
+                with open(legacy_json, 'r') as f:
+                    rows = [(entry['date'], float(entry['value'])) for entry in json.load(f)]
+        except Exception as e:
+            logger.error(f"Failed to import {legacy_json}, it will be retried on the next run: {e}")
+            return
+        with self.conn:
+            # OR IGNORE: values already written by the store win over the legacy file
+            self.conn.executemany("INSERT OR IGNORE INTO history (date, value) VALUES (?, ?)", rows)
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (legacy_json,))
+        if rows:
+            logger.info(f"Imported {len(rows)} days from {legacy_json} into {self.path}.")
+
+    def upsert(self, day, value):
+        """Records the value of `day` ('YYYY-MM-DD'), overwriting it if already present."""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO history (date, value) VALUES (?, ?)", (day, float(value)))
+
+    def previous(self, day):
+        """Returns (date, value) of the last recorded day strictly before `day`, or None."""
+        row = self.conn.execute(
+            "SELECT date, value FROM history WHERE date < ? ORDER BY date DESC LIMIT 1", (day,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def load(self, start=None):
+        """Returns the history as a list of {"date", "value"} dicts, oldest first."""
+        query = "SELECT date, value FROM history"
+        params = []
+        if start:
+            query += " WHERE date >= ?"
+            params.append(start)
+        rows = self.conn.execute(query + " ORDER BY date", params).fetchall()
+        return [{"date": day, "value": value} for day, value in rows]
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,77 @@
+import os
+import json
+import logging
+from datetime import datetime, date
+from config.settings import Settings
+from src.market_calendar import last_business_day, previous_business_day
+
+logger = logging.getLogger(__name__)
+
+class IndicatorCache:
+    """
+    Persistent cache of BCB indicators (Selic meta, PTAX) aware of the Brazilian
+    business-day calendar:
+    - Selic is re-checked at most once per business day (it only changes on COPOM decisions,
+      and the series gets no new value on weekends/holidays).
+    - PTAX is re-fetched only when a newer bulletin can exist, i.e. after its daily
+      publication (Settings.PTAX_PUBLICATION_HOUR) on a business day.
+    Each entry keeps the value, its as-of date (reference date of the series) and the
+    business day it was last checked.
+    """
+
+    def __init__(self, path="data/indicators_cache.json"):
+        self.path = path
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load indicators cache, starting empty: {e}")
+        return {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save indicators cache: {e}")
+
+    @staticmethod
+    def expected_ptax_date(now):
+        """Most recent date for which a closing PTAX can already be published."""
+        today = now.date()
+        if last_business_day(today) == today and now.hour >= Settings.PTAX_PUBLICATION_HOUR:
+            return today
+        return previous_business_day(today)
+
+    def needs_refresh(self, name, now=None):
+        now = now or datetime.now()
+        entry = self.entries.get(name)
+        if entry is None:
+            return True
+        if name == 'ptax_venda':
+            return date.fromisoformat(entry['as_of']) < self.expected_ptax_date(now)
+        return date.fromisoformat(entry['checked_on']) < last_business_day(now)
+
+    def get(self, name):
+        """Returns (value, as_of 'YYYY-MM-DD') or (None, None)."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None, None
+        return entry['value'], entry['as_of']
+
+    def put(self, name, value, as_of, now=None):
+        now = now or datetime.now()
+        self.entries[name] = {
+            "value": float(value),
+            "as_of": as_of.strftime("%Y-%m-%d") if hasattr(as_of, 'strftime') else str(as_of),
+            "checked_on": last_business_day(now).strftime("%Y-%m-%d"),
+        }
@@ -0,0 +1,138 @@
+import json
+import time
+import logging
+from datetime import datetime
+from src.portfolio import PortfolioManager
+from src.fx import FxSnapshot, currency_of, quote_tickers
+
+logger = logging.getLogger(__name__)
+
+def log_update(update):
+    """Default emitter: one JSON line per tick with changes."""
+    logger.info(f"Intraday update: {json.dumps(update, ensure_ascii=False)}")
+
+class IntradayPoller:
+    """
+    Long-running intraday mode: refreshes only the last prices of the held tickers
+    on an interval, re-values just the positions whose price moved (or all the
+    positions of a currency when one of its FX quotes moves) and emits only the
+    deltas plus the new total. Rates come from an FxSnapshot of the polled quotes
+    ("market" policy: PTAX from `indicators`, then Settings.FX_FALLBACK_RATES).
+    It never rewrites the history nor runs a full PortfolioManager recompute.
+    Every tick is a new provider run, so the outbound budget applies per tick.
+    """
+
+    def __init__(self, portfolio_data, provider, reference_value=None, emit=None, min_change_pct=0.0,
+                 indicators=None):
+        self.provider = provider
+        self.indicators = indicators or {}
+        self.reference_value = reference_value
+        self.emit = emit or log_update
+        self.min_change_pct = min_change_pct
+
+        self.positions = [
+            {
+                "ticker": item['ticker'], "category": item.get('category', 'OUTROS'), "qty": item['quantity'],
+                "currency": currency_of(item['ticker'], item.get('category', 'OUTROS')),
+            }
+            for item in portfolio_data
+        ]
+        self.by_ticker = {}
+        for idx, position in enumerate(self.positions):
+            self.by_ticker.setdefault(position['ticker'], []).append(idx)
+        self.currencies = {p['currency'] for p in self.positions}
+        # FX quote -> positions whose BRL value depends on it (cross legs included)
+        self.fx_dependents = {}
+        for idx, position in enumerate(self.positions):
+            for fx_ticker in quote_tickers({position['currency']}):
+                self.fx_dependents.setdefault(fx_ticker, []).append(idx)
+
+        self.tickers = [t for t in self.by_ticker if not t.startswith("RDB")]
+        self.tickers += [t for t in self.fx_dependents if t not in self.tickers]
+
+        self.prices = {}
+        self.values = [0.0] * len(self.positions)
+        self.total_value = 0.0
+
+    def _revalue(self, indexes):
+        """Re-values the given positions and applies the difference to the running total."""
+        today = datetime.now().date().isoformat()
+        quotes = {ticker: {"price": price, "as_of": today} for ticker, price in self.prices.items()}
+        fx = FxSnapshot.from_market_data(quotes, self.indicators, currencies=self.currencies, policy="market")
+        for idx in indexes:
+            position = self.positions[idx]
+            price = self.prices.get(position['ticker'], 0.0)
+            value = PortfolioManager.position_value(
+                position['category'], position['qty'], price, fx.rate(position['currency'])
+            )
+            self.total_value += value - self.values[idx]
+            self.values[idx] = value
+
+    def start(self):
+        """Initial full valuation from one batch of last prices."""
+        self.provider.new_run()
+        self.prices.update(self.provider.last_prices(self.tickers))
+        self._revalue(range(len(self.positions)))
+        logger.info(f"Intraday baseline: R$ {self.total_value:,.2f} ({len(self.tickers)} tickers).")
+
+    def poll_once(self):
+        """Fetches last prices and returns the update (None if nothing moved)."""
+        self.provider.new_run()
+        quotes = self.provider.last_prices(self.tickers)
+        changes = []
+        dirty = set()
+
+        for ticker, price in quotes.items():
+            if not price or price <= 0:
+                continue
+            previous = self.prices.get(ticker)
+            if previous:
+                change_pct = (price - previous) / previous * 100
+                if abs(change_pct) <= self.min_change_pct:
+                    continue
+            else:
+                change_pct = 0.0
+            self.prices[ticker] = price
+            changes.append({"ticker": ticker, "price": price, "previous_price": previous, "change_pct": change_pct})
+            dirty.update(self.by_ticker.get(ticker, []))
+            dirty.update(self.fx_dependents.get(ticker, []))
+
+        if not changes:
+            return None
+
+        previous_total = self.total_value
+        self._revalue(sorted(dirty))
+
+        update = {
+            "time": datetime.now().isoformat(timespec='seconds'),
+            "changes": changes,
+            "total_value": self.total_value,
+            "total_change": self.total_value - previous_total,
+        }
+        if self.reference_value:
+            update["daily_variation_pct"] = (self.total_value - self.reference_value) / self.reference_value * 100
+        return update
+
+    def run(self, interval, max_ticks=None):
+        """
+        Polls every `interval` seconds until interrupted (or max_ticks). Until the
+        baseline valuation succeeds, each tick retries it instead of polling.
+        """
+        baseline = False
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            started = time.monotonic()
+            try:
+                if not baseline:
+                    self.start()
+                    baseline = True
+                else:
+                    update = self.poll_once()
+                    if update:
+                        self.emit(update)
+            except Exception as e:
+                logger.error(f"Intraday {'poll' if baseline else 'baseline'} failed: {e}")
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+def _easter(year):
+    """Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+@lru_cache(maxsize=None)
+def br_holidays(year):
+    """National holidays on which B3 and the BCB do not operate."""
+    easter = _easter(year)
+    holidays = {
+        date(year, 1, 1),                 # Confraternização Universal
+        easter - timedelta(days=48),      # Carnaval (segunda)
+        easter - timedelta(days=47),      # Carnaval (terça)
+        easter - timedelta(days=2),       # Sexta-feira Santa
+        date(year, 4, 21),                # Tiradentes
+        date(year, 5, 1),                 # Dia do Trabalho
+        easter + timedelta(days=60),      # Corpus Christi
+        date(year, 9, 7),                 # Independência
+        date(year, 10, 12),               # Nossa Senhora Aparecida
+        date(year, 11, 2),                # Finados
+        date(year, 11, 15),               # Proclamação da República
+        date(year, 12, 25),               # Natal
+    }
+    if year >= 2024:
+        holidays.add(date(year, 11, 20))  # Consciência Negra (feriado nacional desde 2024)
+    return frozenset(holidays)
+
+def _as_date(day):
+    return day.date() if isinstance(day, datetime) else day
+
+def is_business_day(day):
+    day = _as_date(day)
+    return day.weekday() < 5 and day not in br_holidays(day.year)
+
+def previous_business_day(day):
+    """Last business day strictly before `day`."""
+    day = _as_date(day) - timedelta(days=1)
+    while not is_business_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def last_business_day(day):
+    """`day` itself if it is a business day, otherwise the previous one."""
+    day = _as_date(day)
+    return day if is_business_day(day) else previous_business_day(day)
@@ -0,0 +1,362 @@
+import os
+import re
+import io
+import json
+import time
+import random
+import logging
+import pandas as pd
+from config.settings import Settings
+from src.outbound import OutboundGuard
+
+logger = logging.getLogger(__name__)
+
+class FixtureNotFoundError(KeyError):
+    """Raised by ReplayProvider when a call was never recorded."""
+
+class EmptyResponseError(Exception):
+    """The provider answered with no data at all (yfinance's usual symptom of throttling)."""
+
+class MarketDataProvider:
+    """
+    Source of quotes, history, fundamentals and BCB indicators used by DataCollector.
+    Every method raises on failure; DataCollector decides the fallbacks.
+    """
+    name = "base"
+
+    def download_histories(self, tickers, **range_kwargs):
+        """Grouped daily history download. Returns {ticker: DataFrame with 'Close'}."""
+        raise NotImplementedError
+
+    def history(self, ticker, **range_kwargs):
+        """Daily history of a single ticker (range_kwargs: period= or start=)."""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """Fundamentals dict (stock.info)."""
+        raise NotImplementedError
+
+    def last_price(self, ticker):
+        raise NotImplementedError
+
+    def last_prices(self, tickers):
+        """Last prices of several tickers. Returns {ticker: price} for those that succeeded."""
+        prices = {}
+        for ticker in tickers:
+            try:
+                prices[ticker] = self.last_price(ticker)
+            except Exception as e:
+                logger.warning(f"Failed to fetch last price for {ticker}: {e}")
+        return prices
+
+    def selic(self):
+        """Selic meta (SGS 432). Returns (value, reference date)."""
+        raise NotImplementedError
+
+    def ptax(self, start, end):
+        """Last USD PTAX (venda) between start and end. Returns (value, reference date)."""
+        raise NotImplementedError
+
+    def new_run(self):
+        """Starts a new run (e.g. an intraday tick): a guarded provider gets a fresh time budget."""
+
+
+class YahooBCBProvider(MarketDataProvider):
+    """Live provider: yfinance for market data, python-bcb for indicators."""
+    name = "yahoo"
+
+    @staticmethod
+    def _split_batch(data, tickers):
+        """Splits a grouped yf.download frame into one history frame per ticker."""
+        histories = {}
+        multi = isinstance(data.columns, pd.MultiIndex)
+        for ticker in tickers:
+            if multi:
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                hist = data[ticker]
+            else:
+                hist = data
+            # O download agrupado alinha as datas de todos os tickers (feriados BR x EUA),
+            # então removemos as linhas sem fechamento para este ativo.
+            hist = hist.dropna(subset=['Close'])
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+    def download_histories(self, tickers, **range_kwargs):
+        import yfinance as yf
+        data = yf.download(
+            tickers, **range_kwargs, group_by="ticker", auto_adjust=True,
+            threads=True, progress=False
+        )
+        if data is None or data.empty:
+            raise EmptyResponseError("empty batch response")
+        return self._split_batch(data, tickers)
+
+    def history(self, ticker, **range_kwargs):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(**range_kwargs)
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def last_price(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).fast_info.get('last_price', 0.0)
+
+    def last_prices(self, tickers):
+        # One grouped intraday request instead of one fast_info lookup per ticker
+        import yfinance as yf
+        data = yf.download(
+            tickers, period="1d", interval="1m", group_by="ticker",
+            threads=True, progress=False
+        )
+        if data is None or data.empty:
+            raise EmptyResponseError("empty intraday response")
+        return {
+            ticker: float(hist['Close'].iloc[-1])
+            for ticker, hist in self._split_batch(data, tickers).items()
+        }
+
+    def selic(self):
+        from bcb import sgs
+        selic_series = sgs.get({'selic': 432}, last=1)
+        return float(selic_series['selic'].iloc[-1]), selic_series.index[-1]
+
+    def ptax(self, start, end):
+        from bcb import currency
+        ptax = currency.get('USD', start=start, end=end)
+        if ptax.empty:
+            raise ValueError(f"no PTAX quote between {start} and {end}")
+        return float(ptax['USD'].iloc[-1]), ptax.index[-1]
+
+
+class FixtureStore:
+    """
+    Fixture files of recorded provider responses, one JSON per call target:
+    <root>/<kind>/<ticker>.json (kind: history, info, last_price, indicators).
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, kind, key):
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', key)
+        return os.path.join(self.root, kind, f"{safe}.json")
+
+    def read(self, kind, key):
+        path = self._path(kind, key)
+        if not os.path.exists(path):
+            raise FixtureNotFoundError(f"{kind}/{key}")
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def write(self, kind, key, payload):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(payload, f, default=str)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def frame_to_payload(ticker, hist):
+        hist = hist.copy()
+        index = pd.to_datetime(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        hist.index = index.normalize()
+        return {"ticker": ticker, "data": json.loads(hist.to_json(orient='split', date_format='iso', double_precision=15))}
+
+    @staticmethod
+    def payload_to_frame(payload):
+        hist = pd.read_json(io.StringIO(json.dumps(payload['data'])), orient='split')
+        hist.index = pd.to_datetime(hist.index)
+        return hist
+
+
+class RecordingProvider(MarketDataProvider):
+    """Wraps a live provider and saves every successful response as a fixture."""
+    name = "record"
+
+    def __init__(self, inner, fixtures_dir):
+        self.inner = inner
+        self.fixtures = FixtureStore(fixtures_dir)
+
+    def _record_history(self, ticker, hist):
+        # Merge with what was already recorded so incremental downloads extend the fixture
+        try:
+            recorded = FixtureStore.payload_to_frame(self.fixtures.read('history', ticker))
+            new = FixtureStore.payload_to_frame(FixtureStore.frame_to_payload(ticker, hist))
+            merged = pd.concat([recorded[~recorded.index.isin(new.index)], new]).sort_index()
+        except FixtureNotFoundError:
+            merged = hist
+        self.fixtures.write('history', ticker, FixtureStore.frame_to_payload(ticker, merged))
+
+    def download_histories(self, tickers, **range_kwargs):
+        histories = self.inner.download_histories(tickers, **range_kwargs)
+        for ticker, hist in histories.items():
+            self._record_history(ticker, hist)
+        return histories
+
+    def history(self, ticker, **range_kwargs):
+        hist = self.inner.history(ticker, **range_kwargs)
+        if not hist.empty:
+            self._record_history(ticker, hist)
+        return hist
+
+    def info(self, ticker):
+        info = self.inner.info(ticker)
+        self.fixtures.write('info', ticker, {"ticker": ticker, "info": info})
+        return info
+
+    def last_price(self, ticker):
+        price = self.inner.last_price(ticker)
+        self.fixtures.write('last_price', ticker, {"ticker": ticker, "price": float(price)})
+        return price
+
+    def last_prices(self, tickers):
+        prices = self.inner.last_prices(tickers)
+        for ticker, price in prices.items():
+            self.fixtures.write('last_price', ticker, {"ticker": ticker, "price": float(price)})
+        return prices
+
+    def selic(self):
+        value, as_of = self.inner.selic()
+        self.fixtures.write('indicators', 'selic', {"value": value, "as_of": as_of.strftime('%Y-%m-%d')})
+        return value, as_of
+
+    def ptax(self, start, end):
+        value, as_of = self.inner.ptax(start, end)
+        self.fixtures.write('indicators', 'ptax', {"value": value, "as_of": as_of.strftime('%Y-%m-%d')})
+        return value, as_of
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded fixtures without network access, with a configurable artificial
+    latency per call, so the pipeline can be benchmarked deterministically offline.
+    A call that was never recorded raises FixtureNotFoundError.
+    """
+    name = "replay"
+
+    def __init__(self, fixtures_dir, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.fixtures = FixtureStore(fixtures_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+
+    def _sleep(self):
+        delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    @staticmethod
+    def _slice(hist, start=None, period=None, **_):
+        if start:
+            return hist[hist.index >= pd.Timestamp(start)]
+        if period == "1y":
+            return hist[hist.index >= hist.index.max() - pd.Timedelta(days=365)]
+        return hist
+
+    def _history(self, ticker, **range_kwargs):
+        hist = FixtureStore.payload_to_frame(self.fixtures.read('history', ticker))
+        return self._slice(hist, **range_kwargs)
+
+    def download_histories(self, tickers, **range_kwargs):
+        self._sleep()
+        histories = {}
+        for ticker in tickers:
+            try:
+                hist = self._history(ticker, **range_kwargs)
+            except FixtureNotFoundError:
+                continue
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+    def history(self, ticker, **range_kwargs):
+        self._sleep()
+        return self._history(ticker, **range_kwargs)
+
+    def info(self, ticker):
+        self._sleep()
+        return self.fixtures.read('info', ticker)['info']
+
+    def last_price(self, ticker):
+        self._sleep()
+        try:
+            return self.fixtures.read('last_price', ticker)['price']
+        except FixtureNotFoundError:
+            return float(self._history(ticker)['Close'].iloc[-1])
+
+    def _indicator(self, name):
+        self._sleep()
+        payload = self.fixtures.read('indicators', name)
+        return payload['value'], pd.Timestamp(payload['as_of'])
+
+    def selic(self):
+        return self._indicator('selic')
+
+    def ptax(self, start, end):
+        return self._indicator('ptax')
+
+
+class GuardedProvider(MarketDataProvider):
+    """
+    Routes every call of the wrapped provider through an OutboundGuard (rate limit,
+    retries with backoff, circuit breaker and run budget), keyed by host.
+    """
+
+    def __init__(self, inner, guard):
+        self.inner = inner
+        self.guard = guard
+        self.name = inner.name
+
+    def download_histories(self, tickers, **range_kwargs):
+        return self.guard.call("yahoo", self.inner.download_histories, tickers, **range_kwargs)
+
+    def history(self, ticker, **range_kwargs):
+        return self.guard.call("yahoo", self.inner.history, ticker, **range_kwargs)
+
+    def info(self, ticker):
+        return self.guard.call("yahoo", self.inner.info, ticker)
+
+    def last_price(self, ticker):
+        return self.guard.call("yahoo", self.inner.last_price, ticker)
+
+    def last_prices(self, tickers):
+        return self.guard.call("yahoo", self.inner.last_prices, tickers)
+
+    def selic(self):
+        return self.guard.call("bcb", self.inner.selic)
+
+    def ptax(self, start, end):
+        return self.guard.call("bcb", self.inner.ptax, start, end)
+
+    def new_run(self):
+        self.guard.reset_budget()
+        self.inner.new_run()
+
+
+def get_provider():
+    """Builds the provider selected by Settings.MARKET_DATA_PROVIDER (yahoo, record or replay)."""
+    mode = Settings.MARKET_DATA_PROVIDER.lower()
+    if mode == "replay":
+        provider = ReplayProvider(
+            Settings.MARKET_DATA_FIXTURES_DIR,
+            latency_ms=Settings.REPLAY_LATENCY_MS,
+            jitter_ms=Settings.REPLAY_JITTER_MS
+        )
+    elif mode == "record":
+        provider = RecordingProvider(YahooBCBProvider(), Settings.MARKET_DATA_FIXTURES_DIR)
+    else:
+        if mode != "yahoo":
+            logger.warning(f"Unknown MARKET_DATA_PROVIDER '{mode}', using yahoo.")
+        provider = YahooBCBProvider()
+
+    if Settings.OUTBOUND_GUARD_ENABLED:
+        provider = GuardedProvider(provider, OutboundGuard.from_settings())
+    return provider
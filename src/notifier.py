@@ -16,7 +16,7 @@ class Notifier:
         os.makedirs(self.template_dir, exist_ok=True)
         self.env = Environment(loader=FileSystemLoader(self.template_dir))
 
-    def send_email(self, subject, context):
+    def send_email(self, subject, context, recipients=None):
         if not Settings.EMAIL_SENDER or not Settings.EMAIL_PASSWORD:
             logger.warning("Email credentials not set. Skipping email.")
             return
@@ -24,7 +24,7 @@ class Notifier:
         msg = MIMEMultipart()
         msg['From'] = Settings.EMAIL_SENDER
 
-        raw_receivers = Settings.EMAIL_RECEIVER
+        raw_receivers = recipients or Settings.EMAIL_RECEIVER
         recipients_list = [email.strip() for email in raw_receivers.split(',')]
         msg['To'] = ", ".join(recipients_list)
 
@@ -66,6 +66,33 @@ class Notifier:
                     })
                 formatted_context['contribution'] = contribution_list
 
+            # Format per-ticker orders
+            orders_list = []
+            if context.get('orders') is not None:
+                for _, row in context['orders'].iterrows():
+                    orders_list.append({
+                        'ticker': row['ticker'],
+                        'action': row['action'],
+                        'quantity': f"{row['quantity']:g}",
+                        'value': f"{row['value']:,.2f}"
+                    })
+            formatted_context['orders'] = orders_list
+            formatted_context['unallocated_cash'] = f"{context.get('unallocated_cash', 0):,.2f}" if context.get('unallocated_cash') else None
+
+            # Format projection bands
+            projection_list = []
+            if context.get('projection') is not None:
+                for year, row in context['projection'].iterrows():
+                    projection_list.append({
+                        'year': year,
+                        'p5': f"{row['p5']:,.2f}",
+                        'p50': f"{row['p50']:,.2f}",
+                        'p95': f"{row['p95']:,.2f}",
+                        'contributed': f"{row['contributed']:,.2f}"
+                    })
+            formatted_context['projection'] = projection_list
+            formatted_context['monthly_contribution'] = f"{context.get('monthly_contribution', 0):,.2f}"
+
             html_content = template.render(formatted_context)
             msg.attach(MIMEText(html_content, 'html'))
             
@@ -0,0 +1,227 @@
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from requests.exceptions import JSONDecodeError as RequestsJSONDecodeError
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """The host's circuit breaker is open: fail fast and use the last known value."""
+
+class BudgetExceededError(Exception):
+    """The total time budget for outbound calls of this run is exhausted."""
+
+# Errors raised by a host that answered (bad/empty data): not retried, not counted as host failures
+NON_RETRYABLE = (ValueError, KeyError, TypeError)
+# ...except an unparseable body, which is what a throttled Yahoo answers (HTML or empty page)
+RETRYABLE_DECODE = (json.JSONDecodeError, RequestsJSONDecodeError)
+
+def _non_retryable(error):
+    return isinstance(error, NON_RETRYABLE) and not isinstance(error, RETRYABLE_DECODE)
+
+class TokenBucket:
+    """Allows `rate` calls per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Blocks until a token is available; raises BudgetExceededError if that passes the deadline."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise BudgetExceededError("rate limit wait exceeds the outbound budget")
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; while open every call fails fast.
+    After `reset_timeout` seconds one trial call is let through (half-open): success closes
+    the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Ends a half-open trial without a verdict (the call failed for a reason unrelated to the host)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+class OutboundGuard:
+    """
+    Shared layer for outbound market-data calls: per-host token-bucket rate limiting,
+    retries with exponential backoff and full jitter, a per-host circuit breaker and a
+    total time budget for the run. Once the budget is spent every call fails fast.
+    Each attempt is also cut at `call_timeout` seconds (or the remaining budget, if
+    shorter) and counts as a host failure; the hung call is abandoned in its thread.
+    An abandoned call keeps one of the host's `max_in_flight` slots until it actually
+    returns, so retries of hung calls never pile more than that on a slow host.
+    """
+
+    def __init__(self, budget_seconds, rate_limits, max_retries=3, backoff_base=0.5,
+                 backoff_cap=8.0, failure_threshold=5, reset_timeout=60.0, call_timeout=30.0,
+                 max_in_flight=8):
+        self.budget_seconds = budget_seconds
+        self.deadline = time.monotonic() + budget_seconds
+        self.call_timeout = call_timeout
+        self.max_in_flight = max_in_flight
+        self.rate_limits = rate_limits
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.buckets = {}
+        self.breakers = {}
+        self.slots = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            budget_seconds=Settings.OUTBOUND_BUDGET_SECONDS,
+            rate_limits=Settings.OUTBOUND_RATE_LIMITS,
+            max_retries=Settings.OUTBOUND_MAX_RETRIES,
+            backoff_base=Settings.OUTBOUND_BACKOFF_BASE,
+            backoff_cap=Settings.OUTBOUND_BACKOFF_CAP,
+            failure_threshold=Settings.OUTBOUND_BREAKER_THRESHOLD,
+            reset_timeout=Settings.OUTBOUND_BREAKER_RESET,
+            call_timeout=Settings.OUTBOUND_CALL_TIMEOUT,
+            max_in_flight=Settings.OUTBOUND_MAX_IN_FLIGHT,
+        )
+
+    def _host(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                rate, capacity = self.rate_limits.get(host, (5.0, 10))
+                self.buckets[host] = TokenBucket(rate, capacity)
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.slots[host] = threading.BoundedSemaphore(self.max_in_flight)
+                self.stats[host] = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+            return self.buckets[host], self.breakers[host], self.stats[host]
+
+    def reset_budget(self):
+        """Starts a new budget window (long-running callers reset it once per unit of work)."""
+        self.deadline = time.monotonic() + self.budget_seconds
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def _run(self, host, fn, args, kwargs):
+        """
+        Runs one attempt in a daemon thread, raising TimeoutError if it outlives its
+        timeout. The thread holds one of the host's in-flight slots until fn returns;
+        waiting for a free slot counts against the same timeout.
+        """
+        started = time.monotonic()
+        timeout = min(self.call_timeout, self.remaining())
+        slots = self.slots[host]
+        if not slots.acquire(timeout=max(timeout, 0.0)):
+            raise TimeoutError(f"{host}: all {self.max_in_flight} in-flight calls still running after {timeout:.1f}s")
+        done = queue.Queue(maxsize=1)
+
+        def target():
+            try:
+                done.put((True, fn(*args, **kwargs)))
+            except BaseException as e:
+                done.put((False, e))
+            finally:
+                slots.release()
+
+        threading.Thread(target=target, name=f"outbound-{host}", daemon=True).start()
+        try:
+            ok, value = done.get(timeout=max(timeout - (time.monotonic() - started), 0.0))
+        except queue.Empty:
+            raise TimeoutError(f"{host} call timed out after {timeout:.1f}s") from None
+        if not ok:
+            raise value
+        return value
+
+    def call(self, host, fn, *args, **kwargs):
+        bucket, breaker, stats = self._host(host)
+        attempt = 0
+        while True:
+            if self.remaining() <= 0:
+                stats["short_circuited"] += 1
+                raise BudgetExceededError(f"outbound budget exhausted ({host})")
+            if not breaker.allow():
+                stats["short_circuited"] += 1
+                raise CircuitOpenError(f"circuit open for {host}")
+
+            bucket.acquire(self.deadline)
+            stats["calls"] += 1
+            try:
+                result = self._run(host, fn, args, kwargs)
+            except Exception as e:
+                if _non_retryable(e):
+                    breaker.release_trial()
+                    raise
+                stats["failures"] += 1
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                if delay >= self.remaining():
+                    raise
+                logger.info(f"{host} call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                stats["retries"] += 1
+                attempt += 1
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
@@ -0,0 +1,134 @@
+import json
+import math
+import logging
+from datetime import date, timedelta
+from src.market_calendar import is_business_day
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+class PerformanceTracker:
+    """
+    Running performance statistics of the portfolio history, updated in O(1) per new
+    daily point and persisted in the history store (meta key 'performance'):
+    - cumulative time-weighted return (chained period returns; contributions are not
+      recorded separately in the history, so they show up as return),
+    - rolling annualized volatility over the last `vol_window` returns,
+    - maximum drawdown of the return index,
+    - annualized Sharpe ratio of the returns in excess of the CDI.
+
+    Re-running on the same day replaces that day's point (the state keeps a snapshot
+    taken before it). If the state does not match the stored history (first run,
+    crash between writes) it is rebuilt once from the history.
+    """
+
+    META_KEY = "performance"
+
+    def __init__(self, store, vol_window=21):
+        self.store = store
+        self.vol_window = vol_window
+
+    def _load(self):
+        raw = self.store.get_meta(self.META_KEY)
+        try:
+            return json.loads(raw) if raw else None
+        except ValueError as e:
+            logger.warning(f"Invalid performance state, rebuilding: {e}")
+            return None
+
+    @staticmethod
+    def _business_days(start, end):
+        start, end = date.fromisoformat(start), date.fromisoformat(end)
+        days = 0
+        while start < end:
+            start += timedelta(days=1)
+            days += is_business_day(start)
+        return max(days, 1)
+
+    def _apply(self, state, day, value, cdi_pct):
+        """Returns the state after adding the point (day, value)."""
+        if state is None:
+            return {
+                "last_date": day, "last_value": value, "count": 0, "growth": 1.0, "peak": 1.0,
+                "max_drawdown": 0.0, "excess_mean": 0.0, "excess_m2": 0.0, "window": [], "prev": None,
+            }
+
+        new = dict(state, window=list(state["window"]), last_date=day, last_value=value)
+        new["prev"] = dict(state, prev=None)
+        if state["last_value"] <= 0 or value <= 0:
+            return new
+
+        period_return = value / state["last_value"] - 1
+        risk_free = (1 + cdi_pct / 100) ** (self._business_days(state["last_date"], day) / TRADING_DAYS) - 1
+
+        new["growth"] = state["growth"] * (1 + period_return)
+        new["peak"] = max(state["peak"], new["growth"])
+        new["max_drawdown"] = max(state["max_drawdown"], 1 - new["growth"] / new["peak"])
+
+        # Welford's online mean/variance of the excess returns
+        excess = period_return - risk_free
+        new["count"] = state["count"] + 1
+        delta = excess - state["excess_mean"]
+        new["excess_mean"] = state["excess_mean"] + delta / new["count"]
+        new["excess_m2"] = state["excess_m2"] + delta * (excess - new["excess_mean"])
+
+        new["window"].append(period_return)
+        if len(new["window"]) > self.vol_window:
+            new["window"].pop(0)
+        return new
+
+    def _rebuild(self, before, cdi_pct):
+        state = None
+        for entry in self.store.load():
+            if entry["date"] >= before:
+                break
+            state = self._apply(state, entry["date"], entry["value"], cdi_pct)
+        return state
+
+    def update(self, day, value, cdi_pct):
+        """Adds (or replaces) the point of `day` and returns the metrics."""
+        state = self._load()
+        if state is not None and state["last_date"] == day:
+            state = state["prev"]
+
+        previous = self.store.previous(day)
+        expected_last = previous[0] if previous else None
+        if (state["last_date"] if state else None) != expected_last:
+            logger.info("Performance state out of sync with the history, rebuilding it.")
+            state = self._rebuild(day, cdi_pct)
+
+        state = self._apply(state, day, float(value), float(cdi_pct or 0.0))
+        try:
+            self.store.set_meta(self.META_KEY, json.dumps(state))
+        except Exception as e:
+            logger.error(f"Failed to save performance state: {e}")
+        return self.metrics(state)
+
+    def get(self):
+        """Metrics of the persisted state, without touching the history (None if empty)."""
+        state = self._load()
+        return self.metrics(state) if state else None
+
+    @staticmethod
+    def metrics(state):
+        window = state["window"]
+        volatility = None
+        if len(window) >= 2:
+            mean = sum(window) / len(window)
+            variance = sum((r - mean) ** 2 for r in window) / (len(window) - 1)
+            volatility = math.sqrt(variance * TRADING_DAYS) * 100
+
+        sharpe = None
+        if state["count"] >= 2 and state["excess_m2"] > 0:
+            std = math.sqrt(state["excess_m2"] / (state["count"] - 1))
+            sharpe = state["excess_mean"] / std * math.sqrt(TRADING_DAYS)
+
+        return {
+            "as_of": state["last_date"],
+            "periods": state["count"],
+            "twr_pct": (state["growth"] - 1) * 100,
+            "volatility_pct": volatility,
+            "max_drawdown_pct": state["max_drawdown"] * 100,
+            "sharpe": sharpe,
+        }
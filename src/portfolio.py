@@ -1,171 +1,182 @@
+import numpy as np
 import pandas as pd
-import json
 import os
 from datetime import datetime
 from config.settings import Settings
+from src.history_store import PortfolioHistoryStore
+from src.performance import PerformanceTracker
+from src.rebalancer import RebalanceOptimizer
+from src.simulation import MonteCarloProjector
+from src.fx import FxSnapshot, currency_of
 import logging
 
 logger = logging.getLogger(__name__)
 
 class PortfolioManager:
-    def __init__(self, portfolio_data, market_data, indicators):
+    # Map internal categories to Target Allocation keys
+    CATEGORY_MAP = {
+        "BR_STOCKS": "Ações BR",
+        "FIIS": "FIIs",
+        "ETFS": "ETFs",
+        "US_REITS": "REITs",
+        "US_STOCKS": "Ações EUA",
+        "CRYPTO": "Cripto",
+        "RENDA_FIXA": "Renda Fixa"
+    }
+
+    def __init__(self, portfolio_data, market_data, indicators, fx=None, history_path=None):
         self.portfolio_data = portfolio_data
         self.market_data = market_data
         self.indicators = indicators
+        # Exchange rates of the run (one snapshot shared by every position), built on first use
+        self._fx = fx
         self.target_alloc = Settings.TARGET_ALLOCATION
+        # Each portfolio of a batch run keeps its own history; the default one imports data/history.json
+        self.history_path = history_path or Settings.HISTORY_STORE_PATH
+        self._history_store = None
+        self.performance = None
         
         # Ensure data dir exists
         os.makedirs("data", exist_ok=True)
 
+    @property
+    def fx(self):
+        if self._fx is None:
+            self._fx = FxSnapshot.from_market_data(
+                self.market_data, self.indicators,
+                currencies={currency_of(item['ticker'], item.get('category')) for item in self.portfolio_data}
+            )
+        return self._fx
+
+    @property
+    def history_store(self):
+        if self._history_store is None:
+            legacy_json = "data/history.json" if self.history_path == Settings.HISTORY_STORE_PATH else None
+            self._history_store = PortfolioHistoryStore(self.history_path, legacy_json=legacy_json)
+        return self._history_store
+
     def _load_history(self):
-        """Loads history data from JSON file."""
-        history_file = "data/history.json"
+        """Loads the daily history (list of {"date", "value"}, oldest first)."""
         try:
-            if os.path.exists(history_file):
-                with open(history_file, 'r') as f:
-                    return json.load(f)
-            return []
+            return self.history_store.load()
         except Exception as e:
-            logger.error(f"Failed to load history.json: {e}")
+            logger.error(f"Failed to load portfolio history: {e}")
             return []
 
     def _save_history(self, total_value):
         """Saves daily total value to history."""
-        history_file = "data/history.json"
         today = datetime.now().strftime("%Y-%m-%d")
-        
-        history = self._load_history()
-        
-        # Check if today is already in history, update if so
-        updated = False
-        for entry in history:
-            if entry['date'] == today:
-                entry['value'] = total_value
-                updated = True
-                break
-        
-        if not updated:
-            history.append({
-                "date": today,
-                "value": total_value
-            })
-            
         try:
-            with open(history_file, 'w') as f:
-                json.dump(history, f, indent=2)
+            self.history_store.upsert(today, total_value)
         except Exception as e:
-            logger.error(f"Failed to save history.json: {e}")
+            logger.error(f"Failed to save portfolio history: {e}")
 
-    def calculate_portfolio(self):
-        portfolio = []
-        total_value = 0
-        
-        # 1. Process Tickers from Sheet Data
-        for item in self.portfolio_data:
-            ticker = item['ticker']
-            qty = item['quantity'] # Note: key is 'quantity' from SheetsManager, not 'qty'
-            category = item.get('category', 'OUTROS')
-            
-            # Market Data
-            data = self.market_data.get(ticker, {})
-            current_price = data.get('price', 0)
-            
-            # --- LOGIC CORRECTIONS ---
-            
-            # 1. Renda Fixa: Value = Qty * 1.0
-            if category == "RENDA_FIXA":
-                value_brl = qty * 1.0
-                current_price = 1.0
-                avg_price_brl = 0 # Not tracking avg price for RF yet
-                
-            # 2. Crypto Logic
-            elif category == "CRYPTO":
-                if ticker.endswith("-BRL"):
-                    value_brl = current_price * qty
-                    avg_price_brl = 0
-                else:
-                    # USDT-USD, BTC-USD, etc.
-                    usd_rate = self.market_data.get('BRL=X', {}).get('price', 0)
-                    
-                    # Fallback de segurança se o Yahoo falhar no dólar
-                    if usd_rate <= 0:
-                        usd_rate = 6.00 # Taxa aproximada segura
-                        logger.warning("Usando taxa de dólar fallback (6.00) para conversão de cripto.")
-                        
-                    value_brl = current_price * qty * usd_rate
-                    avg_price_brl = 0
-
-            # 3. US Stocks/REITs -> Convert to BRL
-            elif category in ["US_REITS", "US_STOCKS"]:
-                usd_rate = self.market_data.get('BRL=X', {}).get('price', 0)
-                if usd_rate <= 0: 
-                    usd_rate = 6.00
-                    logger.warning("Usando taxa de dólar fallback (6.00) para ativos EUA.")
-                    
-                value_brl = current_price * qty * usd_rate
-                avg_price_brl = 0
-                
-            # 4. Brazilian Assets (Stocks, FIIs, ETFs, BDRs)
-            else:
-                value_brl = current_price * qty
-                avg_price_brl = 0
+    def _update_performance(self, total_value):
+        """Feeds today's value into the running performance statistics."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        try:
+            tracker = PerformanceTracker(self.history_store, Settings.PERFORMANCE_VOL_WINDOW)
+            return tracker.update(today, total_value, self.indicators.get('cdi') or 0.0)
+        except Exception as e:
+            logger.error(f"Failed to update performance statistics: {e}")
+            return None
 
-            if current_price == 0 and category != "RENDA_FIXA":
-                logger.warning(f"Price for {ticker} is 0. Check data source.")
+    @staticmethod
+    def position_value(category, qty, price, fx_rate):
+        """
+        Value in BRL of a single position; fx_rate is BRL per unit of the position's
+        currency (currency_of, 1.0 for BRL assets).
+        """
+        # 1. Renda Fixa: Value = Qty * 1.0
+        if category == "RENDA_FIXA":
+            return qty * 1.0
+        # 2. Crypto, US Stocks/REITs and Brazilian assets: quote converted to BRL
+        return price * qty * fx_rate
 
-            # Safety check for NaN
-            if pd.isna(value_brl):
-                value_brl = 0.0
+    # Market data fields copied to the portfolio frame and their defaults
+    NUMERIC_QUOTE_FIELDS = {"dy_12m": 0, "p_vp": 0, "pe": 0, "roe": 0}
+    TEXT_QUOTE_FIELDS = {"sector": "Unknown", "recommendation": "None"}
+    CHANGE_FIELDS = {"change_1d": 0, "change_12m": 0}
+
+    def _value_positions(self):
+        """
+        Columnar valuation: the quotes are loaded into one frame, aligned to the
+        holdings by ticker, and the Renda Fixa / FX rules are applied with vectorized
+        masks (same results as position_value). Missing or non-numeric quote values
+        take the field's default. Returns the portfolio frame (without allocation)
+        and the total value.
+        """
+        holdings = pd.DataFrame.from_records(self.portfolio_data)
+        tickers = holdings['ticker'].to_numpy(dtype=object)
+        qty = holdings['quantity'].to_numpy(dtype=float) # Note: key is 'quantity' from SheetsManager, not 'qty'
+        category = holdings.get('category', pd.Series(index=holdings.index, dtype=object)).fillna('OUTROS').to_numpy(dtype=object)
+
+        # Quotes of the held tickers, one row per position (all NaN when the ticker has none)
+        quotes = pd.DataFrame.from_records(list(self.market_data.values()), index=list(self.market_data)).reindex(tickers)
+
+        def quote_column(field, default):
+            if field not in quotes:
+                return pd.Series(default, index=quotes.index, dtype=object)
+            return quotes[field].astype(object).where(quotes[field].notna(), default)
+
+        def numeric_column(field, default):
+            return pd.to_numeric(quote_column(field, default), errors='coerce').fillna(default).to_numpy(dtype=float)
+
+        # --- LOGIC CORRECTIONS ---
+        # 1. Renda Fixa: Value = Qty * 1.0
+        is_rf = category == "RENDA_FIXA"
+        # 2. Crypto and 3. US Stocks/REITs -> Convert to BRL with the rate of their currency
+        currencies, currency_idx = np.unique(
+            np.array([currency_of(t, c) for t, c in zip(tickers, category)], dtype=object).astype(str),
+            return_inverse=True
+        )
+        fx_rate = np.array([self.fx.rate(c) for c in currencies], dtype=float)[currency_idx]
+
+        price = np.where(is_rf, 1.0, numeric_column('price', 0))
+        value_brl = np.where(is_rf, qty, price * qty * fx_rate)
+        # Safety check for NaN
+        value_brl = np.nan_to_num(value_brl, nan=0.0)
+
+        for ticker in tickers[(price == 0) & ~is_rf]:
+            logger.warning(f"Price for {ticker} is 0. Check data source.")
+
+        names = quote_column('name', None).to_numpy(dtype=object)
+        columns = {
+            "ticker": tickers.tolist(),
+            "qty": qty,
+            "price": price,
+            "value_brl": value_brl,
+            "category": category.tolist(),
+            "name": np.where(pd.isna(names), tickers, names).tolist(),
+        }
+        for field, default in self.NUMERIC_QUOTE_FIELDS.items():
+            columns[field] = numeric_column(field, default)
+        for field, default in self.TEXT_QUOTE_FIELDS.items():
+            columns[field] = quote_column(field, default).tolist()
+        for field, default in self.CHANGE_FIELDS.items():
+            columns[field] = numeric_column(field, default)
+        # Profit/Loss: average price is not tracked yet, so there is no cost to compare with
+        columns["profit_loss_pct"] = np.zeros(len(tickers))
+        columns["profit_loss_val"] = np.zeros(len(tickers))
+
+        return pd.DataFrame(columns), float(value_brl.sum())
+
+    def calculate_portfolio(self):
+        if self.portfolio_data:
+            df, total_value = self._value_positions()
+        else:
+            df, total_value = pd.DataFrame(), 0
 
-            total_value += value_brl
-            
-            # Calculate Profit/Loss
-            if avg_price_brl > 0:
-                profit_loss_pct = ((value_brl - (avg_price_brl * qty)) / (avg_price_brl * qty)) * 100
-                profit_loss_val = value_brl - (avg_price_brl * qty)
-            else:
-                profit_loss_pct = 0.0
-                profit_loss_val = 0.0
-
-            portfolio.append({
-                "ticker": ticker,
-                "qty": qty,
-                "price": current_price,
-                "value_brl": value_brl,
-                "category": category,
-                "name": data.get('name', ticker),
-                "dy_12m": data.get('dy_12m', 0),
-                "p_vp": data.get('p_vp', 0),
-                "pe": data.get('pe', 0),
-                "roe": data.get('roe', 0),
-                "sector": data.get('sector', 'Unknown'),
-                "recommendation": data.get('recommendation', 'None'),
-                "change_1d": data.get('change_1d', 0),
-                "change_12m": data.get('change_12m', 0),
-                "profit_loss_pct": profit_loss_pct,
-                "profit_loss_val": profit_loss_val
-            })
-            
         # 2. History & Variation
-        history = self._load_history()
         daily_variation_pct = 0.0
-        
-        if history:
-            history.sort(key=lambda x: x['date'])
-            today = datetime.now().strftime("%Y-%m-%d")
-            last_entry = None
-            for entry in reversed(history):
-                if entry['date'] != today:
-                    last_entry = entry
-                    break
-            
-            if last_entry and last_entry['value'] > 0:
-                daily_variation_pct = ((total_value - last_entry['value']) / last_entry['value']) * 100
+        previous_value = self.get_previous_value()
+        if previous_value and previous_value > 0:
+            daily_variation_pct = ((total_value - previous_value) / previous_value) * 100
 
         # Save today's value
         self._save_history(total_value)
+        self.performance = self._update_performance(total_value)
 
-        df = pd.DataFrame(portfolio)
         if not df.empty:
             df['allocation'] = (df['value_brl'] / total_value) * 100
         else:
@@ -173,21 +184,20 @@ class PortfolioManager:
         
         return df, total_value, daily_variation_pct
 
+    def get_previous_value(self):
+        """Portfolio value of the last recorded day before today (None if there is none)."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        try:
+            previous = self.history_store.previous(today)
+        except Exception as e:
+            logger.error(f"Failed to load portfolio history: {e}")
+            return None
+        return previous[1] if previous else None
+
     def get_rebalancing_suggestions(self, df, total_value):
-        # Map internal categories to Target Allocation keys
-        cat_map = {
-            "BR_STOCKS": "Ações BR",
-            "FIIS": "FIIs",
-            "ETFS": "ETFs",
-            "US_REITS": "REITs",
-            "US_STOCKS": "Ações EUA",
-            "CRYPTO": "Cripto",
-            "RENDA_FIXA": "Renda Fixa"
-        }
-        
         # Group by category
         if not df.empty:
-            df['target_cat'] = df['category'].map(cat_map)
+            df['target_cat'] = df['category'].map(self.CATEGORY_MAP)
             current_alloc = df.groupby('target_cat')['value_brl'].sum() / total_value
         else:
             current_alloc = pd.Series()
@@ -214,6 +224,34 @@ class PortfolioManager:
             
         return pd.DataFrame(suggestions)
 
+    def get_rebalancing_orders(self, df, cash=0.0):
+        """Concrete per-ticker buy/sell orders (lot-aware) that bring the portfolio towards the target."""
+        optimizer = RebalanceOptimizer(
+            self.target_alloc,
+            self.CATEGORY_MAP,
+            lot_sizes=Settings.REBALANCE_LOT_SIZES,
+            fixed_cost=Settings.REBALANCE_TRADE_COST,
+            pct_cost=Settings.REBALANCE_TRADE_COST_PCT,
+            sell_band=Settings.REBALANCE_SELL_BAND,
+            min_order=Settings.REBALANCE_MIN_ORDER,
+            allow_sell=Settings.REBALANCE_ALLOW_SELL,
+        )
+        return optimizer.optimize(df, cash)
+
+    def get_projection(self, df, closes, monthly_contribution=0.0, workers=None):
+        """Monte Carlo percentile bands of the portfolio value for the next Settings.SIMULATION_YEARS."""
+        if df.empty:
+            return pd.DataFrame()
+        positions = df[['ticker', 'category', 'value_brl']].copy()
+        positions['currency'] = [currency_of(t, c) for t, c in zip(positions['ticker'], positions['category'])]
+        projector = MonteCarloProjector(closes, positions, self.indicators.get('cdi') or 0.0, monthly_contribution)
+        return projector.run(
+            years=Settings.SIMULATION_YEARS,
+            n_paths=Settings.SIMULATION_PATHS,
+            workers=Settings.SIMULATION_WORKERS if workers is None else workers,
+            seed=Settings.SIMULATION_SEED,
+        )
+
     def suggest_contribution(self, amount, df_suggestions):
         # Simple logic: Distribute amount to categories with biggest negative deviation (COMPRAR)
         # Prioritize Variable Income if RF > 40% (User rule: "priorizar variável enquanto RF >40%")
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class PriceHistoryStore:
+    """
+    Local store of daily closes keyed by ticker (SQLite under data/).
+    Lets DataCollector download only the bars after the last stored one.
+    """
+
+    def __init__(self, path="data/price_history.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bars (
+                    ticker TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    close REAL NOT NULL,
+                    PRIMARY KEY (ticker, date)
+                )
+                """
+            )
+
+    @staticmethod
+    def _to_rows(ticker, hist):
+        index = pd.to_datetime(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        closes = hist['Close'].to_numpy()
+        return [
+            (ticker, day.strftime("%Y-%m-%d"), float(close))
+            for day, close in zip(index, closes)
+            if not pd.isna(close)
+        ]
+
+    def last_bar(self, ticker):
+        """Returns (date 'YYYY-MM-DD', close) of the most recent stored bar, or None."""
+        row = self.conn.execute(
+            "SELECT date, close FROM bars WHERE ticker = ? ORDER BY date DESC LIMIT 1",
+            (ticker,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def settled_bar(self, ticker):
+        """
+        Returns (date, close) of the bar before the most recent one (the last one
+        alone if only one is stored), or None. The most recent bar may have been
+        stored while still trading (intraday or 24/7 assets), so it is no anchor
+        for detecting re-adjusted history.
+        """
+        rows = self.conn.execute(
+            "SELECT date, close FROM bars WHERE ticker = ? ORDER BY date DESC LIMIT 2",
+            (ticker,)
+        ).fetchall()
+        return (rows[-1][0], rows[-1][1]) if rows else None
+
+    def upsert(self, ticker, hist, replace_from=None):
+        """
+        Merges new bars into the stored series (existing dates are overwritten).
+        With replace_from ('YYYY-MM-DD'), stored bars from that date on are dropped first.
+        """
+        rows = self._to_rows(ticker, hist)
+        with self.conn:
+            if replace_from:
+                self.conn.execute("DELETE FROM bars WHERE ticker = ? AND date >= ?", (ticker, replace_from))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bars (ticker, date, close) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def replace(self, ticker, hist):
+        """Drops the stored series of a ticker and writes a fresh one (full re-sync)."""
+        rows = self._to_rows(ticker, hist)
+        with self.conn:
+            self.conn.execute("DELETE FROM bars WHERE ticker = ?", (ticker,))
+            self.conn.executemany(
+                "INSERT INTO bars (ticker, date, close) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def load(self, ticker, start=None):
+        """Returns the stored bars as a DataFrame with a 'Close' column and a DatetimeIndex."""
+        query = "SELECT date, close FROM bars WHERE ticker = ?"
+        params = [ticker]
+        if start:
+            query += " AND date >= ?"
+            params.append(start)
+        rows = self.conn.execute(query + " ORDER BY date", params).fetchall()
+        if not rows:
+            return pd.DataFrame(columns=['Close'])
+        dates, closes = zip(*rows)
+        return pd.DataFrame({'Close': closes}, index=pd.to_datetime(list(dates)))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,159 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class RebalanceOptimizer:
+    """
+    Turns the target allocation into concrete per-ticker orders.
+
+    Greedy minimization of the tracking error (sum of squared category deviations
+    from the target, measured on the value after the contribution):
+    - Sells only happen in categories above target by more than `sell_band`, never
+      in Renda Fixa ("reserva de oportunidade"), largest holdings first, and only
+      in whole lots that keep the category at or above its target.
+    - The contribution plus the sell proceeds are then spent on the category with
+      the largest deficit (never one that just sold), one ticker at a time, in
+      whole lots (B3 lot sizes,
+      crypto fractional steps, Renda Fixa to the centavo). A lot is only bought
+      while it reduces the squared deviation, so orders never overshoot by more
+      than half a lot.
+    - Each order pays `fixed_cost` + `pct_cost` * value, and orders below
+      `min_order` are skipped, so the result has few, meaningful trades.
+    - Cash that no order absorbs (e.g. proceeds meant for a category without any
+      holding to buy) is reported in the result's attrs["unallocated_cash"].
+    Each category is resolved with at most a couple of vectorized passes over its
+    tickers, so books with hundreds of tickers are solved in milliseconds.
+    """
+
+    def __init__(self, target_alloc, category_map, lot_sizes, fixed_cost=0.0, pct_cost=0.0,
+                 sell_band=0.05, min_order=0.0, allow_sell=True):
+        self.target_alloc = target_alloc
+        self.category_map = category_map
+        self.lot_sizes = lot_sizes
+        self.fixed_cost = fixed_cost
+        self.pct_cost = pct_cost
+        self.sell_band = sell_band
+        self.min_order = min_order
+        self.allow_sell = allow_sell
+
+    def _cost(self, value):
+        return self.fixed_cost + self.pct_cost * value
+
+    def _order(self, orders, book, i, action, units):
+        value = units * book['unit_price'][i]
+        orders.append({
+            "ticker": book['ticker'][i],
+            "category": book['target_cat'][i],
+            "action": action,
+            "quantity": round(float(units), 8),
+            "price": book['unit_price'][i],
+            "value": value,
+            "cost": self._cost(value),
+        })
+        return value
+
+    def optimize(self, df, cash=0.0):
+        """
+        df: output of PortfolioManager.calculate_portfolio (ticker, category, qty, value_brl).
+        cash: amount to invest (monthly contribution). Returns a DataFrame of orders,
+        with the cash left after them in attrs["unallocated_cash"].
+        """
+        columns = ["ticker", "category", "action", "quantity", "price", "value", "cost"]
+        if df.empty:
+            return self._result(pd.DataFrame(columns=columns), cash)
+
+        qty = df['qty'].to_numpy(dtype=float)
+        value = df['value_brl'].to_numpy(dtype=float)
+        book = {
+            "ticker": df['ticker'].to_numpy(),
+            "category": df['category'].to_numpy(),
+            "target_cat": df['category'].map(self.category_map).to_numpy(),
+            "qty": qty,
+            "unit_price": np.divide(value, qty, out=np.zeros_like(value), where=qty > 0),
+        }
+        book['lot'] = np.array([self.lot_sizes.get(c, 1) for c in book['category']], dtype=float)
+        book['lot_value'] = book['lot'] * book['unit_price']
+        tradable = book['unit_price'] > 0
+
+        total_after = value.sum() + cash
+        if total_after <= 0:
+            return self._result(pd.DataFrame(columns=columns), cash)
+
+        current = {cat: value[book['target_cat'] == cat].sum() for cat in self.target_alloc}
+        desired = {cat: target * total_after for cat, target in self.target_alloc.items()}
+        orders = []
+        sold_cats = set()
+
+        # 1. Sells in categories clearly above target (never Renda Fixa)
+        if self.allow_sell:
+            for cat in self.target_alloc:
+                excess = current[cat] - desired[cat]
+                if cat == "Renda Fixa" or excess <= self.sell_band * total_after:
+                    continue
+                members = np.flatnonzero((book['target_cat'] == cat) & tradable)
+                for i in members[np.argsort(-value[members])]:
+                    lots = min(np.floor(book['qty'][i] / book['lot'][i]), np.floor(excess / book['lot_value'][i]))
+                    if lots <= 0:
+                        continue
+                    sold = self._order(orders, book, i, "VENDER", lots * book['lot'][i])
+                    cash += sold - self._cost(sold)
+                    current[cat] -= sold
+                    excess -= sold
+                    sold_cats.add(cat)
+
+        # 2. Buys: largest deficit first, whole lots while they reduce the squared deviation
+        exhausted = set(sold_cats)
+        while True:
+            open_cats = [cat for cat in self.target_alloc if cat not in exhausted and desired[cat] > current[cat]]
+            if not open_cats:
+                break
+            cat = max(open_cats, key=lambda c: desired[c] - current[c])
+            deficit = desired[cat] - current[cat]
+
+            members = np.flatnonzero((book['target_cat'] == cat) & tradable)
+            lot_value = book['lot_value'][members]
+            affordable = lot_value * (1 + self.pct_cost) + self.fixed_cost <= cash
+            useful = lot_value < 2 * deficit
+            candidates = members[affordable & useful]
+            if candidates.size == 0:
+                exhausted.add(cat)
+                continue
+
+            # Fewest trades: the ticker whose whole lots land closest to the deficit
+            budget = (cash - self.fixed_cost) / (1 + self.pct_cost)
+            lots = np.minimum(np.round(deficit / book['lot_value'][candidates]),
+                              np.floor(budget / book['lot_value'][candidates]))
+            residual = np.abs(deficit - lots * book['lot_value'][candidates])
+            best = int(np.argmin(np.where(lots > 0, residual, np.inf)))
+            i = candidates[best]
+            bought_value = lots[best] * book['lot_value'][i]
+            if lots[best] <= 0 or bought_value < self.min_order:
+                exhausted.add(cat)
+                continue
+
+            bought = self._order(orders, book, i, "COMPRAR", lots[best] * book['lot'][i])
+            cash -= bought + self._cost(bought)
+            current[cat] += bought
+
+        unfilled = [cat for cat in self.target_alloc if desired[cat] - current[cat] > self.sell_band * total_after]
+        if unfilled:
+            logger.info(f"Categories still below target after the orders: {', '.join(unfilled)}")
+        if sold_cats and cash > self.min_order:
+            logger.info(f"R$ {cash:,.2f} left unallocated after the orders (no holding to buy in the underweight categories).")
+
+        orders_df = pd.DataFrame(orders, columns=columns)
+        # A ticker may be picked in more than one pass: merge into a single order
+        if not orders_df.empty:
+            orders_df = orders_df.groupby(['ticker', 'category', 'action', 'price'], as_index=False, sort=False)[
+                ['quantity', 'value']
+            ].sum()
+            orders_df['cost'] = self._cost(orders_df['value'])
+            orders_df = orders_df[columns]
+        return self._result(orders_df, cash)
+
+    @staticmethod
+    def _result(orders_df, cash):
+        orders_df.attrs["unallocated_cash"] = max(float(cash), 0.0)
+        return orders_df
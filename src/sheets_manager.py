@@ -6,9 +6,9 @@ logger = logging.getLogger(__name__)
 
 class SheetsManager:
     @staticmethod
-    def get_portfolio_from_sheets():
-        """Reads portfolio data from Google Sheets CSV."""
-        url = Settings.SHEET_CSV_URL
+    def get_portfolio_from_sheets(url=None):
+        """Reads portfolio data from Google Sheets CSV (Settings.SHEET_CSV_URL by default)."""
+        url = url or Settings.SHEET_CSV_URL
         if not url:
             logger.error("SHEET_CSV_URL not found in settings.")
             return []
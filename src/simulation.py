@@ -0,0 +1,133 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.fx import FX_QUOTES
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_MONTH = 21
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def _simulate_batch(monthly_returns, start_values, contribution_weights, contribution, months, n_paths, seed):
+    """
+    Simulates `n_paths` buy-and-hold paths (monthly steps) and returns the total value at
+    the end of every year, shape (n_paths, months // 12). Every month each path draws one
+    historical block of 21-day returns (a whole row, so the cross-asset correlation is
+    kept), the contribution is added with the given weights and the positions drift.
+    Module-level so it can run in a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.broadcast_to(start_values, (n_paths, start_values.size)).copy()
+    monthly_contribution = contribution * contribution_weights
+    checkpoints = np.empty((n_paths, months // 12))
+    for month in range(months):
+        blocks = rng.integers(0, monthly_returns.shape[0], size=n_paths)
+        values += monthly_contribution
+        values *= 1.0 + monthly_returns[blocks]
+        if (month + 1) % 12 == 0:
+            checkpoints[:, month // 12] = values.sum(axis=1)
+    return checkpoints
+
+class MonteCarloProjector:
+    """
+    Projects the distribution of the portfolio value over the next years by block
+    bootstrap of the positions' own history (the 1y daily closes DataCollector fetched).
+    Foreign positions compound the asset return with the BRL return of their currency
+    (the FX quote, times its cross leg, e.g. EURUSD=X x BRL=X), Renda Fixa grows at
+    the CDI and positions without history are kept flat. Paths are vectorized in NumPy
+    and split in batches that can be spread over a process pool.
+    """
+
+    def __init__(self, closes, positions, cdi_pct, monthly_contribution=0.0):
+        """
+        closes: DataFrame of daily closes (one column per ticker, DatetimeIndex).
+        positions: DataFrame with ticker, category, value_brl and currency (fx.currency_of) columns.
+        """
+        self.positions = positions.reset_index(drop=True)
+        self.monthly_contribution = monthly_contribution
+        self.monthly_returns = self._monthly_returns(closes, cdi_pct)
+
+    def _monthly_returns(self, closes, cdi_pct):
+        """Matrix (blocks x positions) of overlapping 21-trading-day simple returns."""
+        closes = closes.sort_index().ffill()
+        block_returns = (closes / closes.shift(TRADING_DAYS_PER_MONTH) - 1).iloc[TRADING_DAYS_PER_MONTH:]
+        n_blocks = max(len(block_returns), 1)
+
+        cdi_monthly = (1 + cdi_pct / 100) ** (1 / 12) - 1
+        fx_returns = {"BRL": np.zeros(n_blocks)}
+
+        def fx_return(currency):
+            """Block returns of `currency` in BRL (flat when its quotes have no history)."""
+            if currency not in fx_returns:
+                if currency not in FX_QUOTES:
+                    logger.warning(f"No FX quote for {currency}: simulated without currency moves.")
+                    fx_returns[currency] = np.zeros(n_blocks)
+                    return fx_returns[currency]
+                ticker, quote_currency = FX_QUOTES[currency]
+                if block_returns.empty or ticker not in block_returns:
+                    logger.warning(f"No history for {ticker}: {currency} simulated without currency moves.")
+                    quote = np.zeros(n_blocks)
+                else:
+                    quote = block_returns[ticker].fillna(0).to_numpy()
+                fx_returns[currency] = (1 + quote) * (1 + fx_return(quote_currency)) - 1
+            return fx_returns[currency]
+
+        columns = []
+        missing = []
+        for _, position in self.positions.iterrows():
+            ticker = position['ticker']
+            if position['category'] == "RENDA_FIXA":
+                columns.append(np.full(n_blocks, cdi_monthly))
+                continue
+            if block_returns.empty or ticker not in block_returns or block_returns[ticker].isna().all():
+                missing.append(ticker)
+                columns.append(np.zeros(n_blocks))
+                continue
+            asset = block_returns[ticker].fillna(0).to_numpy()
+            if position['currency'] != "BRL":
+                asset = (1 + asset) * (1 + fx_return(position['currency'])) - 1
+            columns.append(asset)
+
+        if missing:
+            logger.warning(f"No price history to simulate {', '.join(missing)}: kept flat.")
+        return np.column_stack(columns) if columns else np.zeros((n_blocks, 0))
+
+    def run(self, years=10, n_paths=10000, workers=1, batch_size=5000, seed=None):
+        """
+        Returns a DataFrame indexed by year (1..years) with the percentile bands
+        (p5, p25, p50, p75, p95) of the projected value and the total contributed.
+        """
+        start = time.monotonic()
+        values = self.positions['value_brl'].to_numpy(dtype=float)
+        total = values.sum()
+        weights = values / total if total > 0 else np.full(values.size, 1 / max(values.size, 1))
+        months = years * 12
+
+        n_batches = max(1, -(-n_paths // batch_size))
+        sizes = [n_paths // n_batches + (i < n_paths % n_batches) for i in range(n_batches)]
+        seeds = np.random.SeedSequence(seed).spawn(n_batches)
+        args = [
+            (self.monthly_returns, values, weights, self.monthly_contribution, months, size, batch_seed)
+            for size, batch_seed in zip(sizes, seeds)
+        ]
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and n_batches > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, n_batches)) as pool:
+                results = list(pool.map(_simulate_batch, *zip(*args)))
+        else:
+            results = [_simulate_batch(*batch) for batch in args]
+        final = np.vstack(results)
+
+        bands = np.percentile(final, PERCENTILES, axis=0).T
+        projection = pd.DataFrame(bands, columns=[f"p{p}" for p in PERCENTILES], index=range(1, years + 1))
+        projection.index.name = "year"
+        projection['contributed'] = total + self.monthly_contribution * 12 * projection.index.to_numpy()
+        logger.info(
+            f"Monte Carlo: {n_paths} paths x {months} months x {values.size} positions "
+            f"in {time.monotonic() - start:.2f}s ({min(workers, n_batches)} worker(s))."
+        )
+        return projection
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Root modules are imported as src.* / config.*, like main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
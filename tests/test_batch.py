@@ -0,0 +1,22 @@
+import logging
+from src.batch import merge_portfolios
+from src.data_collector import DataCollector
+
+def test_a_ticker_in_different_categories_is_kept_under_each(caplog, monkeypatch):
+    first = [{"ticker": "IVVB11.SA", "category": "ETFS", "quantity": 10}, {"ticker": "PETR4.SA", "category": "BR_STOCKS", "quantity": 5}]
+    second = [{"ticker": "IVVB11.SA", "category": "US_STOCKS", "quantity": 3}, {"ticker": "PETR4.SA", "category": "BR_STOCKS", "quantity": 1}]
+
+    with caplog.at_level(logging.WARNING, logger="src.batch"):
+        merged = merge_portfolios([first, second])
+
+    assert [(item['ticker'], item['category']) for item in merged] == [
+        ("IVVB11.SA", "ETFS"), ("PETR4.SA", "BR_STOCKS"), ("IVVB11.SA", "US_STOCKS")
+    ]
+    assert "IVVB11.SA is filed under different categories" in caplog.text
+    assert "PETR4.SA" not in caplog.text
+
+    # Fetched once, with the FX quote the US_STOCKS filing needs
+    monkeypatch.setattr("src.data_collector.Settings.PRICE_STORE_ENABLED", False)
+    monkeypatch.setattr("src.data_collector.Settings.FUNDAMENTALS_CACHE_ENABLED", False)
+    monkeypatch.setattr("src.data_collector.Settings.INDICATOR_CACHE_ENABLED", False)
+    assert DataCollector(merged, provider=object()).tickers == ["IVVB11.SA", "PETR4.SA", "BRL=X"]
@@ -0,0 +1,145 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from config.settings import Settings
+from src.data_collector import DataCollector
+from src.price_store import PriceHistoryStore
+
+@pytest.fixture(autouse=True)
+def no_local_caches(monkeypatch):
+    monkeypatch.setattr(Settings, "PRICE_STORE_ENABLED", False)
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_CACHE_ENABLED", False)
+    monkeypatch.setattr(Settings, "INDICATOR_CACHE_ENABLED", False)
+
+class SlowInfoProvider:
+    """stock.info answers after `latency` seconds; tickers in `hung` answer only when released."""
+
+    def __init__(self, latency=0.02, hung=()):
+        self.latency = latency
+        self.hung = set(hung)
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def info(self, ticker):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if ticker in self.hung:
+                self.release.wait(5)
+            else:
+                time.sleep(self.latency)
+            return {"shortName": ticker}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+def collector(provider, tickers):
+    return DataCollector([{"ticker": t, "category": "BR_STOCKS"} for t in tickers], provider=provider)
+
+def test_lookups_never_exceed_the_worker_cap(monkeypatch):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_MAX_WORKERS", 3)
+    tickers = [f"T{i}.SA" for i in range(12)]
+    provider = SlowInfoProvider()
+
+    results = collector(provider, tickers)._fetch_fundamentals(tickers)
+
+    assert set(results) == set(tickers)
+    assert provider.peak == 3
+
+def test_a_hung_ticker_times_out_alone_and_keeps_its_slot(monkeypatch):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_MAX_WORKERS", 2)
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_TIMEOUT", 0.2)
+    tickers = ["HUNG.SA"] + [f"T{i}.SA" for i in range(5)]
+    provider = SlowInfoProvider(hung={"HUNG.SA"})
+    dc = collector(provider, tickers)
+
+    started = time.monotonic()
+    results = dc._fetch_fundamentals(tickers)
+    provider.release.set()
+
+    assert set(results) == set(tickers) - {"HUNG.SA"}
+    assert dc.run_stats["fundamentals"]["HUNG.SA"]["status"] == "timeout"
+    assert provider.peak == 2  # the abandoned lookup still counts against the cap
+    assert time.monotonic() - started < 1.0
+
+def test_tickers_are_skipped_when_every_slot_is_hung(monkeypatch):
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_MAX_WORKERS", 1)
+    monkeypatch.setattr(Settings, "FUNDAMENTALS_TIMEOUT", 0.1)
+    provider = SlowInfoProvider(hung={"HUNG.SA"})
+    dc = collector(provider, ["HUNG.SA", "PETR4.SA"])
+
+    results = dc._fetch_fundamentals(["HUNG.SA", "PETR4.SA"])
+    provider.release.set()
+
+    assert results == {}
+    assert dc.run_stats["fundamentals"]["PETR4.SA"]["status"] == "skipped"
+    assert provider.peak == 1
+
+# Eight business days up to today: the store holds the first six
+DAYS = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=8)
+
+def bars(closes, days=DAYS):
+    return pd.DataFrame({"Close": closes}, index=days[:len(closes)])
+
+class HistoryProvider:
+    """Serves one daily series per ticker and records each download (start= or period=)."""
+
+    def __init__(self, series):
+        self.series = series
+        self.downloads = []
+
+    def download_histories(self, tickers, start=None, period=None):
+        self.downloads.append(start or period)
+        return {
+            ticker: self.series[ticker][self.series[ticker].index >= start] if start else self.series[ticker]
+            for ticker in tickers
+        }
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "prices.db"))
+    # The last stored bar was saved mid-session (101.0, closed at 106.0)
+    store.replace("PETR4.SA", bars([100.0, 102.0, 103.0, 104.0, 105.0, 101.0]))
+    yield store
+    store.close()
+
+def history_collector(store, provider):
+    dc = collector(provider, ["PETR4.SA"])
+    dc.price_store = store
+    return dc
+
+def stored(store):
+    return store.load("PETR4.SA")["Close"].tolist()
+
+def test_incremental_download_starts_at_the_settled_bar_and_overwrites_the_last_one(store):
+    provider = HistoryProvider({"PETR4.SA": bars([100.0, 102.0, 103.0, 104.0, 105.0, 106.0, 107.0, 108.0])})
+
+    histories = history_collector(store, provider)._fetch_histories(["PETR4.SA"])
+
+    assert provider.downloads == [DAYS[4].strftime("%Y-%m-%d")]
+    assert stored(store) == [100.0, 102.0, 103.0, 104.0, 105.0, 106.0, 107.0, 108.0]
+    assert histories["PETR4.SA"]["Close"].iloc[-1] == 108.0
+
+def test_a_gap_after_the_settled_bar_triggers_a_full_resync(store):
+    # The provider no longer has the settled bar's day
+    series = bars([100.0, 102.0, 103.0, 104.0, 105.0, 106.0, 107.0, 108.0]).drop(DAYS[4])
+    provider = HistoryProvider({"PETR4.SA": series})
+
+    history_collector(store, provider)._fetch_histories(["PETR4.SA"])
+
+    assert provider.downloads == [DAYS[4].strftime("%Y-%m-%d"), "1y"]
+    assert stored(store) == [100.0, 102.0, 103.0, 104.0, 106.0, 107.0, 108.0]
+
+def test_re_adjusted_history_triggers_a_full_resync(store):
+    # A dividend re-adjusted every past close by 2%
+    adjusted = [round(close * 0.98, 2) for close in [100.0, 102.0, 103.0, 104.0, 105.0, 106.0, 107.0]] + [108.0]
+    provider = HistoryProvider({"PETR4.SA": bars(adjusted)})
+
+    history_collector(store, provider)._fetch_histories(["PETR4.SA"])
+
+    assert provider.downloads == [DAYS[4].strftime("%Y-%m-%d"), "1y"]
+    assert stored(store) == adjusted
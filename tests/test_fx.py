@@ -0,0 +1,40 @@
+import pytest
+from datetime import datetime
+from config.settings import Settings
+from src.fx import FxSnapshot, currency_of, quote_tickers
+
+NOW = datetime(2025, 6, 2, 12, 0)
+
+def test_currency_of_positions():
+    assert currency_of("AAPL", "US_STOCKS") == "USD"
+    assert currency_of("BTC-BRL", "CRYPTO") == "BRL"
+    assert currency_of("ETH-EUR", "CRYPTO") == "EUR"
+    assert currency_of("PETR4.SA", "BR_STOCKS") == "BRL"
+
+def test_cross_rates_need_their_legs():
+    assert quote_tickers({"EUR", "BRL"}) == ["EURUSD=X", "BRL=X"]
+
+def test_market_policy_derives_cross_rates():
+    market_data = {
+        "BRL=X": {"price": 5.0, "as_of": "2025-06-02"},
+        "EURUSD=X": {"price": 1.1, "as_of": "2025-06-02"},
+    }
+    fx = FxSnapshot.from_market_data(market_data, {}, currencies=("USD", "EUR"), policy="market", now=NOW)
+
+    assert fx.rate("USD") == pytest.approx(5.0)
+    assert fx.rate("EUR") == pytest.approx(5.5)
+    assert fx.rate("BRL") == 1.0
+    assert not fx.get("EUR")["stale"]
+
+def test_falls_back_to_ptax_and_flags_stale_rates(monkeypatch):
+    monkeypatch.setattr(Settings, "FX_MAX_AGE_DAYS", 3)
+    indicators = {"ptax_venda": 5.2, "as_of": {"ptax_venda": "2025-05-20"}}
+
+    fx = FxSnapshot.from_market_data({}, indicators, currencies=("USD",), policy="market", now=NOW)
+
+    assert fx.get("USD")["source"] == "ptax"
+    assert fx.rate("USD") == pytest.approx(5.2)
+    assert fx.get("USD")["stale"]
+
+def test_unknown_currency_rate_is_zero():
+    assert FxSnapshot({}).rate("JPY") == 0.0
@@ -0,0 +1,29 @@
+import json
+from datetime import datetime, timedelta
+from src.history_store import PortfolioHistoryStore
+from src.portfolio import PortfolioManager
+
+def test_legacy_json_is_imported_once_and_reruns_replace_the_day(tmp_path):
+    today = datetime.now().date()
+    yesterday, before = (today - timedelta(days=1)).isoformat(), (today - timedelta(days=2)).isoformat()
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps([{"date": before, "value": 900.0}, {"date": yesterday, "value": 1000.0}]))
+    path = str(tmp_path / "history.db")
+
+    store = PortfolioHistoryStore(path, legacy_json=str(legacy))
+    assert store.load() == [{"date": before, "value": 900.0}, {"date": yesterday, "value": 1000.0}]
+    # Today's run, then a re-run on the same day: one row, the last value
+    store.upsert(today.isoformat(), 1100.0)
+    store.upsert(today.isoformat(), 1050.0)
+    store.close()
+
+    # Reopened: the JSON is not imported again over the stored values
+    legacy.write_text(json.dumps([{"date": yesterday, "value": 1.0}]))
+    store = PortfolioHistoryStore(path, legacy_json=str(legacy))
+    assert store.load(start=yesterday) == [{"date": yesterday, "value": 1000.0}, {"date": today.isoformat(), "value": 1050.0}]
+    assert store.previous(today.isoformat()) == (yesterday, 1000.0)
+    store.close()
+
+    manager = PortfolioManager([], {}, {}, history_path=path)
+    assert manager.get_previous_value() == 1000.0
+    manager.history_store.close()
@@ -0,0 +1,21 @@
+from datetime import date
+from src.intraday import IntradayPoller
+
+class QuoteProvider:
+    def __init__(self, prices):
+        self.prices = prices
+
+    def new_run(self):
+        pass
+
+    def last_prices(self, tickers):
+        return {ticker: self.prices[ticker] for ticker in tickers if ticker in self.prices}
+
+def test_foreign_positions_fall_back_to_ptax_without_an_fx_quote():
+    indicators = {"ptax_venda": 5.2, "as_of": {"ptax_venda": date.today().isoformat()}}
+    portfolio = [{"ticker": "AAPL", "category": "US_STOCKS", "quantity": 2}, {"ticker": "PETR4.SA", "category": "BR_STOCKS", "quantity": 10}]
+    poller = IntradayPoller(portfolio, QuoteProvider({"AAPL": 100.0, "PETR4.SA": 30.0}), indicators=indicators)
+
+    poller.start()
+
+    assert poller.total_value == 2 * 100.0 * 5.2 + 10 * 30.0
@@ -0,0 +1,18 @@
+from datetime import date, datetime
+from src.market_calendar import br_holidays, is_business_day, previous_business_day, last_business_day
+
+def test_moving_holidays_follow_easter():
+    holidays = br_holidays(2025)  # Easter: 20/04/2025
+    assert date(2025, 3, 3) in holidays and date(2025, 3, 4) in holidays  # Carnaval
+    assert date(2025, 4, 18) in holidays  # Sexta-feira Santa
+    assert date(2025, 6, 19) in holidays  # Corpus Christi
+
+def test_consciencia_negra_only_from_2024():
+    assert date(2024, 11, 20) in br_holidays(2024)
+    assert date(2023, 11, 20) not in br_holidays(2023)
+
+def test_business_days_skip_weekends_and_holidays():
+    assert not is_business_day(date(2025, 4, 21))  # Tiradentes (monday)
+    assert previous_business_day(date(2025, 4, 22)) == date(2025, 4, 17)
+    assert last_business_day(datetime(2025, 4, 20, 15, 0)) == date(2025, 4, 17)
+    assert last_business_day(date(2025, 4, 22)) == date(2025, 4, 22)
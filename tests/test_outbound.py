@@ -0,0 +1,92 @@
+import json
+import time
+import threading
+import pytest
+from src.outbound import OutboundGuard, CircuitBreaker, CircuitOpenError, BudgetExceededError
+
+def guard(**kwargs):
+    options = dict(budget_seconds=10, rate_limits={}, max_retries=2, backoff_base=0.001, call_timeout=1.0)
+    options.update(kwargs)
+    return OutboundGuard(**options)
+
+def flaky(errors, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fn, calls
+
+def test_transient_errors_are_retried():
+    fn, calls = flaky([ConnectionError("reset"), json.JSONDecodeError("throttled", "<html>", 0)])
+    g = guard()
+
+    assert g.call("yahoo", fn) == "ok"
+    assert len(calls) == 3
+    assert g.stats["yahoo"]["retries"] == 2
+
+def test_bad_data_is_not_retried_nor_a_success():
+    fn, calls = flaky([KeyError("price")])
+    g = guard()
+    g.call("yahoo", lambda: "ok")
+    g.breakers["yahoo"].record_failure()
+
+    with pytest.raises(KeyError):
+        g.call("yahoo", fn)
+    assert len(calls) == 1
+    assert g.breakers["yahoo"].failures == 1
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the half-open trial
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_open_circuit_fails_fast():
+    g = guard(max_retries=0, failure_threshold=1, reset_timeout=60)
+    with pytest.raises(ConnectionError):
+        g.call("bcb", flaky([ConnectionError()])[0])
+    with pytest.raises(CircuitOpenError):
+        g.call("bcb", lambda: "ok")
+
+def test_hung_call_is_cut_at_the_call_timeout():
+    g = guard(max_retries=0, call_timeout=0.05)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        g.call("yahoo", time.sleep, 1)
+    assert time.monotonic() - started < 0.5
+
+def test_budget_is_per_run():
+    g = guard(budget_seconds=0.01)
+    time.sleep(0.02)
+    with pytest.raises(BudgetExceededError):
+        g.call("yahoo", lambda: "ok")
+
+    g.reset_budget()
+    assert g.call("yahoo", lambda: "ok") == "ok"
+
+def test_retries_of_hung_calls_never_exceed_the_in_flight_cap():
+    g = guard(max_retries=3, call_timeout=0.05, max_in_flight=2)
+    release = threading.Event()
+    running = []
+    peak = []
+
+    def hang():
+        running.append(1)
+        peak.append(len(running))
+        release.wait(1)
+        running.pop()
+
+    with pytest.raises(TimeoutError):
+        g.call("yahoo", hang)
+    release.set()
+    assert max(peak) == 2
+    assert g.stats["yahoo"]["calls"] == 4
@@ -0,0 +1,45 @@
+import pytest
+from src.history_store import PortfolioHistoryStore
+from src.performance import PerformanceTracker
+
+@pytest.fixture
+def store(tmp_path):
+    store = PortfolioHistoryStore(str(tmp_path / "history.db"), legacy_json=None)
+    yield store
+    store.close()
+
+def feed(store, tracker, points, cdi=0.0):
+    metrics = None
+    for day, value in points:
+        store.upsert(day, value)
+        metrics = tracker.update(day, value, cdi)
+    return metrics
+
+def test_twr_and_drawdown(store):
+    tracker = PerformanceTracker(store)
+    metrics = feed(store, tracker, [("2025-01-02", 100.0), ("2025-01-03", 120.0), ("2025-01-06", 90.0), ("2025-01-07", 108.0)])
+
+    assert metrics["periods"] == 3
+    assert metrics["twr_pct"] == pytest.approx(8.0)
+    assert metrics["max_drawdown_pct"] == pytest.approx(25.0)
+    assert metrics["volatility_pct"] is not None
+
+def test_rerun_on_the_same_day_replaces_the_point(store):
+    tracker = PerformanceTracker(store)
+    feed(store, tracker, [("2025-01-02", 100.0), ("2025-01-03", 110.0)])
+
+    metrics = feed(store, tracker, [("2025-01-03", 105.0)])
+
+    assert metrics["periods"] == 1
+    assert metrics["twr_pct"] == pytest.approx(5.0)
+
+def test_state_out_of_sync_is_rebuilt_from_the_history(store):
+    store.upsert("2025-01-02", 100.0)
+    store.upsert("2025-01-03", 200.0)
+    tracker = PerformanceTracker(store)
+
+    metrics = feed(store, tracker, [("2025-01-06", 100.0)])
+
+    assert metrics["periods"] == 2
+    assert metrics["twr_pct"] == pytest.approx(0.0)
+    assert metrics["max_drawdown_pct"] == pytest.approx(50.0)
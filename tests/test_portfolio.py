@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from src.fx import FxSnapshot, currency_of
+from src.portfolio import PortfolioManager
+
+PORTFOLIO = [
+    {"ticker": "PETR4.SA", "category": "BR_STOCKS", "quantity": 100},
+    {"ticker": "AAPL", "category": "US_STOCKS", "quantity": 3},
+    {"ticker": "BTC-USD", "category": "CRYPTO", "quantity": 0.5},
+    {"ticker": "RDB-NUBANK", "category": "RENDA_FIXA", "quantity": 2500.0},
+    {"ticker": "NOQUOTE.SA", "category": "FIIS", "quantity": 10},   # no market data
+    {"ticker": "NOPRICE", "category": "US_REITS", "quantity": 4},   # quote without a price
+    {"ticker": "HGLG11.SA", "quantity": 7},                          # no category
+]
+MARKET_DATA = {
+    "PETR4.SA": {"price": 38.5, "name": "Petrobras", "dy_12m": 12.1, "p_vp": 1.1, "pe": 4.0, "roe": 30.0,
+                 "sector": "Energy", "recommendation": "buy", "change_1d": 0.5, "change_12m": 10.0},
+    "AAPL": {"price": 190.0, "name": "Apple", "pe": 30.0, "sector": "Technology", "change_1d": -1.0},
+    "BTC-USD": {"price": 60000.0, "change_1d": 2.0, "change_12m": 90.0},
+    "NOPRICE": {"name": "No Price REIT", "dy_12m": 5.0},
+    "HGLG11.SA": {"price": 160.0, "name": "CGHG Logística"},
+    "BRL=X": {"price": 5.0},
+}
+
+def row_wise(manager):
+    """The per-position loop _value_positions replaced (kept here as the reference)."""
+    portfolio = []
+    for item in manager.portfolio_data:
+        ticker, qty, category = item['ticker'], item['quantity'], item.get('category', 'OUTROS')
+        data = manager.market_data.get(ticker, {})
+        price = 1.0 if category == "RENDA_FIXA" else data.get('price', 0)
+        value_brl = PortfolioManager.position_value(category, qty, price, manager.fx.rate(currency_of(ticker, category)))
+        portfolio.append({
+            "ticker": ticker, "qty": qty, "price": price, "value_brl": 0.0 if pd.isna(value_brl) else value_brl,
+            "category": category, "name": data.get('name', ticker),
+            "dy_12m": data.get('dy_12m', 0), "p_vp": data.get('p_vp', 0), "pe": data.get('pe', 0),
+            "roe": data.get('roe', 0), "sector": data.get('sector', 'Unknown'),
+            "recommendation": data.get('recommendation', 'None'),
+            "change_1d": data.get('change_1d', 0), "change_12m": data.get('change_12m', 0),
+            "profit_loss_pct": 0.0, "profit_loss_val": 0.0,
+        })
+    df = pd.DataFrame(portfolio)
+    return df, df['value_brl'].sum()
+
+def test_columnar_valuation_matches_the_row_wise_one():
+    fx = FxSnapshot({"USD": {"rate": 5.0, "source": "market", "as_of": None, "stale": False}})
+    manager = PortfolioManager(PORTFOLIO, MARKET_DATA, {}, fx=fx)
+
+    df, total = manager._value_positions()
+    expected, expected_total = row_wise(manager)
+
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert total == expected_total
+    assert df.loc[df['ticker'] == "AAPL", 'value_brl'].item() == 190.0 * 3 * 5.0
+    assert df.loc[df['ticker'] == "RDB-NUBANK", 'value_brl'].item() == 2500.0
+    assert (df.loc[df['ticker'].isin(["NOQUOTE.SA", "NOPRICE"]), 'value_brl'] == 0).all()
+
+def test_non_numeric_quote_values_take_the_default():
+    fx = FxSnapshot({})
+    market_data = {"PETR4.SA": {"price": None, "name": None, "dy_12m": np.nan, "pe": "n/a"}}
+    manager = PortfolioManager([{"ticker": "PETR4.SA", "category": "BR_STOCKS", "quantity": 1}], market_data, {}, fx=fx)
+
+    df, total = manager._value_positions()
+
+    row = df.iloc[0]
+    assert (row['price'], row['dy_12m'], row['pe'], row['name'], total) == (0.0, 0.0, 0.0, "PETR4.SA", 0.0)
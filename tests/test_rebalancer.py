@@ -0,0 +1,38 @@
+import pandas as pd
+from src.rebalancer import RebalanceOptimizer
+
+CATEGORY_MAP = {"BR_STOCKS": "Ações BR", "FIIS": "FIIs", "RENDA_FIXA": "Renda Fixa"}
+LOTS = {"BR_STOCKS": 1, "FIIS": 1, "RENDA_FIXA": 0.01}
+
+def book(rows):
+    return pd.DataFrame(rows, columns=["ticker", "category", "qty", "value_brl"])
+
+def test_sells_never_take_a_category_below_target():
+    optimizer = RebalanceOptimizer({"Ações BR": 0.5, "FIIs": 0.5}, CATEGORY_MAP, LOTS, sell_band=0.05)
+    # Ações BR is 8,000 above its 50% target (10,000) and sold in 3,000 lots
+    df = book([["PETR4", "BR_STOCKS", 6, 18000.0], ["HGLG11", "FIIS", 20, 2000.0]])
+
+    orders = optimizer.optimize(df)
+
+    sell = orders[orders["action"] == "VENDER"].iloc[0]
+    assert sell["quantity"] == 2  # round(8000 / 3000) = 3 would overshoot the target
+    buys = orders[orders["action"] == "COMPRAR"]
+    assert set(buys["category"]) == {"FIIs"}
+
+def test_proceeds_without_holdings_to_buy_are_unallocated():
+    optimizer = RebalanceOptimizer({"Ações BR": 0.5, "FIIs": 0.5}, CATEGORY_MAP, LOTS, sell_band=0.05)
+    # No FII held: there is nothing to buy with the proceeds
+    df = book([["PETR4", "BR_STOCKS", 100, 10000.0]])
+
+    orders = optimizer.optimize(df)
+
+    assert (orders["action"] == "VENDER").all()
+    assert orders.attrs["unallocated_cash"] == orders["value"].sum()
+
+def test_renda_fixa_is_never_sold():
+    optimizer = RebalanceOptimizer({"Renda Fixa": 0.2, "FIIs": 0.8}, CATEGORY_MAP, LOTS)
+    df = book([["RDB-NUBANK", "RENDA_FIXA", 9000, 9000.0], ["HGLG11", "FIIS", 10, 1000.0]])
+
+    orders = optimizer.optimize(df)
+
+    assert orders.empty